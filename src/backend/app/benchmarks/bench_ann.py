@@ -0,0 +1,68 @@
+# src/backend/app/benchmarks/bench_ann.py
+"""
+Recall@k vs latency of the IVF index against exact cosine ranking.
+
+Uses synthetic clustered embeddings (no model download needed):
+    python src/backend/app/benchmarks/bench_ann.py --n 200000 --dim 384
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.vector_index import VectorIndex
+from db.ann_index import IVFIndex
+
+
+def make_data(n, dim, n_clusters, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    data = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    q_labels = rng.integers(0, n_clusters, size=n_queries)
+    queries = centers[q_labels] + 0.6 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    return data, queries
+
+
+def timed_search(index, queries, top_k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append([doc_id for doc_id, _ in index.search(q, top_k=top_k, **kwargs)])
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    data, queries = make_data(args.n, args.dim, args.clusters, args.queries)
+    doc_ids = [f"doc_{i}" for i in range(args.n)]
+
+    exact = VectorIndex()
+    exact.load(doc_ids, data)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(min_train_size=0)
+    ivf.load(doc_ids, data)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s, nlist={ivf.centroids.shape[0]}")
+
+    truth, exact_ms = timed_search(exact, queries, args.top_k)
+    print(f"{'mode':<12}{'recall@' + str(args.top_k):>12}{'ms/query':>12}")
+    print(f"{'exact':<12}{1.0:>12.3f}{exact_ms:>12.3f}")
+
+    for nprobe in args.nprobe:
+        approx, ms = timed_search(ivf, queries, args.top_k, nprobe=nprobe)
+        recall = np.mean([len(set(a) & set(t)) / len(t) for a, t in zip(approx, truth)])
+        print(f"{'ivf/' + str(nprobe):<12}{recall:>12.3f}{ms:>12.3f}")
@@ -0,0 +1,57 @@
+# src/backend/app/benchmarks/bench_llm_client.py
+"""
+Shared LLMClient against the local stub server (benchmarks/stub_llm_server.py).
+
+Fires concurrent calls and reports wall time, upstream requests, TCP
+connections used, coalesced calls, retries and timeouts:
+    python src/backend/app/benchmarks/bench_llm_client.py --calls 64 --distinct 16
+    python src/backend/app/benchmarks/bench_llm_client.py --fail-rate 0.3 --stall-rate 0.05 --timeout 1
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.llm_client import LLMClient, LLMError
+from benchmarks.stub_llm_server import serve
+
+
+async def run(client, calls, distinct):
+    async def one(i):
+        try:
+            return await client.agenerate(f"question {i % distinct}", model="stub")
+        except LLMError as e:
+            return e
+    return await asyncio.gather(*(one(i) for i in range(calls)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=16, help="Distinct prompts among the calls")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub seconds per completion")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency, fail_rate=args.fail_rate, stall_rate=args.stall_rate, stall=args.timeout * 3)
+    client = LLMClient(base_url=f"http://127.0.0.1:{server.server_port}/v1", timeout=args.timeout,
+                       max_retries=args.retries, max_concurrency=args.concurrency, backoff=0.1)
+
+    start = time.perf_counter()
+    results = asyncio.run(run(client, args.calls, args.distinct))
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(r, Exception) for r in results)
+
+    print(f"{args.calls} calls ({args.distinct} distinct prompts) in {elapsed:.2f}s, {failed} failed")
+    print(f"upstream requests: {server.requests}, TCP connections: {len(server.connections)}")
+    print(client.stats())
+    client.close()
+    server.shutdown()
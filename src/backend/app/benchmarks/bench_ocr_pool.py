@@ -0,0 +1,72 @@
+# src/backend/app/benchmarks/bench_ocr_pool.py
+"""
+OCR throughput (images/second) of OCRWorkerPool at several pool sizes.
+
+Images are cycled from sample_file/; worker start-up (reader load) is excluded:
+    python src/backend/app/benchmarks/bench_ocr_pool.py --images 32 --workers 1 2 4 8
+
+With --kill-idle, every worker is SIGKILLed while idle before the images are
+submitted; the pool must restart them and still return every text (exit code 1
+if a task fails or hangs):
+    python src/backend/app/benchmarks/bench_ocr_pool.py --images 4 --workers 2 --kill-idle
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import multiprocessing
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ocr_pool import OCRWorkerPool
+
+SAMPLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "sample_file"))
+
+
+def load_images():
+    images = []
+    for name in sorted(os.listdir(SAMPLE_DIR)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(SAMPLE_DIR, name), "rb") as f:
+                images.append(f.read())
+    return images
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--kill-idle", action="store_true", help="Kill the idle workers before submitting")
+    parser.add_argument("--task-timeout", type=float, default=300, help="Seconds to wait for each text")
+    args = parser.parse_args()
+
+    samples = load_images()
+    images = [samples[i % len(samples)] for i in range(args.images)]
+
+    failures = 0
+    print(f"{'workers':>8}{'images/s':>12}{'s/image':>12}")
+    for num_workers in args.workers:
+        pool = OCRWorkerPool(num_workers=num_workers)
+        pool.wait_ready()
+        if args.kill_idle:
+            workers = multiprocessing.active_children()
+            for process in workers:
+                os.kill(process.pid, signal.SIGKILL)
+            for process in workers:
+                process.join()
+
+        start = time.perf_counter()
+        for future in [pool.submit(image) for image in images]:
+            try:
+                future.result(args.task_timeout)
+            except Exception as e:
+                failures += 1
+                print(f"OCR task failed: {type(e).__name__} {e}")
+        elapsed = time.perf_counter() - start
+        restarts = pool.restarts
+        pool.close()
+        print(f"{num_workers:>8}{len(images) / elapsed:>12.2f}{elapsed / len(images):>12.3f}"
+              + (f"   ({restarts} worker restarts)" if args.kill_idle else ""))
+    sys.exit(1 if failures else 0)
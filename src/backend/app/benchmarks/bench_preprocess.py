@@ -0,0 +1,99 @@
+# src/backend/app/benchmarks/bench_preprocess.py
+"""
+Standard vs fast OCR preprocessing: latency, peak RSS and OCR text agreement.
+
+Each mode runs in its own subprocess so peak RSS is not shared:
+    python src/backend/app/benchmarks/bench_preprocess.py --repeat 10
+    python src/backend/app/benchmarks/bench_preprocess.py --ocr   # also compare OCR text
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+import resource
+import subprocess
+from io import BytesIO
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from PIL import Image
+
+SAMPLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "sample_file"))
+
+
+def load_images():
+    images = {}
+    for name in sorted(os.listdir(SAMPLE_DIR)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(SAMPLE_DIR, name), "rb") as f:
+                images[name] = f.read()
+    return images
+
+
+def run_child(mode, repeat, ocr):
+    """Preprocess (and optionally OCR) every sample in this process; print JSON stats"""
+    from services.ocr_service import OCRService
+
+    # Skip __init__ unless OCR is requested: preprocessing needs no reader
+    if ocr:
+        service = OCRService(preprocess_mode=mode)
+    else:
+        service = OCRService.__new__(OCRService)
+        service.preprocess_mode = mode
+
+    latencies = {}
+    texts = {}
+    for name, data in load_images().items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            image = Image.open(BytesIO(data))
+            if mode == "fast":
+                array = service.preprocess_image_fast(image)
+            else:
+                array = np.array(service.preprocess_image(image))
+            timings.append(time.perf_counter() - start)
+        latencies[name] = sorted(timings)[len(timings) // 2] * 1000
+        if ocr:
+            texts[name] = service.extract_receipt_from_bytes(data)
+
+    print(json.dumps({
+        "latency_ms": latencies,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "texts": texts
+    }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ocr", action="store_true", help="Run EasyOCR on both outputs and compare text")
+    parser.add_argument("--child", choices=["standard", "fast"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat, args.ocr)
+        sys.exit(0)
+
+    results = {}
+    for mode in ("standard", "fast"):
+        cmd = [sys.executable, __file__, "--child", mode, "--repeat", str(args.repeat)]
+        if args.ocr:
+            cmd.append("--ocr")
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    width = max(len(name) for name in results["standard"]["latency_ms"]) + 2
+    print(f"{'image':<{width}}{'standard ms':>13}{'fast ms':>10}")
+    for name in results["standard"]["latency_ms"]:
+        print(f"{name:<{width}}{results['standard']['latency_ms'][name]:>13.1f}{results['fast']['latency_ms'][name]:>10.1f}")
+    print(f"peak RSS MB: standard={results['standard']['peak_rss_mb']:.0f}  fast={results['fast']['peak_rss_mb']:.0f}")
+
+    if args.ocr:
+        for name, text in results["standard"]["texts"].items():
+            ratio = difflib.SequenceMatcher(None, text, results["fast"]["texts"][name]).ratio()
+            print(f"OCR text agreement {name}: {ratio:.3f}")
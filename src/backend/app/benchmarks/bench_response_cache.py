@@ -0,0 +1,92 @@
+# src/backend/app/benchmarks/bench_response_cache.py
+"""
+Response cache scoping check and hit/miss latency of /api/query.
+
+Runs the Flask app in-process on a copy of backup_db/, against the local stub
+LLM (benchmarks/stub_llm_server.py). Each pair of questions differs only in
+its scope (month, vendor, amount bound, aggregate); the second one must miss
+the cache even though the wording is nearly identical, while repeating the
+first must hit. The similarity threshold is dropped to -1 so that only the
+exact filter match keeps the pairs apart, whatever the embedding model.
+Exits non-zero on a wrong hit or a missed repeat:
+    python src/backend/app/benchmarks/bench_response_cache.py
+    python src/backend/app/benchmarks/bench_response_cache.py --latency 0.5
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.stub_llm_server import serve
+
+BACKUP_DB = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backup_db", "receipts.db"))
+
+PAIRS = [
+    ("How much did I spend in November 2025?", "How much did I spend in October 2025?"),
+    ("How much did I spend last month?", "How much did I spend this month?"),
+    ("Show receipts over 50", "Show receipts over 500"),
+    ("How much did I spend in USD?", "How much did I spend in IDR?"),
+    ("What was my total spending in 2025?", "What was my average spending in 2025?"),
+    ("What did I spend per month in 2025?", "What did I spend per vendor in 2025?"),
+]
+
+
+def ask(client, question, session):
+    start = time.perf_counter()
+    response = client.post("/api/query", json={"question": question, "session_id": session})
+    return response.get_json(), (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM seconds per completion")
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency, token_latency=0.0)
+    db_dir = tempfile.mkdtemp(prefix="cache_")
+    if os.path.exists(BACKUP_DB):
+        shutil.copy(BACKUP_DB, db_dir)
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{server.server_port}/v1",
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "bench")
+    })
+
+    import main
+    from services.agentic_ai_v2 import ReceiptQnAAgent
+
+    main.agent = ReceiptQnAAgent(db_dir=db_dir)
+    main.agent.response_cache.threshold = -1.0
+    client = main.app.test_client()
+
+    failures = []
+    timings = {"miss": [], "hit": []}
+    try:
+        for i, (first, second) in enumerate(PAIRS):
+            # A fresh session per question: sessions with history bypass the cache
+            for question, session, expect_cached in ((first, f"a{i}", False), (second, f"b{i}", False),
+                                                     (first, f"c{i}", True)):
+                data, elapsed = ask(client, question, session)
+                if data is None or "cached" not in data:
+                    failures.append(f"{question!r}: request failed: {data}")
+                    continue
+                timings["hit" if data["cached"] else "miss"].append(elapsed)
+                if data["cached"] != expect_cached:
+                    failures.append(f"{question!r} (after {first!r}): cached={data['cached']}, expected {expect_cached}")
+            main.agent.response_cache.clear()
+    finally:
+        server.shutdown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    for kind, values in timings.items():
+        if values:
+            print(f"{kind:>5}: {len(values):>3} queries, avg {sum(values) / len(values):8.2f} ms")
+    print(main.agent.response_cache.stats())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(PAIRS)} pairs, {len(failures)} failures")
+    sys.exit(1 if failures else 0)
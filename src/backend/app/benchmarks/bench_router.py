@@ -0,0 +1,92 @@
+# src/backend/app/benchmarks/bench_router.py
+"""
+Query router: share of questions that skip the search_creator LLM rewrite, and
+end-to-end latency per route, against the local stub LLM (benchmarks/stub_llm_server.py).
+
+Each question runs through the full graph with the router on ("rules") and off,
+on a throwaway DB directory (or a copy of --db):
+    python src/backend/app/benchmarks/bench_router.py --latency 0.5
+    python src/backend/app/benchmarks/bench_router.py --db src/backend/app/db/receipts.db --show-routes
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.stub_llm_server import serve
+
+QUESTIONS = [
+    "starbucks receipts",
+    "total in october",
+    "Did I buy ice cream?",
+    "groceries last week",
+    "How many receipts this month?",
+    "most expensive receipt",
+    "coffee purchases",
+    "spending in 2025",
+    "What's my total spending?",
+    "Which vendor did I visit most?",
+    "How much did I spend at burger places in November 2025?",
+    "Compare my grocery spending in September and October",
+    "Why was last month's total so high?",
+    "Did I spend more on coffee than on lunch this year?",
+    "What did I buy around Christmas?",
+    "Show me receipts from the weekend before last",
+]
+
+
+def run(agent, questions, router, rounds):
+    agent.router = router
+    graph = agent.get_graph("full")
+    timings = {}
+    routes = {}
+    for r in range(rounds):
+        for i, question in enumerate(questions):
+            state = {"messages": [], "query": question, "summary": "", "answer": "", "search_params": "",
+                     "filters": {}, "aggregates": None, "route": "", "prompt_tokens": {}}
+            config = {"configurable": {"thread_id": f"bench_router_{router}_{r}_{i}"}}
+            start = time.perf_counter()
+            result = graph.invoke(state, config)
+            timings.setdefault(result["route"], []).append(time.perf_counter() - start)
+            routes[question] = result["route"]
+    return timings, routes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub seconds per LLM call")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--db", help="receipts.db to copy (default: empty DB)")
+    parser.add_argument("--show-routes", action="store_true", help="Print the route of every question")
+    args = parser.parse_args()
+
+    server = serve(latency=args.latency)
+    db_dir = tempfile.mkdtemp(prefix="bench_router_")
+    if args.db:
+        shutil.copy(args.db, os.path.join(db_dir, "receipts.db"))
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+    from services.agentic_ai_v2 import ReceiptQnAAgent
+    agent = ReceiptQnAAgent(db_dir=db_dir)
+    try:
+        results = {router: run(agent, QUESTIONS, router, args.rounds) for router in ("off", "rules")}
+    finally:
+        server.shutdown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    print(f"\n{len(QUESTIONS)} questions x {args.rounds} rounds, stub LLM latency {args.latency:g}s")
+    for router, (timings, routes) in results.items():
+        total = sum(len(samples) for samples in timings.values())
+        overall = sum(sum(samples) for samples in timings.values()) / total
+        print(f"router {router:<5}: avg {overall * 1000:7.1f} ms/query")
+        for route, samples in sorted(timings.items()):
+            print(f"    {route:<8} {len(samples) / total:6.1%} of queries, avg {sum(samples) / len(samples) * 1000:7.1f} ms")
+    if args.show_routes:
+        for question, route in results["rules"][1].items():
+            print(f"  {route:<8} {question}")
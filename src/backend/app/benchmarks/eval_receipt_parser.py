@@ -0,0 +1,85 @@
+# src/backend/app/benchmarks/eval_receipt_parser.py
+"""
+Rule-based receipt parser against the OCR text corpus in receipt_corpus/.
+
+Each <name>.txt holds OCRService output for a receipt and <name>.json the
+expected path ("rules" or "llm") and, for the rules path, the expected fields:
+    python src/backend/app/benchmarks/eval_receipt_parser.py
+    python src/backend/app/benchmarks/eval_receipt_parser.py --ocr   # regenerate .txt from sample_file/ first
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.receipt_parser import ReceiptParser
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "receipt_corpus")
+SAMPLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "sample_file"))
+FIELDS = ("date_of_purchase", "vendor", "total_amount", "currency", "items_json")
+
+
+def load_corpus():
+    cases = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".json"):
+            base = os.path.join(CORPUS_DIR, name[:-len(".json")])
+            with open(base + ".json") as f:
+                case = json.load(f)
+            case["name"] = os.path.basename(base)
+            case["text_path"] = base + ".txt"
+            cases.append(case)
+    return cases
+
+
+def regenerate_text(cases):
+    """Re-run OCR on the source images (cases derived from an image, e.g. cropped, are left alone)"""
+    from services.ocr_service import OCRService
+    ocr = OCRService()
+    for case in cases:
+        if "note" in case:
+            continue
+        with open(os.path.join(SAMPLE_DIR, case["image"]), "rb") as f:
+            text = ocr.extract_receipt_from_bytes(f.read())
+        with open(case["text_path"], "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ocr", action="store_true", help="Regenerate the corpus text with EasyOCR first")
+    parser.add_argument("--min-confidence", type=float, default=None)
+    parser.add_argument("--repeat", type=int, default=100, help="Parses per case for timing")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    if args.ocr:
+        regenerate_text(cases)
+
+    receipt_parser = ReceiptParser(min_confidence=args.min_confidence)
+    failures = 0
+    print(f"{'case':<32}{'confidence':>11}{'path':>7}{'expected':>10}{'parse ms':>10}  field errors")
+    for case in cases:
+        with open(case["text_path"]) as f:
+            text = f.read()
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            receipt_data, confidence = receipt_parser.parse(text)
+        parse_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        path = "rules" if confidence >= receipt_parser.min_confidence else "llm"
+        errors = []
+        if path == "rules" and "expected" in case:
+            errors = [field for field in FIELDS if receipt_data[field] != case["expected"][field]]
+        ok = path == case["expected_path"] and not errors
+        failures += not ok
+        print(f"{case['name']:<32}{confidence:>11.2f}{path:>7}{case['expected_path']:>10}{parse_ms:>10.2f}  "
+              f"{', '.join(errors) or '-'}{'' if ok else '  FAIL'}")
+
+    print(f"{len(cases) - failures}/{len(cases)} cases passed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,110 @@
+# src/backend/app/benchmarks/load_test.py
+"""
+Query throughput against a running backend, with and without ingests in flight.
+
+Start the server first (python src/backend/app/main.py), then:
+    python src/backend/app/benchmarks/load_test.py --url http://localhost:8114 --duration 30
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+import statistics
+import urllib.request
+
+SAMPLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "sample_file"))
+QUESTIONS = [
+    "What's my total spending?",
+    "Did I buy ice cream?",
+    "Show receipts from last week",
+    "Which vendor did I visit most?",
+]
+
+
+def post(url, payload, timeout=300):
+    body = json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, resp.read()
+
+
+def load_images():
+    images = []
+    for name in sorted(os.listdir(SAMPLE_DIR)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(SAMPLE_DIR, name), "rb") as f:
+                images.append(base64.b64encode(f.read()).decode())
+    return images
+
+
+def run(url, duration, query_threads, ingest_threads, images):
+    stop = time.perf_counter() + duration
+    latencies = []
+    ingests = []
+    errors = []
+    lock = threading.Lock()
+
+    def query_worker(i):
+        n = 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                post(f"{url}/api/query", {"question": QUESTIONS[(i + n) % len(QUESTIONS)]})
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            n += 1
+
+    def ingest_worker(i):
+        n = 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                post(f"{url}/api/process", {"base64_image": images[(i + n) % len(images)]})
+                with lock:
+                    ingests.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            n += 1
+
+    threads = [threading.Thread(target=query_worker, args=(i,)) for i in range(query_threads)]
+    threads += [threading.Thread(target=ingest_worker, args=(i,)) for i in range(ingest_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, ingests, errors
+
+
+def report(label, duration, latencies, ingests, errors):
+    if latencies:
+        p50 = statistics.median(latencies) * 1000
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000
+    else:
+        p50 = p95 = float("nan")
+    print(f"{label:<22} queries/s={len(latencies) / duration:6.2f}  p50={p50:8.1f}ms  p95={p95:8.1f}ms  "
+          f"ingests={len(ingests)}  errors={len(errors)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8114")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--query-threads", type=int, default=4)
+    parser.add_argument("--ingest-threads", type=int, default=1)
+    args = parser.parse_args()
+
+    images = load_images()
+    if not images:
+        sys.exit(f"No sample images in {SAMPLE_DIR}")
+
+    results = run(args.url, args.duration, args.query_threads, 0, images)
+    report("queries only", args.duration, *results)
+    results = run(args.url, args.duration, args.query_threads, args.ingest_threads, images)
+    report("queries + ingests", args.duration, *results)
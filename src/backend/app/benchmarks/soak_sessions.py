@@ -0,0 +1,132 @@
+# src/backend/app/benchmarks/soak_sessions.py
+"""
+Memory-growth soak of /api/query over many conversation sessions.
+
+Runs the Flask app in-process on a throwaway DB directory, against the local
+stub LLM (benchmarks/stub_llm_server.py). Every --turns queries start a new
+session, so sessions keep piling up and going idle; with a short --session-ttl
+they are evicted from the checkpoint DB. Reports process RSS, live sessions /
+checkpoints and the checkpoint file size as it goes, and exits non-zero if RSS
+grew by more than --max-growth-mb after warm-up:
+    python src/backend/app/benchmarks/soak_sessions.py --queries 100000
+    python src/backend/app/benchmarks/soak_sessions.py --queries 20000 --session-ttl 5 --keep-last 3
+"""
+import os
+import gc
+import sys
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.stub_llm_server import serve
+
+QUESTIONS = [
+    "What's my total spending?",
+    "Did I buy ice cream?",
+    "Show receipts from last week",
+    "Which vendor did I visit most?",
+    "How much did I spend on groceries?",
+]
+
+
+def rss_mb():
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def file_mb(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 2 ** 20
+
+
+def run(app, checkpointer, queries, turns, threads, report_every, warmup):
+    next_query = iter(range(queries))
+    lock = threading.Lock()
+    errors = []
+    samples = []
+    start = time.perf_counter()
+
+    def report(done):
+        gc.collect()
+        stats = checkpointer.stats()
+        sample = (done, rss_mb())
+        samples.append(sample)
+        print(f"{done:>8} queries  {time.perf_counter() - start:7.1f}s  rss {sample[1]:7.1f} MB  "
+              f"sessions {stats['sessions']:>6}  checkpoints {stats['checkpoints']:>6}  "
+              f"evicted {stats['evicted']:>7}  checkpoint db {file_mb(checkpointer.db_path):6.1f} MB")
+
+    def worker():
+        client = app.test_client()
+        for i in next_query:
+            response = client.post("/api/query", json={
+                "question": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})",
+                "session_id": f"soak-{i // turns}",
+                "cache": False
+            })
+            if response.status_code != 200:
+                with lock:
+                    errors.append(response.get_json())
+            done = i + 1
+            if done == warmup or done % report_every == 0:
+                with lock:
+                    report(done)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if queries % report_every:
+        report(queries)
+    return samples, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=5, help="Queries per session")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--session-ttl", type=float, default=10.0, help="Idle seconds before a session is evicted")
+    parser.add_argument("--keep-last", type=int, default=5, help="Checkpoints kept per session")
+    parser.add_argument("--report-every", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=5000, help="Queries before the RSS baseline is taken")
+    parser.add_argument("--max-growth-mb", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = serve(latency=0.0, token_latency=0.0)
+    db_dir = tempfile.mkdtemp(prefix="soak_")
+    os.environ.update({
+        "LLM_BASE_URL": f"http://127.0.0.1:{server.server_port}/v1",
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "soak"),
+        "SESSION_TTL": str(args.session_ttl),
+        "CHECKPOINT_KEEP_LAST": str(args.keep_last)
+    })
+
+    import main
+    from services.agentic_ai_v2 import ReceiptQnAAgent
+
+    main.agent = ReceiptQnAAgent(db_dir=db_dir)
+    # Sweep idle sessions as often as the TTL allows
+    main.agent.checkpointer.sweep_interval = min(args.session_ttl, 60)
+    try:
+        samples, errors = run(main.app, main.agent.checkpointer, args.queries, args.turns, args.threads,
+                              args.report_every, min(args.warmup, args.queries))
+    finally:
+        server.shutdown()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    baseline = next(rss for done, rss in samples if done >= min(args.warmup, args.queries))
+    growth = samples[-1][1] - baseline
+    print(f"{len(errors)} errors" + (f", first: {errors[0]}" if errors else ""))
+    print(f"RSS after warm-up {baseline:.1f} MB -> {samples[-1][1]:.1f} MB ({growth:+.1f} MB)")
+    print(main.query_latency.stats())
+    sys.exit(1 if errors or growth > args.max_growth_mb else 0)
@@ -0,0 +1,127 @@
+# src/backend/app/benchmarks/stub_llm_server.py
+"""
+Local stand-in for an OpenAI-compatible POST /v1/chat/completions endpoint.
+
+Replies after a fixed latency with a completion echoing the start of the prompt
+(streamed word by word as SSE when the request sets "stream": true); can fail a share of requests with 503 (retryable) or stall past the client timeout:
+    python src/backend/app/benchmarks/stub_llm_server.py --port 8199 --latency 0.5 --fail-rate 0.2
+    LLM_BASE_URL=http://127.0.0.1:8199/v1 python src/backend/app/main.py
+"""
+import json
+import time
+import random
+import argparse
+from threading import Lock, Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real API
+    disable_nagle_algorithm = True  # headers and body are separate writes: avoid the delayed-ACK stall
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        if not self.path.endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "not found"}})
+
+        if random.random() < server.stall_rate:
+            time.sleep(server.stall)
+        time.sleep(server.latency)
+        if random.random() < server.fail_rate:
+            return self._reply(503, {"error": {"message": "stub overloaded"}})
+
+        payload = json.loads(body)
+        prompt = payload["messages"][-1]["content"]
+        if payload.get("stream"):
+            return self._stream(f"stub answer to: {prompt[:80]}", payload.get("model"))
+        self._reply(200, {
+            "id": f"stub-{server.requests}",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"stub answer to: {prompt[:80]}"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 8}
+        })
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out and hung up
+
+    def _stream(self, text, model):
+        """Send the completion word by word as chunked server-sent events"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = text.split(" ")
+        try:
+            for i, word in enumerate(words):
+                time.sleep(self.server.token_latency)
+                chunk = {
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=0, latency=0.2, fail_rate=0.0, stall_rate=0.0, stall=30.0, token_latency=0.02):
+    """
+    Start the stub in a background thread; returns the server (server.server_port, server.requests).
+    Streaming requests get `latency` before the first token and `token_latency` between tokens.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.stall_rate = stall_rate
+    server.stall = stall
+    server.token_latency = token_latency
+    server.lock = Lock()
+    server.requests = 0
+    server.connections = set()
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of requests that hang for --stall seconds")
+    parser.add_argument("--stall", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.fail_rate, args.stall_rate, args.stall)
+    print(f"Stub LLM listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
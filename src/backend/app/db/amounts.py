@@ -0,0 +1,45 @@
+# src/backend/db/amounts.py
+import re
+
+# Printed amounts in these currencies have no minor units, so "75.000" is seventy-five thousand
+ZERO_DECIMAL_CURRENCIES = ("IDR", "JPY", "KRW", "VND")
+
+NUMBER_RE = re.compile(r"^-?\d[\d.,]*$")
+
+
+def parse_amount(number, zero_decimal=False):
+    """Turn a printed number ("1,234.50", "549.010", "22.62") into a float"""
+    if zero_decimal:
+        return float(re.sub(r"[.,]", "", number))
+    last = max(number.rfind("."), number.rfind(","))
+    if last == -1:
+        return float(number)
+    whole, frac = re.sub(r"[.,]", "", number[:last]), number[last + 1:]
+    # A 3-digit group after the last separator is a thousands group, not cents
+    if len(frac) == 3:
+        return float(whole + frac)
+    return float(f"{whole or 0}.{frac}")
+
+
+def normalize_amount(value, currency=None):
+    """
+    Stored amount as a float: numbers as they are, printed amounts ("12,50",
+    "Rp 75.000", "$1,234.50") parsed; None for anything without a number
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    number = re.sub(r"[^\d.,-]", "", str(value)).rstrip(".,")
+    if not NUMBER_RE.match(number):
+        return None
+    negative = number.startswith("-")
+    amount = parse_amount(number.lstrip("-"), zero_decimal=(currency or "").upper() in ZERO_DECIMAL_CURRENCIES)
+    return -amount if negative else amount
+
+
+def normalize_items(items, currency=None):
+    """Item dict with every price normalized (see normalize_amount); other values unchanged"""
+    if not isinstance(items, dict):
+        return items
+    return {name: normalize_amount(price, currency) for name, price in items.items()}
@@ -0,0 +1,192 @@
+# src/backend/db/ann_index.py
+import os
+import sys
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.vector_index import VectorIndex
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate cosine index (inverted file with spherical k-means centroids).
+
+    Vectors still live in the contiguous VectorIndex matrix; each row is also
+    assigned to its nearest centroid and kept in that centroid's list of row
+    ids. A query only gathers and scores the rows of the `nprobe` closest
+    lists. Below `min_train_size` vectors there are no centroids and search
+    falls back to the exact scan.
+
+    Knobs:
+        nlist:  number of lists (default ~4 * sqrt(n) at training time)
+        nprobe: lists scanned per query; higher = better recall, slower
+        auto_train: train in add()/load() once the collection reaches
+                    min_train_size and again whenever it doubles. Off, the
+                    owner calls train() itself when needs_training() says so
+                    (VectorService does it in the background).
+    """
+    def __init__(self, dim=None, capacity=1024, nlist=None, nprobe=8,
+                 min_train_size=4096, kmeans_iters=10, train_sample=65536, seed=0, auto_train=True):
+        super().__init__(dim=dim, capacity=capacity)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self.train_sample = train_sample
+        self.rng = np.random.default_rng(seed)
+        self.auto_train = auto_train
+
+        self.centroids = None
+        self.trained_size = 0
+        self.assign = np.full(capacity, -1, dtype=np.int32)
+        # Inverted lists: row ids per centroid (first list_sizes[c] entries used),
+        # and each row's position in its list so removal is O(1)
+        self.lists = []
+        self.list_sizes = np.zeros(0, dtype=np.int64)
+        self.list_pos = np.full(capacity, -1, dtype=np.int64)
+
+    # ---------------- Helpers ----------------
+    def _grow(self, min_capacity):
+        super()._grow(min_capacity)
+        assign = np.full(self.capacity, -1, dtype=np.int32)
+        assign[:self.size] = self.assign[:self.size]
+        self.assign = assign
+        list_pos = np.full(self.capacity, -1, dtype=np.int64)
+        list_pos[:self.size] = self.list_pos[:self.size]
+        self.list_pos = list_pos
+
+    def _nearest_centroid(self, vectors, chunk_size=65536):
+        out = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], chunk_size):
+            block = vectors[start:start + chunk_size]
+            out[start:start + block.shape[0]] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    def needs_training(self):
+        # Train once big enough, then retrain whenever the collection doubles
+        return self.size >= self.min_train_size and self.size >= 2 * self.trained_size
+
+    def _maybe_train(self):
+        if self.auto_train and self.needs_training():
+            self.train()
+
+    def _build_lists(self):
+        """Group every row into its centroid's list (after training)"""
+        nlist = self.centroids.shape[0]
+        assign = self.assign[:self.size]
+        order = np.argsort(assign, kind="stable")
+        self.list_sizes = np.bincount(assign, minlength=nlist).astype(np.int64)
+        bounds = np.concatenate([[0], np.cumsum(self.list_sizes)])
+        self.lists = [order[bounds[c]:bounds[c + 1]].copy() for c in range(nlist)]
+        self.list_pos[order] = np.arange(self.size) - bounds[assign[order]]
+
+    def _list_add(self, row):
+        c = self.assign[row]
+        size = self.list_sizes[c]
+        if size == self.lists[c].shape[0]:
+            grown = np.empty(max(8, 2 * size), dtype=np.int64)
+            grown[:size] = self.lists[c][:size]
+            self.lists[c] = grown
+        self.lists[c][size] = row
+        self.list_pos[row] = size
+        self.list_sizes[c] = size + 1
+
+    def _list_remove(self, row):
+        """Take a row out of its list by moving the list's last entry into its slot"""
+        c, pos = self.assign[row], self.list_pos[row]
+        last = self.list_sizes[c] - 1
+        moved = self.lists[c][last]
+        self.lists[c][pos] = moved
+        self.list_pos[moved] = pos
+        self.list_sizes[c] = last
+        self.list_pos[row] = -1
+
+    # ---------------- Training ----------------
+    def train(self):
+        """
+        Fit centroids with spherical k-means on a sample and reassign every row
+        """
+        data = self.matrix[:self.size]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(self.size)))
+        nlist = min(nlist, self.size)
+
+        if self.size > self.train_sample:
+            sample = data[self.rng.choice(self.size, self.train_sample, replace=False)]
+        else:
+            sample = data
+        centroids = sample[self.rng.choice(sample.shape[0], nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+
+            # Re-seed empty lists from random sample points
+            empty = np.flatnonzero(counts == 0)
+            if empty.size:
+                sums[empty] = sample[self.rng.choice(sample.shape[0], empty.size, replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assign[:self.size] = self._nearest_centroid(data)
+        self._build_lists()
+        self.trained_size = self.size
+
+    # ---------------- CRUD ----------------
+    def add(self, doc_id, vector):
+        row = super().add(doc_id, vector)
+        if self.centroids is not None:
+            if self.list_pos[row] >= 0:
+                self._list_remove(row)  # replaced in place: it may belong to another list now
+            self.assign[row] = int(np.argmax(self.centroids @ self.matrix[row]))
+            self._list_add(row)
+        self._maybe_train()
+        return row
+
+    def load(self, doc_ids, vectors):
+        super().load(doc_ids, vectors)
+        self.assign = np.full(self.capacity, -1, dtype=np.int32)
+        self.list_pos = np.full(self.capacity, -1, dtype=np.int64)
+        self.centroids, self.trained_size = None, 0
+        self._maybe_train()
+
+    def remove(self, doc_id):
+        row = self.id_to_row.get(doc_id)
+        last = self.size - 1
+        if row is None:
+            return False
+        if self.centroids is not None:
+            self._list_remove(row)
+            if row != last:
+                # The last row moves into the freed slot (see VectorIndex.remove)
+                c, pos = self.assign[last], self.list_pos[last]
+                self.lists[c][pos] = row
+                self.list_pos[row] = pos
+                self.list_pos[last] = -1
+        super().remove(doc_id)
+        self.assign[row] = self.assign[last]
+        self.assign[last] = -1
+        return True
+
+    # ---------------- Search ----------------
+    def search(self, query_vector, top_k=5, nprobe=None, candidates=None):
+        """
+        Return approximate [(doc_id, cosine_similarity), ...] best first.
+        A `candidates` subset is small enough to score exactly, so it bypasses the lists.
+        """
+        if self.centroids is None or candidates is not None:
+            return super().search(query_vector, top_k=top_k, candidates=candidates)
+        if self.size == 0 or top_k <= 0:
+            return []
+
+        query = self.normalize(query_vector)
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        probes = self._top_k(self.centroids @ query, nprobe)
+
+        rows = np.concatenate([self.lists[c][:self.list_sizes[c]] for c in probes])
+        return self._search_rows(query, rows, top_k)
@@ -0,0 +1,57 @@
+# src/backend/db/bulk_load.py
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.vector_service import VectorService
+from db.receipt_db import ReceiptDB
+
+DB_DIR = "/app/src/backend/app/db"
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                print(f"Skipping line {line_no}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk-load receipts from a JSONL file (one extraction dict per line: "
+                    "doc_id, date_of_purchase, vendor, total_amount, currency, items_json)."
+    )
+    parser.add_argument("jsonl", help="Path to the JSONL file")
+    parser.add_argument("--db-dir", default=DB_DIR, help="Directory holding receipts.db and vector_db.*")
+    parser.add_argument("--batch-size", type=int, default=64, help="Embedding batch size")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per SQLite transaction")
+    args = parser.parse_args()
+
+    vector_service = VectorService(db_path=os.path.join(args.db_dir, "vector_db.pkl"))
+    receipt_db = ReceiptDB(db_path=os.path.join(args.db_dir, "receipts.db"), vector_service=vector_service)
+
+    start = time.perf_counter()
+    total = 0
+    chunk = []
+    for row in read_jsonl(args.jsonl):
+        chunk.append(row)
+        if len(chunk) >= args.chunk_size:
+            total += receipt_db.add_receipts(chunk, batch_size=args.batch_size)
+            chunk = []
+            print(f"Loaded {total} receipts...")
+    if chunk:
+        total += receipt_db.add_receipts(chunk, batch_size=args.batch_size)
+
+    receipt_db.close()
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {total} receipts in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} receipts/s)")
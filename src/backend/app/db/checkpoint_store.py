@@ -0,0 +1,283 @@
+# src/backend/db/checkpoint_store.py
+import time
+import sqlite3
+from threading import Lock
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key
+)
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer backed by a SQLite file, bounded in size.
+
+    Each conversation session is a thread_id. Only the newest `keep_last`
+    checkpoints of a thread are kept, and threads idle for more than `ttl`
+    seconds are deleted (checked on write, at most every `sweep_interval`
+    seconds). Every process opening the file sees the same sessions, so
+    conversations survive restarts and are shared by all workers.
+
+    Checkpoints are stored whole, channel values inline, so pruning old ones
+    never breaks a newer one (the agent state has no DeltaChannel).
+    """
+    def __init__(self, db_path, keep_last=5, ttl=86400, sweep_interval=60, serde=None):
+        super().__init__(serde=serde)
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        self.db_path = db_path
+        self.keep_last = keep_last
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.lock = Lock()
+        self._last_sweep = 0.0
+
+        self.pruned = 0
+        self.evicted = 0
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_tables()
+
+    def _init_tables(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    parent_id TEXT,
+                    type TEXT,
+                    checkpoint BLOB,
+                    metadata_type TEXT,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    channel TEXT,
+                    type TEXT,
+                    value BLOB,
+                    task_path TEXT,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                )
+            """)
+            # Last activity per session, for idle eviction
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_threads (
+                    thread_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_checkpoint_threads_updated ON checkpoint_threads (updated_at)")
+
+    # ---------------- Read ----------------
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self.lock:
+            if checkpoint_id:
+                row = self.conn.execute("""
+                    SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints
+                    WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?
+                """, (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self.conn.execute("""
+                    SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints
+                    WHERE thread_id=? AND checkpoint_ns=? ORDER BY checkpoint_id DESC LIMIT 1
+                """, (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+            writes = self._load_writes(thread_id, checkpoint_ns, row[0])
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        """Checkpoints newest first, optionally for one thread / namespace and matching metadata `filter`"""
+        where, params = [], []
+        if config:
+            where.append("thread_id=?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns=?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id=?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id<?")
+            params.append(get_checkpoint_id(before))
+
+        sql = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC", params).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self.serde.loads_typed((row[6], row[7]))
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            with self.lock:
+                writes = self._load_writes(row[0], row[1], row[2])
+            yield self._to_tuple(row[0], row[1], row[2:], writes)
+
+    def _load_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        """Pending writes of a checkpoint, in the order the run applied them. Caller holds the lock."""
+        rows = self.conn.execute("""
+            SELECT task_id, idx, channel, type, value, task_path FROM checkpoint_writes
+            WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=?
+        """, (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        rows.sort(key=lambda r: writes_sort_key(r[5] or "", r[0], r[1]))
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, _, channel, type_, value, _ in rows]
+
+    def _to_tuple(self, thread_id, checkpoint_ns, row, writes):
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+
+        def config(cid):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=writes
+        )
+
+    # ---------------- Write ----------------
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO checkpoints
+                (thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                  type_, data, metadata_type, metadata_data))
+            self.conn.execute("""
+                INSERT INTO checkpoint_threads (thread_id, updated_at) VALUES (?, ?)
+                ON CONFLICT(thread_id) DO UPDATE SET updated_at=excluded.updated_at
+            """, (thread_id, now))
+            self._prune(thread_id, checkpoint_ns)
+        if self.ttl and now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.evict_idle(now)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special channels (errors, interrupts; negative idx) are overwritten, regular writes are kept once
+        rows = {"INSERT OR REPLACE": [], "INSERT OR IGNORE": []}
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, data = self.serde.dumps_typed(value)
+            rows["INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"].append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, data, task_path)
+            )
+        with self.lock, self.conn:
+            for verb, params in rows.items():
+                self.conn.executemany(f"""
+                    {verb} INTO checkpoint_writes
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, params)
+
+    def _prune(self, thread_id, checkpoint_ns):
+        """Drop checkpoints (and their writes) older than the newest keep_last. Caller holds the lock."""
+        row = self.conn.execute("""
+            SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND checkpoint_ns=?
+            ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?
+        """, (thread_id, checkpoint_ns, self.keep_last - 1)).fetchone()
+        if row is None:
+            return
+        params = (thread_id, checkpoint_ns, row[0])
+        self.pruned += self.conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id<?", params
+        ).rowcount
+        self.conn.execute("DELETE FROM checkpoint_writes WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id<?", params)
+
+    # ---------------- Eviction ----------------
+    def delete_thread(self, thread_id):
+        with self.lock, self.conn:
+            self._delete_threads([thread_id])
+
+    def _delete_threads(self, thread_ids):
+        """Caller holds the lock"""
+        params = [(thread_id,) for thread_id in thread_ids]
+        self.conn.executemany("DELETE FROM checkpoints WHERE thread_id=?", params)
+        self.conn.executemany("DELETE FROM checkpoint_writes WHERE thread_id=?", params)
+        self.conn.executemany("DELETE FROM checkpoint_threads WHERE thread_id=?", params)
+
+    def evict_idle(self, now=None, batch_size=500):
+        """Delete sessions idle for more than ttl seconds; returns how many were deleted"""
+        cutoff = (now or time.time()) - self.ttl
+        evicted = 0
+        while True:
+            # Small batches keep the write lock short for other workers
+            with self.lock, self.conn:
+                idle = [row[0] for row in self.conn.execute(
+                    "SELECT thread_id FROM checkpoint_threads WHERE updated_at<? LIMIT ?", (cutoff, batch_size)
+                )]
+                self._delete_threads(idle)
+                self.evicted += len(idle)
+            evicted += len(idle)
+            if len(idle) < batch_size:
+                return evicted
+
+    # ---------------- Async (same storage, run inline) ----------------
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    # ---------------- Stats ----------------
+    def stats(self):
+        with self.lock:
+            sessions = self.conn.execute("SELECT COUNT(*) FROM checkpoint_threads").fetchone()[0]
+            checkpoints = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {
+            "sessions": sessions,
+            "checkpoints": checkpoints,
+            "keep_last": self.keep_last,
+            "ttl": self.ttl,
+            "pruned": self.pruned,
+            "evicted": self.evicted
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,50 @@
+# src/backend/db/dates.py
+import re
+from datetime import date
+
+MONTHS = {m: i + 1 for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])}
+MONTHS.update({"mei": 5, "agu": 8, "okt": 10, "des": 12})  # Indonesian abbreviations
+
+ISO_DATE_RE = re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b")
+NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b")
+DAY_MONTH_DATE_RE = re.compile(r"\b(\d{1,2})\s+([A-Za-z]{3})[a-z]*\.?,?\s+(\d{4})\b")
+MONTH_DAY_DATE_RE = re.compile(r"\b([A-Za-z]{3})[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b")
+
+
+def find_date(text, month_first=False):
+    """
+    First valid date in a string as (ISO "YYYY-MM-DD", ambiguous), or (None, False).
+
+    Numeric dates are read day-first unless `month_first` (US receipts) or the
+    numbers only allow one reading; `ambiguous` is True when both readings were valid.
+    """
+    candidates = []
+    for m in ISO_DATE_RE.finditer(text):
+        candidates.append((int(m.group(1)), int(m.group(2)), int(m.group(3)), False))
+    for m in NUMERIC_DATE_RE.finditer(text):
+        a, b, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        year += 2000 if year < 100 else 0
+        if a > 12 or (b <= 12 and not month_first):
+            candidates.append((year, b, a, a <= 12))
+        else:
+            candidates.append((year, a, b, b <= 12))
+    for m in DAY_MONTH_DATE_RE.finditer(text):
+        if m.group(2).lower() in MONTHS:
+            candidates.append((int(m.group(3)), MONTHS[m.group(2).lower()], int(m.group(1)), False))
+    for m in MONTH_DAY_DATE_RE.finditer(text):
+        if m.group(1).lower() in MONTHS:
+            candidates.append((int(m.group(3)), MONTHS[m.group(1).lower()], int(m.group(2)), False))
+    for year, month, day, ambiguous in candidates:
+        try:
+            return date(year, month, day).isoformat(), ambiguous
+        except ValueError:
+            continue
+    return None, False
+
+
+def normalize_date(value, currency=None):
+    """ISO date for a stored date_of_purchase, or the value unchanged if it has no recognizable date"""
+    if not isinstance(value, str):
+        return value
+    iso, _ = find_date(value, month_first=currency == "USD")
+    return iso or value
@@ -0,0 +1,200 @@
+# src/backend/db/dedup_index.py
+import os
+import time
+import hashlib
+import sqlite3
+from io import BytesIO
+from threading import Lock
+
+import numpy as np
+from PIL import Image, ImageOps
+
+DB_DIR = "/app/src/backend/app/db"
+RECEIPT_PATH = os.path.join(DB_DIR, "receipts.db")
+
+HASH_SIZE = 16  # 16x16 difference hash = 256 bits
+
+
+def content_hash(image_bytes):
+    """SHA-256 of the encoded image bytes (catches byte-identical re-uploads)"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes, size=HASH_SIZE):
+    """
+    Difference hash of the image as `size * size` bits packed into bytes, or None
+    if the bytes cannot be decoded. Stays within a few bits for resized,
+    re-encoded or slightly brightened copies of the same photo.
+    """
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        if image.format == 'JPEG':
+            # Decode at a fraction of the resolution; the hash only needs a thumbnail
+            image.draft('L', (size * 8, size * 8))
+        image = ImageOps.exif_transpose(image).convert('L').resize((size + 1, size), Image.BILINEAR)
+    except Exception:
+        return None
+    pixels = np.asarray(image, dtype=np.int16)
+    return np.packbits(pixels[:, 1:] > pixels[:, :-1]).tobytes()
+
+
+class DedupIndex:
+    """
+    Persisted image hash -> doc_id index used to skip OCR and LLM extraction
+    for receipts that were already ingested.
+
+    Only an exact content hash is a match on its own (lookup). The closest
+    perceptual hash within `max_distance` bits (0 disables it) is just a
+    candidate (nearest): receipts printed from the same template can hash that
+    close, so the caller confirms it against the extracted fields before
+    skipping the write (see ReceiptProcessor.confirm_duplicate).
+    Perceptual hashes are held in memory and topped up from the table on each
+    lookup, so rows added by other processes are seen too.
+    """
+    def __init__(self, db_path=RECEIPT_PATH, max_distance=6):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.lock = Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.perceptual_rejected = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._init_table()
+
+        self._phashes = np.empty((0, HASH_SIZE * HASH_SIZE // 8), dtype=np.uint8)
+        self._phash_doc_ids = []
+        self._phash_digests = []
+        self._last_rowid = 0
+        with self.lock:
+            self._load_new_rows()
+
+    def _init_table(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_hashes (
+                    content_hash TEXT PRIMARY KEY,
+                    phash BLOB,
+                    doc_id TEXT NOT NULL,
+                    created_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_image_hashes_doc_id ON image_hashes (doc_id)")
+
+    def _load_new_rows(self):
+        rows = self.conn.execute(
+            "SELECT rowid, content_hash, phash, doc_id FROM image_hashes WHERE rowid>? ORDER BY rowid", (self._last_rowid,)
+        ).fetchall()
+        if not rows:
+            return
+        self._last_rowid = rows[-1][0]
+        # A replaced content hash comes back under a new rowid: drop the entry it replaced
+        digests = {digest for _, digest, _, _ in rows}
+        self._evict(lambda i: self._phash_digests[i] in digests)
+        rows = [(digest, phash, doc_id) for _, digest, phash, doc_id in rows if phash is not None]
+        if rows:
+            new = np.frombuffer(b"".join(phash for _, phash, _ in rows), dtype=np.uint8).reshape(len(rows), -1)
+            self._phashes = np.vstack([self._phashes, new])
+            self._phash_doc_ids.extend(doc_id for _, _, doc_id in rows)
+            self._phash_digests.extend(digest for digest, _, _ in rows)
+
+    def _evict(self, drop):
+        """Remove the in-memory perceptual hashes at the indexes where drop(i) is true"""
+        keep = [i for i in range(len(self._phash_doc_ids)) if not drop(i)]
+        if len(keep) != len(self._phash_doc_ids):
+            self._phashes = self._phashes[keep]
+            self._phash_doc_ids = [self._phash_doc_ids[i] for i in keep]
+            self._phash_digests = [self._phash_digests[i] for i in keep]
+
+    # ---------------- Lookup ----------------
+    def hash_image(self, image_bytes):
+        """Return the (content_hash, perceptual_hash) pair stored for an image"""
+        return content_hash(image_bytes), perceptual_hash(image_bytes)
+
+    def lookup(self, hashes, exists=None):
+        """
+        Return the doc_id of a previously ingested byte-identical copy of the image, or None.
+        `exists(doc_id)` can veto a match whose receipt is gone; its hashes are then dropped.
+        """
+        digest, _ = hashes
+        with self.lock:
+            row = self.conn.execute("SELECT doc_id FROM image_hashes WHERE content_hash=?", (digest,)).fetchone()
+            if row and self._still_exists(row[0], exists):
+                self.exact_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def nearest(self, hashes, exists=None):
+        """doc_id of the closest perceptual hash within max_distance bits: a candidate copy, or None"""
+        _, phash = hashes
+        if phash is None or self.max_distance <= 0:
+            return None
+        with self.lock:
+            self._load_new_rows()
+            if not self._phash_doc_ids:
+                return None
+            query = np.frombuffer(phash, dtype=np.uint8)
+            distances = np.unpackbits(self._phashes ^ query, axis=1).sum(axis=1)
+            best = int(np.argmin(distances))
+            doc_id = self._phash_doc_ids[best]
+            if distances[best] <= self.max_distance and self._still_exists(doc_id, exists):
+                return doc_id
+            return None
+
+    def record_candidate(self, confirmed):
+        """Count a nearest() candidate the caller confirmed (a hit, no longer a miss) or rejected"""
+        with self.lock:
+            if confirmed:
+                self.perceptual_hits += 1
+                self.misses -= 1
+            else:
+                self.perceptual_rejected += 1
+
+    def _still_exists(self, doc_id, exists):
+        if exists is None or exists(doc_id):
+            return True
+        self._remove(doc_id)
+        return False
+
+    # ---------------- Updates ----------------
+    def add(self, hashes, doc_id):
+        self.add_many([(hashes, doc_id)])
+
+    def add_many(self, entries):
+        """Record ((content_hash, perceptual_hash), doc_id) pairs for ingested images"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO image_hashes (content_hash, phash, doc_id, created_at)
+                VALUES (?, ?, ?, ?)
+            """, [(digest, phash, doc_id, now) for (digest, phash), doc_id in entries])
+            self._load_new_rows()
+
+    def remove(self, doc_id):
+        """Forget every image hash pointing at a doc_id (e.g. the receipt was deleted)"""
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM image_hashes WHERE doc_id=?", (doc_id,))
+        self._evict(lambda i: self._phash_doc_ids[i] == doc_id)
+
+    # ---------------- Stats ----------------
+    def stats(self):
+        with self.lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            return {
+                "lookups": lookups,
+                "exact_hits": self.exact_hits,
+                "perceptual_hits": self.perceptual_hits,
+                "perceptual_rejected": self.perceptual_rejected,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.perceptual_hits) / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        self.conn.close()
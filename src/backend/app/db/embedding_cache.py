@@ -0,0 +1,123 @@
+# src/backend/db/embedding_cache.py
+import re
+import sqlite3
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Size-bounded LRU cache of embeddings keyed by hash(model name + normalized text),
+    with an optional SQLite tier that survives restarts.
+    """
+    def __init__(self, model_name, max_size=4096, persist_path=None):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.conn = None
+        if persist_path:
+            self.conn = sqlite3.connect(persist_path, check_same_thread=False)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB
+                )
+            """)
+            self.conn.commit()
+
+    # ---------------- Keys ----------------
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize("NFKC", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    def key(self, text):
+        payload = f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    # ---------------- Lookup ----------------
+    def get(self, text):
+        """
+        Return the cached embedding for text, or None on a miss
+        """
+        key = self.key(text)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT vector FROM embedding_cache WHERE key=?", (key,)
+                ).fetchone()
+                if row:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._put_memory(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, text, vector):
+        return self.put_many([text], [vector])[0]
+
+    def put_many(self, texts, vectors):
+        """
+        Cache a batch of embeddings (one SQLite commit). Returns read-only float32 copies.
+        """
+        entries = []
+        for text, vector in zip(texts, vectors):
+            vector = np.array(vector, dtype=np.float32).reshape(-1)
+            vector.setflags(write=False)
+            entries.append((self.key(text), vector))
+        with self.lock:
+            for key, vector in entries:
+                self._put_memory(key, vector)
+            if self.conn is not None:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in entries]
+                )
+                self.conn.commit()
+        return [vector for _, vector in entries]
+
+    def _put_memory(self, key, vector):
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    # ---------------- Stats ----------------
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
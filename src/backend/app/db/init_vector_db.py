@@ -1,20 +1,22 @@
 # src/backend/db/init_vector_db.py
 import os
 from vector_service import VectorService
+from vector_store import VectorStore
 
 DB_PATH = "/app/src/backend/app/db/vector_db.pkl"
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 def init_vector_db(db_path="vector_db.pkl", embedding_model="all-MiniLM-L6-v2"):
     """
-    Initialize vector DB (pickle file) using VectorService.
+    Initialize vector DB (append-only store next to db_path) using VectorService.
+    A legacy pickle at db_path is migrated on first load.
     Preloads embedding model.
     """
-    if os.path.exists(db_path):
+    if VectorStore(os.path.splitext(db_path)[0]).exists():
         print(f"Vector DB already exists at {db_path}")
     else:
-        # Initialize VectorService which creates the pickle file and loads the embedding model
+        # Initialize VectorService which migrates/creates the store and loads the embedding model
         vector_service = VectorService(db_path=db_path, embedding_model=embedding_model)
-        vector_service._save()  # explicitly save empty vectors
+        vector_service._save()  # explicitly create the empty store
         print(f"Vector DB initialized at {db_path} with embedding model '{embedding_model}'")
 
     # Preload embedding model even if DB exists
@@ -0,0 +1,145 @@
+# src/backend/db/job_queue.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+from threading import Condition, Lock
+
+DB_DIR = "/app/src/backend/app/db"
+JOBS_PATH = os.path.join(DB_DIR, "jobs.db")
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.enqueue when max_pending jobs are already waiting."""
+
+
+class JobQueue:
+    """
+    Durable FIFO of ingestion jobs backed by a SQLite table.
+
+    Job states: queued -> running -> done | failed.
+    Jobs left 'running' for more than `stale_after` seconds (a crashed worker)
+    are re-queued when the queue is opened.
+    Workers in other processes see new jobs on their next claim() poll.
+    """
+    def __init__(self, db_path=JOBS_PATH, max_pending=100, stale_after=600):
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self.lock = Lock()
+        self.available = Condition(self.lock)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._init_table()
+
+    def _init_table(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT,
+                    result_json TEXT,
+                    error TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, created_at)")
+            now = time.time()
+            self.conn.execute(
+                "UPDATE ingest_jobs SET status='queued', updated_at=? WHERE status='running' AND updated_at<?",
+                (now, now - self.stale_after)
+            )
+
+    # ---------------- Producer ----------------
+    def enqueue(self, payload):
+        """
+        Add a job and return its id. Raises QueueFullError for back-pressure.
+        The payload is a base64 string or raw image bytes (stored as a BLOB).
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            pending = self.conn.execute("SELECT COUNT(*) FROM ingest_jobs WHERE status='queued'").fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Ingestion queue is full ({pending} jobs pending)")
+            with self.conn:
+                self.conn.execute("""
+                    INSERT INTO ingest_jobs (job_id, status, payload, created_at, updated_at)
+                    VALUES (?, 'queued', ?, ?, ?)
+                """, (job_id, payload, now, now))
+            self.available.notify()
+        return job_id
+
+    # ---------------- Consumer ----------------
+    def claim(self, timeout=None):
+        """
+        Mark the oldest queued job as running and return (job_id, payload).
+        Blocks up to `timeout` seconds; returns None if nothing arrived.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while True:
+                row = self.conn.execute("""
+                    SELECT job_id, payload FROM ingest_jobs
+                    WHERE status='queued' ORDER BY created_at LIMIT 1
+                """).fetchone()
+                if row:
+                    # Conditional update so two processes sharing the DB cannot claim the same job
+                    with self.conn:
+                        claimed = self.conn.execute("""
+                            UPDATE ingest_jobs SET status='running', attempts=attempts+1, updated_at=?
+                            WHERE job_id=? AND status='queued'
+                        """, (time.time(), row[0])).rowcount
+                    if claimed:
+                        return row
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.available.wait(remaining)
+
+    def complete(self, job_id, result):
+        self._finish(job_id, "done", result_json=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._finish(job_id, "failed", error=str(error))
+
+    def _finish(self, job_id, status, result_json=None, error=None):
+        # The image payload is no longer needed once a job is finished
+        with self.lock, self.conn:
+            self.conn.execute("""
+                UPDATE ingest_jobs SET status=?, result_json=?, error=?, payload=NULL, updated_at=?
+                WHERE job_id=?
+            """, (status, result_json, error, time.time(), job_id))
+
+    # ---------------- Status ----------------
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT job_id, status, result_json, error, attempts, created_at, updated_at
+                FROM ingest_jobs WHERE job_id=?
+            """, (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "result": json.loads(row[2]) if row[2] else None,
+            "error": row[3],
+            "attempts": row[4],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,26 @@
+# src/backend/db/migrate_vector_db.py
+import os
+import sys
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.vector_store import VectorStore, migrate_pickle
+
+DB_DIR = "/app/src/backend/app/db"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a legacy vector_db.pkl into the append-only vector store.")
+    parser.add_argument("--pickle", default=os.path.join(DB_DIR, "vector_db.pkl"), help="Legacy pickle file")
+    parser.add_argument("--force", action="store_true", help="Overwrite an existing store")
+    args = parser.parse_args()
+
+    store = VectorStore(os.path.splitext(args.pickle)[0])
+    if store.exists() and not args.force:
+        print(f"Vector store already exists at {store.base_path}.*, use --force to overwrite.")
+        sys.exit(1)
+
+    count = migrate_pickle(args.pickle, store)
+    store.close()
+    print(f"Migrated {count} vectors from {args.pickle} to {store.base_path}.*")
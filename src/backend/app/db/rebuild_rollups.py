@@ -0,0 +1,44 @@
+# src/backend/db/rebuild_rollups.py
+import os
+import sys
+import time
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.receipt_db import ReceiptDB
+
+DB_DIR = "/app/src/backend/app/db"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the spending rollup tables against a full recompute from the receipts, "
+                    "then rebuild them if they differ (exit code 1 if they differed)."
+    )
+    parser.add_argument("--db-dir", default=DB_DIR, help="Directory holding receipts.db")
+    parser.add_argument("--verify-only", action="store_true", help="Report mismatches without rebuilding")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the rollups match")
+    args = parser.parse_args()
+
+    receipt_db = ReceiptDB(db_path=os.path.join(args.db_dir, "receipts.db"))
+
+    start = time.perf_counter()
+    mismatches = receipt_db.verify_rollups()
+    print(f"Verified rollups in {time.perf_counter() - start:.2f}s: {len(mismatches)} mismatches")
+    for line in mismatches[:20]:
+        print(f"  {line}")
+    if len(mismatches) > 20:
+        print(f"  ... and {len(mismatches) - 20} more")
+
+    if (mismatches or args.force) and not args.verify_only:
+        start = time.perf_counter()
+        counts = receipt_db.rebuild_rollups()
+        print(f"Rebuilt rollups in {time.perf_counter() - start:.2f}s: {counts}")
+        remaining = receipt_db.verify_rollups()
+        if remaining:
+            print(f"Still {len(remaining)} mismatches after rebuild (receipts changed meanwhile?)")
+
+    receipt_db.close()
+    sys.exit(1 if mismatches else 0)
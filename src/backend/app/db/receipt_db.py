@@ -1,23 +1,58 @@
 # src/backend/db/receipt_db.py
 import sqlite3
 import json
+import re
+import threading
 from db.vector_service import VectorService
+from db.dates import normalize_date
+from db.amounts import normalize_amount, normalize_items
 import os
 
 DB_DIR = "/app/src/backend/app/db"
 RECEIPT_PATH = os.path.join(DB_DIR, "receipts.db")
+ISO_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
 
 class ReceiptDB:
     """
     Handles SQLite receipt storage and optional embedding generation.
+    Each thread gets its own connection (WAL mode), so readers never block
+    on an in-flight ingest and the object can be shared across request threads.
     """
     def __init__(self, db_path=RECEIPT_PATH, vector_service: VectorService = None):
         self.db_path = db_path
         self.vector_service = vector_service
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        # (corpus_version, names) of the last vendors() scan
+        self._vendors = None
         self._init_table()
 
+    # ---------------- Connections ----------------
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+            with self._connections_lock:
+                # Request threads come and go; close connections left by finished ones
+                for thread, old_conn in list(self._connections.values()):
+                    if not thread.is_alive():
+                        old_conn.close()
+                        del self._connections[thread.ident]
+                current = threading.current_thread()
+                self._connections[current.ident] = (current, conn)
+        return conn
+
+    @property
+    def cursor(self):
+        self.conn
+        return self._local.cursor
+
     def _init_table(self):
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS receipts (
@@ -29,49 +64,784 @@ class ReceiptDB:
                 items_json TEXT
             )
         """)
+        # Indexes for structured filters (see filter_doc_ids / aggregate_receipts)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_date ON receipts (date_of_purchase)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_vendor ON receipts (vendor COLLATE NOCASE)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_total ON receipts (total_amount)")
+
+        # Line items, one row per item, kept in sync with items_json
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS receipt_items (
+                id INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                name TEXT,
+                price REAL
+            )
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipt_items_doc_id ON receipt_items (doc_id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipt_items_name ON receipt_items (name COLLATE NOCASE)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipt_items_price ON receipt_items (price)")
+
+        # Vendor and item names per receipt, and a full-text index over them for BM25 search.
+        # The FTS table is external-content: its rowids are receipt_search ids.
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS receipt_search (
+                id INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL UNIQUE,
+                vendor TEXT,
+                items TEXT
+            )
+        """)
+        try:
+            self.cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS receipts_fts
+                USING fts5(vendor, items, content='receipt_search', content_rowid='id',
+                           tokenize='unicode61 remove_diacritics 2')
+            """)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            print("SQLite was built without FTS5, lexical search disabled")
+            self.fts_enabled = False
+        # Bumped by every receipt write; lets caches of derived answers detect changes
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS receipt_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        """)
+        self._init_rollups()
         self.conn.commit()
+        self._normalize_dates()
+        self._normalize_amounts()
+        self._backfill_items()
+        if self.cursor.execute("SELECT 1 FROM receipt_meta WHERE key='rollups'").fetchone() is None:
+            self.rebuild_rollups()
+            print("Built spending rollups")
+
+    def _normalize_dates(self):
+        """Rewrite non-ISO date_of_purchase values (rows stored before dates were normalized)"""
+        rows = self.cursor.execute("""
+            SELECT doc_id, date_of_purchase, currency FROM receipts
+            WHERE date_of_purchase NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+        """).fetchall()
+        updates = []
+        for doc_id, value, currency in rows:
+            iso = normalize_date(value, currency)
+            if iso != value:
+                updates.append((iso, doc_id))
+        if updates:
+            with self.conn:
+                self.cursor.executemany("UPDATE receipts SET date_of_purchase=? WHERE doc_id=?", updates)
+                # Rollups are keyed by date: rebuild them
+                self.cursor.execute("DELETE FROM receipt_meta WHERE key='rollups'")
+            print(f"Normalized {len(updates)} receipt dates to ISO format")
+
+    def _normalize_amounts(self):
+        """Parse text totals / item prices (rows stored before amounts were normalized on write)"""
+        rows = self.cursor.execute("""
+            SELECT doc_id, vendor, total_amount, currency, items_json FROM receipts
+            WHERE typeof(total_amount) = 'text' OR items_json LIKE '%: "%'
+        """).fetchall()
+        updates = []
+        for doc_id, vendor, total, currency, items_json in rows:
+            items = json.loads(items_json or "{}")
+            amount, normalized = normalize_amount(total, currency), normalize_items(items, currency)
+            if amount != total or normalized != items:
+                updates.append((doc_id, vendor, amount, normalized))
+        if updates:
+            with self.conn:
+                self.cursor.executemany("UPDATE receipts SET total_amount=?, items_json=? WHERE doc_id=?",
+                                        [(amount, json.dumps(items), doc_id) for doc_id, _, amount, items in updates])
+                self._index_items([(doc_id, vendor, items) for doc_id, vendor, _, items in updates])
+                # Rollups summed the old values: rebuild them
+                self.cursor.execute("DELETE FROM receipt_meta WHERE key='rollups'")
+            print(f"Normalized amounts of {len(updates)} receipts")
+
+    def _backfill_items(self):
+        """Fill receipt_items / receipts_fts for receipts stored before those tables existed"""
+        rows = self.cursor.execute("""
+            SELECT doc_id, vendor, items_json FROM receipts r
+            WHERE NOT EXISTS (SELECT 1 FROM receipt_search s WHERE s.doc_id = r.doc_id)
+        """).fetchall()
+        if rows:
+            with self.conn:
+                self._index_items([(doc_id, vendor, json.loads(items or "{}")) for doc_id, vendor, items in rows])
+            print(f"Indexed line items of {len(rows)} receipts")
+
+    # ---------------- Line items ----------------
+    def _index_items(self, records):
+        """
+        Replace the receipt_items and search rows of (doc_id, vendor, items) records
+        (prices already normalized). Runs inside the caller's transaction.
+        """
+        self._remove_items([doc_id for doc_id, _, _ in records])
+        self.cursor.executemany("INSERT INTO receipt_items (doc_id, name, price) VALUES (?, ?, ?)", [
+            (doc_id, name, price)
+            for doc_id, _, items in records if isinstance(items, dict)
+            for name, price in items.items()
+        ])
+        for doc_id, vendor, items in records:
+            names = "\n".join(items) if isinstance(items, dict) else ""
+            self.cursor.execute("INSERT INTO receipt_search (doc_id, vendor, items) VALUES (?, ?, ?)",
+                                (doc_id, vendor or "", names))
+            if self.fts_enabled:
+                self.cursor.execute("INSERT INTO receipts_fts (rowid, vendor, items) VALUES (?, ?, ?)",
+                                    (self.cursor.lastrowid, vendor or "", names))
+
+    def _remove_items(self, doc_ids):
+        """Drop the receipt_items and search rows of doc_ids (inside the caller's transaction)"""
+        self.cursor.executemany("DELETE FROM receipt_items WHERE doc_id=?", [(doc_id,) for doc_id in doc_ids])
+        for doc_id in doc_ids:
+            row = self.cursor.execute("SELECT id, vendor, items FROM receipt_search WHERE doc_id=?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            if self.fts_enabled:
+                # External-content FTS rows are removed by replaying their indexed values
+                self.cursor.execute("INSERT INTO receipts_fts (receipts_fts, rowid, vendor, items) VALUES ('delete', ?, ?, ?)", row)
+            self.cursor.execute("DELETE FROM receipt_search WHERE id=?", (row[0],))
+
+    # ---------------- Corpus version ----------------
+    def _bump_corpus_version(self):
+        """Runs inside the caller's transaction"""
+        self.cursor.execute("""
+            INSERT INTO receipt_meta (key, value) VALUES ('corpus_version', 1)
+            ON CONFLICT (key) DO UPDATE SET value = value + 1
+        """)
+
+    def corpus_version(self):
+        """Counter increased by every add / delete (also by other processes sharing the DB)"""
+        row = self.cursor.execute("SELECT value FROM receipt_meta WHERE key='corpus_version'").fetchone()
+        return row[0] if row else 0
 
     # ---------------- CRUD ----------------
     def add_receipt(self, doc_id, date, vendor, total, currency, items):
-        self.cursor.execute("""
-            INSERT OR REPLACE INTO receipts (doc_id, date_of_purchase, vendor, total_amount, currency, items_json)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (doc_id, date, vendor, total, currency, json.dumps(items)))
-        self.conn.commit()
+        # Amounts are stored as numbers, so filters, SQL aggregates and rollups all see the same value
+        date = normalize_date(date, currency)
+        total, items = normalize_amount(total, currency), normalize_items(items, currency)
+        with self.conn:
+            # Write lock before reading the row being replaced, so its rollup delta can't race another writer
+            self.cursor.execute("BEGIN IMMEDIATE")
+            replaced = self._rollup_rows([doc_id])
+            self.cursor.execute("""
+                INSERT OR REPLACE INTO receipts (doc_id, date_of_purchase, vendor, total_amount, currency, items_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (doc_id, date, vendor, total, currency, json.dumps(items)))
+            self._index_items([(doc_id, vendor, items)])
+            self._update_rollups(replaced, [(date, vendor, total, currency, items)])
+            self._bump_corpus_version()
 
         # Add vector if vector_service is provided
         if self.vector_service:
-            text = f"Vendor: {vendor}, Items: {', '.join(items.keys())}, Total: {total} {currency}"
-            self.vector_service.add_vector(doc_id, text)
+            self.vector_service.add_vector(doc_id, self._vector_text(vendor, total, currency, items))
 
-    def get_receipt(self, doc_id):
-        self.cursor.execute("SELECT * FROM receipts WHERE doc_id=?", (doc_id,))
-        row = self.cursor.fetchone()
-        if not row:
-            return None
-        return {
+    def add_receipts(self, rows, batch_size=64):
+        """
+        Bulk insert receipts in a single transaction, then embed them in batches.
+
+        Each row is a dict shaped like ReceiptProcessor's extraction output:
+        doc_id, date_of_purchase, vendor, total_amount, currency, items_json
+        """
+        records = [
+            (
+                row["doc_id"],
+                normalize_date(row.get("date_of_purchase"), row.get("currency")),
+                row.get("vendor"),
+                normalize_amount(row.get("total_amount"), row.get("currency")),
+                row.get("currency"),
+                normalize_items(row.get("items_json") or {}, row.get("currency"))
+            )
+            for row in rows
+        ]
+        # A doc_id repeated in the batch ends up as its last row
+        latest = {r[0]: r for r in records}
+        with self.conn:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            replaced = self._rollup_rows(list(latest))
+            self.cursor.executemany("""
+                INSERT OR REPLACE INTO receipts (doc_id, date_of_purchase, vendor, total_amount, currency, items_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(d, dt, v, t, c, json.dumps(items)) for d, dt, v, t, c, items in records])
+            self._index_items([(d, v, items) for d, _, v, _, _, items in latest.values()])
+            self._update_rollups(replaced, [(dt, v, t, c, items) for _, dt, v, t, c, items in latest.values()])
+            self._bump_corpus_version()
+
+        if self.vector_service:
+            doc_ids = [r[0] for r in records]
+            texts = [self._vector_text(v, t, c, items) for _, _, v, t, c, items in records]
+            self.vector_service.add_vectors(doc_ids, texts, batch_size=batch_size)
+        return len(records)
+
+    @staticmethod
+    def _vector_text(vendor, total, currency, items):
+        return f"Vendor: {vendor}, Items: {', '.join(items.keys())}, Total: {total} {currency}"
+
+    def delete_receipt(self, doc_id):
+        with self.conn:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self._update_rollups(self._rollup_rows([doc_id]), [])
+            self.cursor.execute("DELETE FROM receipts WHERE doc_id=?", (doc_id,))
+            self._remove_items([doc_id])
+            self._bump_corpus_version()
+
+        if self.vector_service:
+            self.vector_service.remove_vector(doc_id)
+
+    COLUMNS = "doc_id, date_of_purchase, vendor, total_amount, currency, items_json"
+    # Stay well under SQLite's bound-parameter limit (999 on older builds)
+    MAX_IN_PARAMS = 500
+
+    @staticmethod
+    def _row_to_receipt(row, parse_items=True):
+        receipt = {
             "doc_id": row[0],
             "date_of_purchase": row[1],
             "vendor": row[2],
             "total_amount": row[3],
-            "currency": row[4],
-            "items": json.loads(row[5])
+            "currency": row[4]
         }
+        if parse_items:
+            receipt["items"] = json.loads(row[5])
+        else:
+            receipt["items_json"] = row[5]
+        return receipt
+
+    @staticmethod
+    def load_items(receipt):
+        """Parse a receipt's items_json on demand (see get_receipts(parse_items=False))"""
+        if "items" not in receipt:
+            receipt["items"] = json.loads(receipt.pop("items_json"))
+        return receipt["items"]
+
+    def get_receipt(self, doc_id):
+        self.cursor.execute(f"SELECT {self.COLUMNS} FROM receipts WHERE doc_id=?", (doc_id,))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return self._row_to_receipt(row)
+
+    def get_receipts(self, doc_ids, parse_items=True):
+        """
+        Fetch many receipts with one IN (...) query per MAX_IN_PARAMS ids.
+        Returns them in the order of doc_ids (e.g. search ranking), skipping unknown ids.
+        With parse_items=False the raw "items_json" string is kept instead of "items";
+        call load_items(receipt) for the ones whose items are actually needed.
+        """
+        unique_ids = list(dict.fromkeys(doc_ids))
+        rows = {}
+        for start in range(0, len(unique_ids), self.MAX_IN_PARAMS):
+            chunk = unique_ids[start:start + self.MAX_IN_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.cursor.execute(f"SELECT {self.COLUMNS} FROM receipts WHERE doc_id IN ({placeholders})", chunk):
+                rows[row[0]] = row
+        return [self._row_to_receipt(rows[doc_id], parse_items) for doc_id in doc_ids if doc_id in rows]
 
     def query_all_receipts(self):
-        self.cursor.execute("SELECT * FROM receipts")
-        rows = self.cursor.fetchall()
+        """Every receipt as a list; prefer iter_receipts for large tables"""
+        return list(self.iter_receipts())
+
+    # ---------------- Iteration ----------------
+    FIELDS = ("doc_id", "date_of_purchase", "vendor", "total_amount", "currency", "items", "items_json")
+    ORDERINGS = ("doc_id", "date")
+
+    @staticmethod
+    def _keyset_clause(order_by, descending, after):
+        """WHERE condition selecting rows strictly after the `after` key in the given order"""
+        if order_by == "doc_id":
+            return ("doc_id < ?" if descending else "doc_id > ?"), [after]
+        last_date, last_id = after
+        # NULL dates sort first ascending and last descending
+        if last_date is None:
+            if descending:
+                return "(date_of_purchase IS NULL AND doc_id < ?)", [last_id]
+            return "(date_of_purchase IS NOT NULL OR doc_id > ?)", [last_id]
+        if descending:
+            return ("(date_of_purchase < ? OR date_of_purchase IS NULL OR (date_of_purchase = ? AND doc_id < ?))",
+                    [last_date, last_date, last_id])
+        return "(date_of_purchase > ? OR (date_of_purchase = ? AND doc_id > ?))", [last_date, last_date, last_id]
+
+    def iter_receipts(self, order_by="doc_id", descending=False, fields=None, filters=None,
+                      after=None, batch_size=500, page_size=5000):
+        """
+        Yield receipts one at a time without loading the table into memory.
+
+        Rows are read in keyset-paginated pages of `page_size` (each a short query,
+        so no read snapshot stays open for the whole scan) and fetched from SQLite
+        `batch_size` at a time.
+
+        Args:
+            order_by: "doc_id" or "date" (date_of_purchase, ties broken by doc_id)
+            descending: Reverse the order (newest first for "date")
+            fields: Subset of FIELDS to return (doc_id is always included); "items"
+                is the parsed item dict, "items_json" the raw string. Default: all but items_json
+            filters: Structured filters (see _filter_clause)
+            after: Resume after this key: a doc_id, or (date_of_purchase, doc_id) for "date"
+                   (see receipts_page)
+        """
+        for _, receipt in self._iter_keyed(order_by, descending, fields, filters, after, batch_size, page_size):
+            yield receipt
+
+    def receipts_page(self, limit=50, order_by="doc_id", descending=False, fields=None, filters=None, after=None):
+        """
+        One page of iter_receipts: (receipts, next_after), where next_after is the
+        key to pass as `after` for the following page, or None on the last page
+        """
+        receipts, keys = [], []
+        for key, receipt in self._iter_keyed(order_by, descending, fields, filters, after,
+                                             batch_size=limit + 1, page_size=limit + 1):
+            if len(receipts) == limit:
+                return receipts, keys[-1]
+            receipts.append(receipt)
+            keys.append(key)
+        return receipts, None
+
+    def _iter_keyed(self, order_by, descending, fields, filters, after, batch_size, page_size):
+        """(keyset key, receipt) pairs for iter_receipts / receipts_page"""
+        if order_by not in self.ORDERINGS:
+            raise ValueError(f"Unknown order_by: {order_by}")
+        fields = [f for f in (fields or self.FIELDS[:-1]) if f != "doc_id"]
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        columns = ["doc_id", "date_of_purchase"] + [
+            "items_json" if f == "items" else f for f in fields if f != "date_of_purchase"
+        ]
+        direction = " DESC" if descending else ""
+        order = f"doc_id{direction}" if order_by == "doc_id" else f"date_of_purchase{direction}, doc_id{direction}"
+        where, params = self._filter_clause(filters or {})
+        # A cursor of its own, so other queries on this thread don't reset the scan
+        cursor = self.conn.cursor()
+        try:
+            while True:
+                clauses, page_params = [where[len(" WHERE "):]] if where else [], list(params)
+                if after is not None:
+                    clause, keyset_params = self._keyset_clause(order_by, descending, after)
+                    clauses.append(clause)
+                    page_params += keyset_params
+                sql = f"SELECT {', '.join(columns)} FROM receipts"
+                if clauses:
+                    sql += " WHERE " + " AND ".join(clauses)
+                cursor.execute(sql + f" ORDER BY {order} LIMIT ?", page_params + [page_size])
+
+                count = 0
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        count += 1
+                        values = dict(zip(columns, row))
+                        after = values["doc_id"] if order_by == "doc_id" else (values["date_of_purchase"], values["doc_id"])
+                        receipt = {"doc_id": values["doc_id"]}
+                        for f in fields:
+                            if f == "items":
+                                receipt["items"] = json.loads(values["items_json"] or "{}")
+                            else:
+                                receipt[f] = values[f]
+                        yield after, receipt
+                if count < page_size:
+                    return
+        finally:
+            cursor.close()
+
+    # ---------------- Structured filters ----------------
+    def _filter_clause(self, filters):
+        """
+        WHERE clause and params over receipts for structured filters, all optional and ANDed:
+        date_from / date_to (ISO, inclusive), vendor (see _vendor_clause), min_amount /
+        max_amount, currency
+        """
+        clauses, params = [], []
+        if filters.get("date_from") or filters.get("date_to"):
+            # Dates that could not be normalized never match a date range
+            clauses.append("date_of_purchase GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'")
+        if filters.get("date_from"):
+            clauses.append("date_of_purchase >= ?")
+            params.append(filters["date_from"])
+        if filters.get("date_to"):
+            clauses.append("date_of_purchase <= ?")
+            params.append(filters["date_to"])
+        if filters.get("vendor"):
+            clause, vendor_params = self._vendor_clause(filters["vendor"])
+            clauses.append(clause)
+            params += vendor_params
+        if filters.get("min_amount") is not None:
+            clauses.append("total_amount >= ?")
+            params.append(filters["min_amount"])
+        if filters.get("max_amount") is not None:
+            clauses.append("total_amount <= ?")
+            params.append(filters["max_amount"])
+        if filters.get("currency"):
+            clauses.append("currency = ? COLLATE NOCASE")
+            params.append(filters["currency"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _vendor_prefix(vendor):
+        """LIKE pattern for names starting with `vendor` (wildcards in it escaped with \\)"""
+        return vendor.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    def _vendor_clause(self, vendor):
+        """
+        Case-insensitive match of `vendor` at the start of the name or of a word in it.
+        The name prefix is a LIKE range on idx_receipts_vendor; words inside the name come
+        from a prefix phrase query on receipts_fts (a "% word" LIKE would scan every row).
+        """
+        prefix = self._vendor_prefix(vendor)
+        if not self.fts_enabled:
+            return "(vendor LIKE ? ESCAPE '\\' OR vendor LIKE ? ESCAPE '\\')", [prefix, f"% {prefix}"]
+        words = re.findall(r"\w+", vendor.lower())
+        if not words:
+            return "vendor LIKE ? ESCAPE '\\'", [prefix]
+        return """(vendor LIKE ? ESCAPE '\\' OR doc_id IN (
+            SELECT s.doc_id FROM receipts_fts JOIN receipt_search s ON s.id = receipts_fts.rowid
+            WHERE receipts_fts MATCH ?
+        ))""", [prefix, f'vendor : "{" ".join(words)}" *']
+
+    def filter_doc_ids(self, filters, limit=None):
+        """doc_ids of receipts matching the filters, newest first"""
+        where, params = self._filter_clause(filters)
+        sql = f"SELECT doc_id FROM receipts{where} ORDER BY date_of_purchase DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [row[0] for row in self.cursor.execute(sql, params).fetchall()]
+
+    def aggregate_receipts(self, filters):
+        """
+        Count / sum / average / min / max of total_amount over every receipt
+        matching the filters, one row per currency (amounts are never mixed)
+        """
+        where, params = self._filter_clause(filters)
+        rows = self.cursor.execute(f"""
+            SELECT currency, COUNT(*), SUM(total_amount), AVG(total_amount), MIN(total_amount), MAX(total_amount),
+                   MIN(date_of_purchase), MAX(date_of_purchase)
+            FROM receipts{where}
+            GROUP BY currency ORDER BY COUNT(*) DESC
+        """, params).fetchall()
+        return [
+            {
+                "currency": row[0],
+                "count": row[1],
+                "total": row[2],
+                "average": row[3],
+                "min": row[4],
+                "max": row[5],
+                "first_date": row[6],
+                "last_date": row[7]
+            }
+            for row in rows
+        ]
+
+    # ---------------- Rollups ----------------
+    # Receipt count, total and item count per (day | month, vendor, currency), and count / total per
+    # (month, item name, currency). Kept up to date by add / delete in the same transaction, so
+    # breakdowns read a few pre-summed rows instead of scanning receipts. Unparseable dates roll up
+    # under period "", a missing vendor or currency under "".
+    ROLLUP_TABLES = {"day": "rollup_daily", "month": "rollup_monthly", "item": "rollup_items"}
+    ROLLUP_GROUPS = ("day", "month", "vendor")
+
+    def _init_rollups(self):
+        for table in ("rollup_daily", "rollup_monthly"):
+            self.cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    period TEXT NOT NULL,
+                    vendor TEXT NOT NULL,
+                    currency TEXT NOT NULL,
+                    receipts INTEGER NOT NULL,
+                    total REAL NOT NULL,
+                    items INTEGER NOT NULL,
+                    PRIMARY KEY (period, vendor, currency)
+                )
+            """)
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_items (
+                period TEXT NOT NULL,
+                name TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                total REAL NOT NULL,
+                PRIMARY KEY (period, name, currency)
+            )
+        """)
+
+    def _rollup_rows(self, doc_ids):
+        """(date, vendor, total, currency, items) of the stored receipts among doc_ids"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        rows = []
+        for i in range(0, len(doc_ids), self.MAX_IN_PARAMS):
+            chunk = doc_ids[i:i + self.MAX_IN_PARAMS]
+            rows += self.cursor.execute(f"""
+                SELECT date_of_purchase, vendor, total_amount, currency, items_json FROM receipts
+                WHERE doc_id IN ({",".join("?" * len(chunk))})
+            """, chunk).fetchall()
+        return [(date, vendor, total, currency, json.loads(items or "{}")) for date, vendor, total, currency, items in rows]
+
+    @staticmethod
+    def _rollup_deltas(rows, sign, deltas=None):
+        """
+        Add sign * the contribution of (date, vendor, total, currency, items) rows to
+        deltas: {"day" | "month": {(period, vendor, currency): [receipts, total, items]},
+                 "item": {(month, name, currency): [count, total]}}
+        """
+        deltas = deltas or {"day": {}, "month": {}, "item": {}}
+        for date, vendor, total, currency, items in rows:
+            day = date if isinstance(date, str) and ISO_DAY_RE.match(date) else ""
+            vendor, currency = vendor or "", currency or ""
+            items = items if isinstance(items, dict) else {}
+            amount = total if isinstance(total, (int, float)) else 0.0
+            for period, key in (("day", day), ("month", day[:7])):
+                entry = deltas[period].setdefault((key, vendor, currency), [0, 0.0, 0])
+                entry[0] += sign
+                entry[1] += sign * amount
+                entry[2] += sign * len(items)
+            for name, price in items.items():
+                entry = deltas["item"].setdefault((day[:7], name.strip().lower(), currency), [0, 0.0])
+                entry[0] += sign
+                entry[1] += sign * (price if isinstance(price, (int, float)) else 0.0)
+        return deltas
+
+    def _update_rollups(self, removed, added):
+        """Apply the rollup change of replacing the `removed` rows by the `added` ones (inside the caller's transaction)"""
+        deltas = self._rollup_deltas(removed, -1)
+        self._apply_rollup_deltas(self._rollup_deltas(added, 1, deltas))
+
+    def _apply_rollup_deltas(self, deltas):
+        for period in ("day", "month"):
+            table = self.ROLLUP_TABLES[period]
+            changed = [(*key, *value) for key, value in deltas[period].items() if any(value)]
+            # Totals are rounded so repeated +/- of the same amounts can't drift
+            self.cursor.executemany(f"""
+                INSERT INTO {table} (period, vendor, currency, receipts, total, items) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (period, vendor, currency) DO UPDATE SET
+                    receipts = receipts + excluded.receipts,
+                    total = round(total + excluded.total, 6),
+                    items = items + excluded.items
+            """, changed)
+            self.cursor.executemany(f"DELETE FROM {table} WHERE period=? AND vendor=? AND currency=? AND receipts<=0",
+                                    [row[:3] for row in changed])
+        changed = [(*key, *value) for key, value in deltas["item"].items() if any(value)]
+        self.cursor.executemany("""
+            INSERT INTO rollup_items (period, name, currency, count, total) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (period, name, currency) DO UPDATE SET
+                count = count + excluded.count,
+                total = round(total + excluded.total, 6)
+        """, changed)
+        self.cursor.executemany("DELETE FROM rollup_items WHERE period=? AND name=? AND currency=? AND count<=0",
+                                [row[:3] for row in changed])
+
+    def _recompute_rollups(self):
+        """Rollup rows of every stored receipt, from scratch (in the deltas format)"""
+        deltas = None
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT date_of_purchase, vendor, total_amount, currency, items_json FROM receipts")
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            deltas = self._rollup_deltas(
+                [(date, vendor, total, currency, json.loads(items or "{}")) for date, vendor, total, currency, items in rows],
+                1, deltas
+            )
+        return deltas or {"day": {}, "month": {}, "item": {}}
+
+    def rebuild_rollups(self):
+        """Recompute every rollup table from the receipts; returns the row count per table"""
+        with self.conn:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            deltas = self._recompute_rollups()
+            for table in self.ROLLUP_TABLES.values():
+                self.cursor.execute(f"DELETE FROM {table}")
+            self._apply_rollup_deltas(deltas)
+            self.cursor.execute("INSERT OR REPLACE INTO receipt_meta (key, value) VALUES ('rollups', 1)")
+        return {table: len(deltas[kind]) for kind, table in self.ROLLUP_TABLES.items()}
+
+    def _sql_rollups(self):
+        """
+        Rollup rows straight from SQL SUMs over receipts / receipt_items (in the deltas format),
+        independent of the Python bookkeeping in _rollup_deltas
+        """
+        day = "CASE WHEN date_of_purchase GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' THEN date_of_purchase ELSE '' END"
+        expected = {"day": {}, "month": {}, "item": {}}
+        for period, key in (("day", day), ("month", f"substr({day}, 1, 7)")):
+            for row in self.cursor.execute(f"""
+                SELECT {key}, coalesce(vendor, ''), coalesce(currency, ''), COUNT(*), TOTAL(total_amount),
+                       TOTAL((SELECT COUNT(*) FROM receipt_items i WHERE i.doc_id = r.doc_id))
+                FROM receipts r GROUP BY 1, 2, 3
+            """):
+                expected[period][tuple(row[:3])] = [row[3], row[4], int(row[5])]
+        # Item names are folded in Python: SQLite's lower() only folds ASCII
+        for month, name, currency, count, total in self.cursor.execute(f"""
+            SELECT substr({day}, 1, 7), i.name, coalesce(r.currency, ''), COUNT(*), TOTAL(i.price)
+            FROM receipt_items i JOIN receipts r ON r.doc_id = i.doc_id GROUP BY 1, 2, 3
+        """):
+            entry = expected["item"].setdefault((month, (name or "").strip().lower(), currency), [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+        return expected
+
+    def verify_rollups(self, tolerance=1e-6):
+        """Compare the rollup tables with SQL sums over the receipts; returns the mismatches (empty when consistent)"""
+        mismatches = []
+        with self.conn:
+            # One read transaction: the sums and the tables see the same snapshot
+            self.cursor.execute("BEGIN")
+            expected = self._sql_rollups()
+            for kind, table in self.ROLLUP_TABLES.items():
+                stored = {tuple(row[:3]): list(row[3:]) for row in self.cursor.execute(f"SELECT * FROM {table}")}
+                for key in sorted(stored.keys() | expected[kind].keys()):
+                    got, want = stored.get(key), expected[kind].get(key)
+                    if (got is None or want is None or got[0] != want[0] or got[2:] != want[2:]
+                            or abs(got[1] - want[1]) > tolerance * max(1.0, abs(want[1]))):
+                        mismatches.append(f"{table} {key}: stored {got}, expected {want}")
+        return mismatches
+
+    def _rollup_clause(self, filters, days):
+        """WHERE clause over a rollup table for date_from / date_to (ISO), vendor and currency filters"""
+        clauses, params = [], []
+        date_from, date_to = filters.get("date_from"), filters.get("date_to")
+        if date_from or date_to:
+            clauses.append("period != ''")
+        if date_from:
+            clauses.append("period >= ?")
+            params.append(date_from if days else date_from[:7])
+        if date_to:
+            clauses.append("period <= ?")
+            params.append(date_to if days else date_to[:7])
+        if filters.get("vendor"):
+            # Rollup rows are few (one per period, vendor and currency), so a word LIKE is cheap here
+            prefix = self._vendor_prefix(filters["vendor"])
+            clauses.append("(vendor LIKE ? ESCAPE '\\' OR vendor LIKE ? ESCAPE '\\')")
+            params += [prefix, f"% {prefix}"]
+        if filters.get("currency"):
+            clauses.append("currency = ? COLLATE NOCASE")
+            params.append(filters["currency"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def spending_summary(self, group_by=("month",), filters=None, limit=None):
+        """
+        Receipt count, total and item count per currency and per `group_by`
+        ("day" or "month", and/or "vendor"), read from the rollup tables.
+        filters: date_from / date_to (ISO days, exact), vendor, currency; amount
+        bounds are not rolled up (use aggregate_receipts).
+        """
+        group_by = tuple(group_by)
+        if set(group_by) - set(self.ROLLUP_GROUPS) or {"day", "month"} <= set(group_by):
+            raise ValueError(f"group_by takes 'day' or 'month', and/or 'vendor'; got {group_by}")
+        filters = filters or {}
+        # Exact day ranges need the daily table; whole months sum far fewer monthly rows
+        days = "day" in group_by or bool(filters.get("date_from") or filters.get("date_to"))
+        table = self.ROLLUP_TABLES["day" if days else "month"]
+        columns = {"day": "period", "month": "substr(period, 1, 7)", "vendor": "vendor"}
+        keys = [columns[group] for group in group_by] + ["currency"]
+        where, params = self._rollup_clause(filters, days)
+        order = f"{keys[0]}, SUM(total) DESC" if group_by and group_by[0] != "vendor" else "SUM(total) DESC"
+        sql = f"""
+            SELECT {", ".join(keys)}, SUM(receipts), SUM(total), SUM(items) FROM {table}{where}
+            GROUP BY {", ".join(keys)} ORDER BY {order}
+        """
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        names = list(group_by) + ["currency"]
+        summary = []
+        for row in self.cursor.execute(sql, params).fetchall():
+            entry = dict(zip(names, row))
+            entry.update({"receipts": row[-3], "total": row[-2], "items": row[-1], "average": row[-2] / row[-3]})
+            summary.append(entry)
+        return summary
+
+    def top_items(self, filters=None, limit=10):
+        """
+        Most bought items (by times bought) per currency, from the monthly item rollup.
+        filters: date_from / date_to (whole months overlapping the range), currency.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if key != "vendor"}
+        where, params = self._rollup_clause(filters, days=False)
+        params.append(limit)
+        rows = self.cursor.execute(f"""
+            SELECT name, currency, SUM(count), SUM(total) FROM rollup_items{where}
+            GROUP BY name, currency ORDER BY SUM(count) DESC, SUM(total) DESC LIMIT ?
+        """, params).fetchall()
+        return [{"name": name, "currency": currency, "count": count, "total": total} for name, currency, count, total in rows]
+
+    # ---------------- Lexical search ----------------
+    @staticmethod
+    def _fts_query(text):
+        """FTS5 MATCH expression: any word of the text (as a prefix), quoted so user input is never syntax"""
+        words = [w for w in re.findall(r"\w+", (text or "").lower()) if len(w) >= 2]
+        return " OR ".join(f'"{w}"*' for w in dict.fromkeys(words))
+
+    def lexical_search(self, text, limit=20, filters=None):
+        """
+        BM25 full-text search over vendor and item names.
+        Returns [(doc_id, score), ...] best first, where score = -bm25 (higher is better).
+        With filters, only receipts matching them are returned.
+        """
+        match = self._fts_query(text)
+        if not self.fts_enabled or not match:
+            return []
+        sql = """
+            SELECT s.doc_id, bm25(receipts_fts) FROM receipts_fts
+            JOIN receipt_search s ON s.id = receipts_fts.rowid
+            WHERE receipts_fts MATCH ?
+        """
+        params = [match]
+        if filters:
+            where, filter_params = self._filter_clause(filters)
+            if where:
+                sql += f" AND s.doc_id IN (SELECT doc_id FROM receipts{where})"
+                params += filter_params
+        sql += " ORDER BY bm25(receipts_fts) LIMIT ?"
+        params.append(limit)
+        return [(doc_id, -score) for doc_id, score in self.cursor.execute(sql, params).fetchall()]
+
+    def search_items(self, name, filters=None, limit=50):
+        """
+        Line items whose name contains `name` (case-insensitive), most expensive first,
+        with the receipt's date, vendor and currency
+        """
+        term = name.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where, params = self._filter_clause(filters or {})
+        where = where.replace(" WHERE ", " AND ", 1)
+        rows = self.cursor.execute(f"""
+            SELECT i.doc_id, i.name, i.price, r.date_of_purchase, r.vendor, r.currency
+            FROM receipt_items i JOIN receipts r ON r.doc_id = i.doc_id
+            WHERE i.name LIKE ? ESCAPE '\\'{where}
+            ORDER BY i.price DESC LIMIT ?
+        """, [f"%{term}%"] + params + [limit]).fetchall()
         return [
             {
                 "doc_id": row[0],
-                "date_of_purchase": row[1],
-                "vendor": row[2],
-                "total_amount": row[3],
-                "currency": row[4],
-                "items": json.loads(row[5])
+                "name": row[1],
+                "price": row[2],
+                "date_of_purchase": row[3],
+                "vendor": row[4],
+                "currency": row[5]
             }
             for row in rows
         ]
 
+    def vendors(self):
+        """
+        Distinct vendor names (used to spot vendor mentions in questions).
+        Every question asks for them, so the scan is cached until corpus_version changes.
+        """
+        version = self.corpus_version()
+        cached = self._vendors
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        names = [row[0] for row in self.cursor.execute(
+            "SELECT DISTINCT vendor FROM receipts WHERE vendor IS NOT NULL"
+        ).fetchall()]
+        # Keyed on the version read before the scan: a write racing it only costs one more scan
+        self._vendors = (version, names)
+        return names
+
     def close(self):
-        self.conn.close()
+        with self._connections_lock:
+            for _, conn in self._connections.values():
+                conn.close()
+            self._connections = {}
+        self._local = threading.local()
@@ -0,0 +1,135 @@
+# src/backend/db/response_cache.py
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+
+# Questions that lean on the previous turn ("and at KFC?", "what about last month?") are never cached
+FOLLOW_UP_RE = re.compile(
+    r"^\s*(?:and|also|what about|how about|same|then)\b|\b(?:it|those|these|them|they)\b", re.I
+)
+
+
+class ResponseCache:
+    """
+    Semantic cache of agent answers keyed on the question embedding.
+
+    A lookup hits when a cached question of the same graph variant, asked on
+    the same day (relative periods like "this month" resolve against it) and
+    with exactly the same extracted filters (dates, vendor, amounts, currency,
+    aggregate, breakdown), has cosine similarity >= `threshold` and was
+    answered at the current corpus version (ReceiptDB.corpus_version); any
+    receipt change empties the cache.
+    Questions asked mid-conversation are not cached (see skip).
+    Entries expire after `ttl` seconds; beyond `max_size` the least recently
+    used one is evicted.
+    """
+    def __init__(self, max_size=256, ttl=3600, threshold=0.95):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.version = None
+        self._next_key = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def cacheable(question):
+        return not FOLLOW_UP_RE.search(question)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_version(self, version):
+        """Drop everything answered at another corpus version. Caller holds the lock."""
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def _expire(self, now):
+        expired = [key for key, entry in self.entries.items() if now - entry["created_at"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+        self.expirations += len(expired)
+
+    # ---------------- Lookup ----------------
+    def skip(self):
+        """Count a lookup the caller bypassed (e.g. the session already has turns)"""
+        with self.lock:
+            self.skipped += 1
+
+    def get(self, question, vector, variant, version, day=None, filters=None):
+        """Return the cached response dict for a similar question, or None"""
+        if not self.cacheable(question):
+            with self.lock:
+                self.skipped += 1
+            return None
+        query = self._normalize(vector)
+        with self.lock:
+            self._sync_version(version)
+            self._expire(time.time())
+            # Similar wording is not enough: the scope of the question must match exactly
+            keys = [key for key, entry in self.entries.items()
+                    if entry["variant"] == variant and entry["day"] == day and entry["filters"] == filters]
+            if keys:
+                similarities = np.stack([self.entries[key]["vector"] for key in keys]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self.entries[keys[best]]["response"]
+            self.misses += 1
+            return None
+
+    def put(self, question, vector, variant, version, response, day=None, filters=None):
+        if not self.cacheable(question):
+            return
+        with self.lock:
+            if self.version is not None and version < self.version:
+                return  # the corpus changed while this answer was computed
+            self._sync_version(version)
+            self.entries[self._next_key] = {
+                "vector": self._normalize(vector),
+                "variant": variant,
+                "day": day,
+                "filters": filters,
+                "response": response,
+                "created_at": time.time()
+            }
+            self._next_key += 1
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # ---------------- Stats ----------------
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
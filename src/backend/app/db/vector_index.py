@@ -0,0 +1,155 @@
+# src/backend/db/vector_index.py
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index backed by one contiguous float32 matrix.
+    Rows are L2-normalized on insert so a query is a single matrix-vector product.
+    """
+    def __init__(self, dim=None, capacity=1024):
+        self.dim = dim
+        self.capacity = capacity
+        self.size = 0
+        self.matrix = None
+        self.doc_ids = np.empty(capacity, dtype=object)
+        self.id_to_row = {}
+        if dim is not None:
+            self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, doc_id):
+        return doc_id in self.id_to_row
+
+    # ---------------- Helpers ----------------
+    @staticmethod
+    def normalize(vector):
+        """
+        Return a float32 unit vector (zero vectors stay zero)
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return vector
+        return vector / norm
+
+    def _grow(self, min_capacity):
+        new_capacity = max(self.capacity * 2, min_capacity)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        doc_ids = np.empty(new_capacity, dtype=object)
+        doc_ids[:self.size] = self.doc_ids[:self.size]
+        self.matrix, self.doc_ids, self.capacity = matrix, doc_ids, new_capacity
+
+    # ---------------- CRUD ----------------
+    def add(self, doc_id, vector):
+        """
+        Insert a vector, or replace it in place if doc_id is already indexed.
+        Returns the row the vector was written to.
+        """
+        vector = self.normalize(vector)
+        if self.matrix is None:
+            self.dim = vector.shape[0]
+            self.matrix = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected vector of dim {self.dim}, got {vector.shape[0]}")
+
+        row = self.id_to_row.get(doc_id)
+        if row is None:
+            if self.size == self.capacity:
+                self._grow(self.size + 1)
+            row = self.size
+            self.doc_ids[row] = doc_id
+            self.id_to_row[doc_id] = row
+            self.size += 1
+        self.matrix[row] = vector
+        return row
+
+    def load(self, doc_ids, vectors):
+        """
+        Bulk-load an empty index from a (n, dim) array in one vectorized pass
+        """
+        if self.size:
+            raise ValueError("load() expects an empty index")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(doc_ids) == 0:
+            return
+        n, self.dim = vectors.shape
+        self.capacity = max(self.capacity, n)
+        self.matrix = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=self.matrix[:n], where=norms > 0)
+        self.doc_ids = np.empty(self.capacity, dtype=object)
+        self.doc_ids[:n] = doc_ids
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        self.size = n
+
+    def remove(self, doc_id):
+        """
+        Delete a vector by moving the last row into its slot.
+        Returns False if doc_id was not indexed.
+        """
+        row = self.id_to_row.pop(doc_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            moved_id = self.doc_ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.doc_ids[row] = moved_id
+            self.id_to_row[moved_id] = row
+        self.matrix[last] = 0
+        self.doc_ids[last] = None
+        self.size = last
+        return True
+
+    def get(self, doc_id):
+        row = self.id_to_row.get(doc_id)
+        if row is None:
+            return None
+        return self.matrix[row].copy()
+
+    def items(self):
+        for row in range(self.size):
+            yield self.doc_ids[row], self.matrix[row]
+
+    # ---------------- Search ----------------
+    @staticmethod
+    def _top_k(scores, top_k):
+        """
+        Positions of the top_k highest scores, best first
+        """
+        k = min(top_k, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def search(self, query_vector, top_k=5, candidates=None):
+        """
+        Return [(doc_id, cosine_similarity), ...] sorted by descending similarity.
+        With `candidates` (doc_ids), only those rows are scored.
+        """
+        if self.size == 0 or top_k <= 0:
+            return []
+        query = self.normalize(query_vector)
+        if candidates is not None:
+            return self._search_rows(query, self._candidate_rows(candidates), top_k)
+        scores = self.matrix[:self.size] @ query
+        top = self._top_k(scores, top_k)
+        return [(self.doc_ids[row], float(scores[row])) for row in top]
+
+    def _candidate_rows(self, candidates):
+        rows = [self.id_to_row[doc_id] for doc_id in candidates if doc_id in self.id_to_row]
+        return np.array(rows, dtype=np.int64)
+
+    def _search_rows(self, query, rows, top_k):
+        """Score a subset of rows (query already normalized)"""
+        if rows.size == 0:
+            return []
+        scores = self.matrix[rows] @ query
+        top = self._top_k(scores, top_k)
+        return [(self.doc_ids[rows[i]], float(scores[i])) for i in top]
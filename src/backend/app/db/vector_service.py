@@ -1,39 +1,200 @@
 # src/backend/db/vector_service.py
 import os
-import pickle
+import sys
+import time
 import numpy as np
+from threading import Thread
 from sentence_transformers import SentenceTransformer
-import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.vector_index import VectorIndex
+from db.ann_index import IVFIndex
+from db.vector_store import VectorStore, migrate_pickle
+from db.embedding_cache import EmbeddingCache
+from db.rwlock import RWLock
 
 DB_DIR = "/app/src/backend/app/db"
-VECTOR_PATH = os.path.join(DB_DIR, "vector_db.pkl")
+VECTOR_PATH = os.path.join(DB_DIR, "vector_db.pkl")  # legacy pickle; store files share its base name
 
 class VectorService:
     """
     Combined embedding generator + manual vector DB using numpy.
     Supports preloaded embedding model.
+    index_type="ivf" switches to approximate search for large collections
+    (extra keyword arguments such as nprobe/nlist go to IVFIndex).
+    Embeddings are cached in memory (cache_size entries, 0 disables) and,
+    when cache_path is set, in a SQLite file shared across restarts.
+
+    Thread-safe: searches share a read lock, index writes take the write lock,
+    and embedding happens outside both. Vectors appended by other processes
+    sharing the store are picked up before each search. An IVF index is
+    (re)trained in a background thread on a copy of the vectors, once it
+    reaches its training size and whenever it doubles; writes made meanwhile
+    are replayed onto the new index before it is swapped in.
     """
-    def __init__(self, db_path=VECTOR_PATH , embedding_model="all-MiniLM-L6-v2", model=None):
+    def __init__(self, db_path=VECTOR_PATH , embedding_model="all-MiniLM-L6-v2", model=None,
+                 index_type="exact", cache_size=4096, cache_path=None, **index_kwargs):
         self.db_path = db_path
+        self.embedding_model = embedding_model
         self.model = model or SentenceTransformer(embedding_model)
-        
-        # Load existing vectors or initialize empty dict
-        if os.path.exists(db_path):
+        self.cache = EmbeddingCache(embedding_model, max_size=cache_size, persist_path=cache_path) if cache_size else None
+
+        # On-disk store lives next to the legacy pickle: vector_db.manifest.json, vector_db.g0.f32, ...
+        self.store = VectorStore(os.path.splitext(db_path)[0])
+        if not self.store.exists() and os.path.exists(db_path):
             try:
-                with open(db_path, "rb") as f:
-                    self.vectors = pickle.load(f)
+                count = migrate_pickle(db_path, self.store)
+                print(f"Migrated {count} vectors from {db_path} to {self.store.base_path}.*")
             except Exception:
-                print(f"Failed to load {db_path}, initializing empty vector DB.")
-                self.vectors = {}
-        else:
-            self.vectors = {}
+                print(f"Failed to migrate {db_path}, initializing empty vector DB.")
+
+        if index_type not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index_type: {index_type}")
+        self.index_type = index_type
+        self.index_kwargs = index_kwargs
+        self.lock = RWLock()
+        # Index writes made while a background retrain runs ((op, doc_id, vector), ...), else None
+        self._retrain_journal = None
+        self._retrain_thread = None
+        self._rebuild_index()
+
+    def _new_index(self):
+        return IVFIndex(auto_train=False, **self.index_kwargs) if self.index_type == "ivf" else VectorIndex()
+
+    def _rebuild_index(self):
+        index = self._new_index()
+        doc_ids, vectors = self.store.load()
+        index.load(doc_ids, vectors)
+        self.index = index
+        # A retrain still running was copied from the replaced index
+        self._retrain_journal = None
+        self._maybe_retrain()
+
+    # ---------------- IVF training ----------------
+    def _index_add(self, doc_id, vector):
+        """Caller holds the write lock"""
+        self.index.add(doc_id, vector)
+        if self._retrain_journal is not None:
+            self._retrain_journal.append(("add", doc_id, vector))
+
+    def _index_remove(self, doc_id):
+        """Caller holds the write lock"""
+        removed = self.index.remove(doc_id)
+        if self._retrain_journal is not None:
+            self._retrain_journal.append(("remove", doc_id, None))
+        return removed
+
+    def _maybe_retrain(self):
+        """Start a background retrain if the IVF index needs one. Caller holds the write lock."""
+        if self.index_type != "ivf" or self._retrain_journal is not None or not self.index.needs_training():
+            return
+        size = self.index.size
+        doc_ids, vectors = list(self.index.doc_ids[:size]), self.index.matrix[:size].copy()
+        journal = self._retrain_journal = []
+        self._retrain_thread = Thread(target=self._retrain, args=(doc_ids, vectors, journal), daemon=True)
+        self._retrain_thread.start()
+
+    def _retrain(self, doc_ids, vectors, journal):
+        start = time.perf_counter()
+        try:
+            index = self._new_index()
+            index.load(doc_ids, vectors)
+            index.train()
+        except Exception as e:
+            print(f"IVF retrain failed: {e}")
+            with self.lock.write():
+                if self._retrain_journal is journal:
+                    self._retrain_journal = None
+            return
+        with self.lock.write():
+            if self._retrain_journal is not journal:
+                return  # the index was rebuilt meanwhile
+            for op, doc_id, vector in journal:
+                if op == "add":
+                    index.add(doc_id, vector)
+                else:
+                    index.remove(doc_id)
+            self.index = index
+            self._retrain_journal = None
+            # Writes replayed above may already have doubled it again
+            self._maybe_retrain()
+        print(f"Trained IVF index on {len(doc_ids)} vectors in {time.perf_counter() - start:.1f}s "
+              f"({len(journal)} writes replayed)")
+
+    def wait_for_training(self, timeout=None):
+        """Block until a background retrain (if any) has been swapped in"""
+        thread = self._retrain_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _apply_store_changes(self, reloaded, records):
+        """
+        Replay foreign store changes into the index. Caller holds the write lock.
+        """
+        if reloaded:
+            self._rebuild_index()
+            return
+        adds = [r for r in records if r["op"] == "add"]
+        vectors = iter(self.store.read_rows([r["slot"] for r in adds])) if adds else iter(())
+        for record in records:
+            if record["op"] == "add":
+                self._index_add(record["id"], next(vectors))
+            else:
+                self._index_remove(record["id"])
+        self._maybe_retrain()
+
+    def refresh(self):
+        """
+        Apply vectors written by other processes sharing the store
+        """
+        if not self.store.has_changes():
+            return
+        with self.lock.write():
+            self._apply_store_changes(*self.store.refresh())
+
+    @property
+    def vectors(self):
+        """
+        Dict view of the index (doc_id -> normalized vector)
+        """
+        with self.lock.read():
+            return {doc_id: vector.copy() for doc_id, vector in self.index.items()}
 
     # ---------------- Embedding ----------------
     def embed_text(self, text):
         """
         Convert text to deterministic embedding (numpy array)
         """
-        return np.array(self.model.encode(text))
+        if self.cache is None:
+            return np.array(self.model.encode(text))
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.cache.put(text, self.model.encode(text))
+        return vector
+
+    def embed_texts(self, texts, batch_size=64):
+        """
+        Convert a list of texts to a (n, dim) float32 matrix in model batches.
+        Only cache misses go through the model.
+        """
+        texts = list(texts)
+        if self.cache is None:
+            return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+        cached = [self.cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            encoded = self.model.encode([texts[i] for i in missing], batch_size=batch_size)
+            for i, vector in zip(missing, self.cache.put_many([texts[i] for i in missing], encoded)):
+                cached[i] = vector
+        if not cached:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.stack(cached)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {}
 
     # ---------------- VectorDB ----------------
     def add_vector(self, doc_id, text):
@@ -41,26 +202,56 @@ class VectorService:
         Generate embedding from text and store it in vector DB
         """
         vector = self.embed_text(text)
-        self.vectors[doc_id] = vector
-        self._save()
+        with self.lock.write():
+            self.store.append(doc_id, vector)
+            # Foreign changes replayed by the append precede ours in the log
+            self._apply_store_changes(*self.store.take_pending())
+            self._index_add(doc_id, vector)
+            self._maybe_retrain()
         return vector
 
-    def query_vector(self, query_text, top_k=5):
+    def add_vectors(self, doc_ids, texts, batch_size=64):
         """
-        Query top-k similar documents given a text
+        Bulk version of add_vector: encode `batch_size` texts per forward pass and
+        update the index and the on-disk store once per batch
         """
-        query_vector = self.embed_text(query_text)
-        similarities = {}
-        for doc_id, vec in self.vectors.items():
-            if np.linalg.norm(vec) == 0 or np.linalg.norm(query_vector) == 0:
-                sim = 0.0
-            else:
-                sim = np.dot(query_vector, vec) / (np.linalg.norm(vec) * np.linalg.norm(query_vector))
-            similarities[doc_id] = sim
+        if len(doc_ids) != len(texts):
+            raise ValueError("doc_ids and texts must have the same length")
+        for start in range(0, len(doc_ids), batch_size):
+            batch_ids = list(doc_ids[start:start + batch_size])
+            vectors = self.embed_texts(texts[start:start + batch_size], batch_size=batch_size)
+            with self.lock.write():
+                self.store.append_many(batch_ids, vectors)
+                self._apply_store_changes(*self.store.take_pending())
+                for doc_id, vector in zip(batch_ids, vectors):
+                    self._index_add(doc_id, vector)
+                self._maybe_retrain()
 
-        # Return top_k sorted
-        return sorted(similarities.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    def remove_vector(self, doc_id):
+        """
+        Remove a document from the vector DB
+        """
+        with self.lock.write():
+            self.store.delete(doc_id)
+            self._apply_store_changes(*self.store.take_pending())
+            return self._index_remove(doc_id)
+
+    def query_vector(self, query_text, top_k=5, doc_ids=None):
+        """
+        Query top-k similar documents given a text (only among `doc_ids` if given)
+        """
+        query_vector = self.embed_text(query_text)
+        self.refresh()
+        with self.lock.read():
+            return self.index.search(query_vector, top_k=top_k, candidates=doc_ids)
 
     def _save(self):
-        with open(self.db_path, "wb") as f:
-            pickle.dump(self.vectors, f)
+        """
+        Flush the append-only store (creates an empty one on first call)
+        """
+        self.store.flush(dim=self.model.get_sentence_embedding_dimension())
+
+    def compact(self):
+        with self.lock.write():
+            self.store.compact()
+            self._apply_store_changes(*self.store.take_pending())
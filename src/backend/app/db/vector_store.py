@@ -0,0 +1,393 @@
+# src/backend/db/vector_store.py
+import os
+import json
+import pickle
+from contextlib import contextmanager
+from threading import RLock
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: cross-process locking disabled
+    fcntl = None
+
+
+class VectorStore:
+    """
+    Append-only on-disk vector store.
+
+    Layout for a base path `vector_db`:
+        vector_db.manifest.json  -> {"generation": g, "dim": d}
+        vector_db.g<g>.f32       -> fixed-width float32 rows, read with np.memmap
+        vector_db.g<g>.log       -> append-only JSON lines: add (doc_id -> slot) / delete
+
+    Every add appends one row and one log line, so ingest cost does not grow with
+    the corpus. Replaced and deleted rows stay on disk until compaction rewrites
+    the live rows into the next generation and swaps the manifest atomically.
+
+    Several processes (e.g. WSGI workers) can share one store: writes take an
+    exclusive flock on vector_db.lock and first replay whatever other processes
+    appended. refresh() hands those foreign changes to the in-memory index.
+    """
+    def __init__(self, base_path, dim=None, fsync=True, compact_ratio=0.5, compact_min_dead=1024):
+        self.base_path = base_path
+        self.dim = dim
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+        self.compact_min_dead = compact_min_dead
+
+        self.generation = 0
+        self.slots = {}
+        self.num_rows = 0
+        self.log_offset = 0
+        self._data_file = None
+        self._log_file = None
+        self._manifest_mtime = None
+
+        # Changes made by other processes, not yet handed out by refresh()
+        self._pending = []
+        self._reloaded = False
+
+        self._thread_lock = RLock()
+        self._lock_depth = 0
+        self._lock_file = open(f"{base_path}.lock", "a")
+
+        with self._locked():
+            if self.exists():
+                self._open()
+
+    # ---------------- Paths ----------------
+    @property
+    def manifest_path(self):
+        return f"{self.base_path}.manifest.json"
+
+    def _data_path(self, generation):
+        return f"{self.base_path}.g{generation}.f32"
+
+    def _log_path(self, generation):
+        return f"{self.base_path}.g{generation}.log"
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    # ---------------- Locking ----------------
+    @contextmanager
+    def _locked(self, exclusive=True):
+        with self._thread_lock:
+            # Only the outermost holder touches the flock (it is re-entered by compaction)
+            outermost = self._lock_depth == 0
+            if outermost and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if outermost and fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # ---------------- Open / Recover ----------------
+    def _write_manifest(self, generation):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": generation, "dim": self.dim}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _create(self, dim):
+        self.dim = dim
+        open(self._data_path(0), "wb").close()
+        open(self._log_path(0), "wb").close()
+        self._write_manifest(0)
+        self._open()
+
+    def _open(self):
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        self.generation = manifest["generation"]
+        self.dim = manifest["dim"]
+        data_path = self._data_path(self.generation)
+        log_path = self._log_path(self.generation)
+
+        # Drop a partially written trailing row
+        row_bytes = self.dim * 4
+        data_size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        self.num_rows = data_size // row_bytes
+        if data_size != self.num_rows * row_bytes:
+            with open(data_path, "r+b") as f:
+                f.truncate(self.num_rows * row_bytes)
+
+        # Replay the log, dropping a torn last line
+        self.slots = {}
+        valid_bytes = 0
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(record)
+                    valid_bytes += len(line)
+            if valid_bytes != os.path.getsize(log_path):
+                with open(log_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+        self.log_offset = valid_bytes
+
+        self._data_file = open(data_path, "ab")
+        self._log_file = open(log_path, "ab")
+
+    def _catch_up(self):
+        """
+        Pick up writes from other processes. Caller holds the file lock.
+        """
+        if not self.exists():
+            return
+        if self._data_file is None or os.stat(self.manifest_path).st_mtime_ns != self._manifest_mtime:
+            with open(self.manifest_path) as f:
+                generation = json.load(f)["generation"]
+            if self._data_file is None or generation != self.generation:
+                # Created or compacted elsewhere: reopen the new generation
+                self.close()
+                self._open()
+                self._pending = []
+                self._reloaded = True
+                return
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+        self.num_rows = os.path.getsize(self._data_path(self.generation)) // (self.dim * 4)
+        with open(self._log_path(self.generation), "rb") as f:
+            f.seek(self.log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                self._apply(record)
+                self._pending.append(record)
+                self.log_offset += len(line)
+
+    def has_changes(self):
+        """
+        Cheap check (two stats) for writes made by other processes
+        """
+        if self._pending or self._reloaded:
+            return True
+        try:
+            if os.stat(self.manifest_path).st_mtime_ns != self._manifest_mtime:
+                return True
+            return self.exists() and os.path.getsize(self._log_path(self.generation)) != self.log_offset
+        except FileNotFoundError:
+            return False
+
+    def refresh(self):
+        """
+        Catch up with other processes and return (reloaded, records).
+        reloaded=True means the store was created or compacted elsewhere and the
+        caller should rebuild from load(); otherwise records lists the foreign
+        add/del log records applied since the last refresh.
+        """
+        with self._locked(exclusive=False):
+            self._catch_up()
+            return self.take_pending()
+
+    def take_pending(self):
+        """
+        Return and clear foreign changes already replayed by a write, without re-reading the log
+        """
+        with self._thread_lock:
+            reloaded, records = self._reloaded, self._pending
+            self._reloaded, self._pending = False, []
+        return reloaded, records
+
+    def _apply(self, record):
+        doc_id = record["id"]
+        if record["op"] == "add":
+            if record["slot"] < self.num_rows:
+                self.slots[doc_id] = record["slot"]
+        elif record["op"] == "del":
+            self.slots.pop(doc_id, None)
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    # ---------------- Read ----------------
+    def _memmap(self):
+        if self.num_rows == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self._data_path(self.generation), dtype=np.float32,
+                         mode="r", shape=(self.num_rows, self.dim))
+
+    def load(self):
+        """
+        Return (doc_ids, vectors) for all live rows. vectors is a float32 array
+        gathered from the memory-mapped data file.
+        """
+        with self._thread_lock:
+            if not self.exists() or not self.slots:
+                return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+            doc_ids = list(self.slots.keys())
+            rows = np.fromiter(self.slots.values(), dtype=np.int64, count=len(doc_ids))
+            return doc_ids, np.asarray(self._memmap()[rows])
+
+    def read_rows(self, slots):
+        with self._thread_lock:
+            return np.asarray(self._memmap()[np.asarray(slots, dtype=np.int64)])
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def dead(self):
+        """
+        Rows on disk that are replaced, deleted or orphaned by a crash
+        """
+        return self.num_rows - len(self.slots)
+
+    # ---------------- Write ----------------
+    def append(self, doc_id, vector):
+        """
+        Append a vector for doc_id, superseding any previous row for it
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        return self.append_many([doc_id], vector)[0]
+
+    def append_many(self, doc_ids, vectors):
+        """
+        Append a batch with one data write and one log write (one fsync each).
+        Returns the slots written.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(doc_ids) == 0:
+            return []
+        with self._locked():
+            self._catch_up()
+            if not self.exists():
+                self._create(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dim {self.dim}, got {vectors.shape[1]}")
+
+            # Data first, then the log lines that make it visible
+            first_slot = self.num_rows
+            self._data_file.write(vectors.tobytes())
+            self._sync(self._data_file)
+            self.num_rows += len(doc_ids)
+
+            slots = list(range(first_slot, first_slot + len(doc_ids)))
+            payload = "".join(
+                json.dumps({"op": "add", "id": doc_id, "slot": slot}) + "\n"
+                for doc_id, slot in zip(doc_ids, slots)
+            ).encode()
+            self._log_file.write(payload)
+            self._sync(self._log_file)
+            self.log_offset += len(payload)
+
+            for doc_id, slot in zip(doc_ids, slots):
+                self.slots[doc_id] = slot
+            self.maybe_compact()
+        return slots
+
+    def delete(self, doc_id):
+        with self._locked():
+            self._catch_up()
+            if doc_id not in self.slots:
+                return False
+            payload = (json.dumps({"op": "del", "id": doc_id}) + "\n").encode()
+            self._log_file.write(payload)
+            self._sync(self._log_file)
+            self.log_offset += len(payload)
+            del self.slots[doc_id]
+            self.maybe_compact()
+        return True
+
+    def flush(self, dim=None):
+        """
+        Make sure everything appended so far is on disk. Creates an empty store
+        when `dim` is given and nothing has been written yet.
+        """
+        with self._locked():
+            if not self.exists():
+                if dim is None:
+                    return
+                self._create(dim)
+            self._data_file.flush()
+            self._log_file.flush()
+            os.fsync(self._data_file.fileno())
+            os.fsync(self._log_file.fileno())
+
+    # ---------------- Compaction ----------------
+    def maybe_compact(self):
+        if self.dead >= self.compact_min_dead and self.dead > self.compact_ratio * len(self.slots):
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrite live rows into a new generation and drop the old one
+        """
+        with self._locked():
+            self._catch_up()
+            if not self.exists():
+                return
+            doc_ids, vectors = self.load()
+            self.replace_all(doc_ids, vectors)
+
+    def replace_all(self, doc_ids, vectors):
+        """
+        Write doc_ids/vectors as a fresh generation and swap the manifest atomically.
+        A crash before the swap leaves the previous generation (or no store) untouched.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(doc_ids):
+            raise ValueError("vectors must be a (len(doc_ids), dim) array")
+        with self._locked():
+            old_generation = self.generation if self.exists() else None
+            new_generation = 0 if old_generation is None else old_generation + 1
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+
+            with open(self._data_path(new_generation), "wb") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._log_path(new_generation), "wb") as f:
+                for slot, doc_id in enumerate(doc_ids):
+                    f.write((json.dumps({"op": "add", "id": doc_id, "slot": slot}) + "\n").encode())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.close()
+            self._write_manifest(new_generation)
+            self._open()
+
+            if old_generation is not None:
+                for path in (self._data_path(old_generation), self._log_path(old_generation)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def close(self):
+        for f in (self._data_file, self._log_file):
+            if f is not None:
+                f.close()
+        self._data_file = None
+        self._log_file = None
+
+
+def migrate_pickle(pickle_path, store):
+    """
+    One-shot import of a legacy vector_db.pkl (dict of doc_id -> vector) into a VectorStore.
+    The store only becomes visible once every vector is written.
+    Returns the number of vectors migrated.
+    """
+    with open(pickle_path, "rb") as f:
+        vectors = pickle.load(f)
+    if not vectors:
+        return 0
+    doc_ids = list(vectors.keys())
+    matrix = np.stack([np.asarray(v, dtype=np.float32).reshape(-1) for v in vectors.values()])
+    store.replace_all(doc_ids, matrix)
+    return len(doc_ids)
@@ -1,15 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from PIL import Image, UnidentifiedImageError
+from io import BytesIO
+from datetime import date
+import base64
+import json
+import re
+import uuid
 from langchain_core.messages import HumanMessage
 import sys
 import os
-from threading import Lock
+import time
+from threading import Lock, Thread
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from services.agentic_ai_v2 import ReceiptQnAAgent, QnAState
 from services.receipt_ingestion import ReceiptProcessor
+from services.ingestion_worker import IngestionWorkerPool
+from services.ocr_pool import OCRWorkerPool
+from db.job_queue import JobQueue, QueueFullError
+from db.receipt_db import ReceiptDB
+from services.latency_stats import LatencyStats
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -23,86 +36,297 @@ CORS(app, resources={
     }
 })
 
-# Thread lock for agent access
-agent_lock = Lock()
+# Locks: one-time service initialization, and a fixed set of conversation locks (a session
+# hashes to one of them, so any number of sessions costs no extra memory).
+# The OCR model and the vector index guard themselves, so queries and ingests run concurrently.
+init_lock = Lock()
+query_locks = [Lock() for _ in range(64)]
 agent = None
 processor = None
+job_queue = None
+worker_pool = None
+jobs_resumed = False
 messages = []
+# End-to-end /api/query* latencies (and time-to-first-token when streaming)
+query_latency = LatencyStats()
+
+# Ingestion queue settings
+JOBS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db", "jobs.db")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "1"))
+# OCR worker processes (0 = run EasyOCR inside the server process)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Largest image accepted by /api/process/upload
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+# Page size limit of /api/receipts
+MAX_PAGE_SIZE = 500
+# Client-chosen conversation ids of /api/query*
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
 
 
 def get_agent():
     """Get or create agent instance (thread-safe)"""
     global agent
     if agent is None:
-        print("Initializing agent...")
-        agent = ReceiptQnAAgent()
-        print("Agent ready!")
+        with init_lock:
+            if agent is None:
+                print("Initializing agent...")
+                agent = ReceiptQnAAgent()
+                print("Agent ready!")
     return agent
 
 
 def get_processor():
-    """Get or create receipt processor instance"""
+    """Get or create receipt processor instance (shares the agent's DB and vector index)"""
     global processor
     if processor is None:
-        print("Initializing receipt processor...")
-        processor = ReceiptProcessor()
-        print("Processor ready!")
+        qna_agent = get_agent()
+        with init_lock:
+            if processor is None:
+                print("Initializing receipt processor...")
+                processor = ReceiptProcessor(
+                    vector_service=qna_agent.vector_service,
+                    receipt_db=qna_agent.receipt_db,
+                    ocr_pool=OCRWorkerPool(num_workers=OCR_WORKERS) if OCR_WORKERS > 0 else None
+                )
+                print("Processor ready!")
     return processor
 
 
+def get_job_queue():
+    """Get or create the durable ingestion queue"""
+    global job_queue
+    if job_queue is None:
+        with init_lock:
+            if job_queue is None:
+                job_queue = JobQueue(db_path=JOBS_DB_PATH, max_pending=INGEST_QUEUE_SIZE)
+    return job_queue
+
+
+def start_workers():
+    """Start the ingestion worker pool once (loads the OCR/LLM services)"""
+    global worker_pool
+    if worker_pool is None:
+        queue = get_job_queue()
+        receipt_processor = get_processor()
+        with init_lock:
+            if worker_pool is None:
+                worker_pool = IngestionWorkerPool(
+                    receipt_processor, queue,
+                    num_workers=INGEST_WORKERS,
+                    ocr_concurrency=max(OCR_CONCURRENCY, OCR_WORKERS),
+                    llm_concurrency=LLM_CONCURRENCY
+                )
+                worker_pool.start()
+                print(f"Ingestion workers started ({INGEST_WORKERS})")
+    return worker_pool
+
+
+def resume_pending_jobs():
+    """
+    Start the workers if jobs survived a restart (once per process). Called when the
+    dev server boots and on the first request, so importing main (the reloader's
+    parent process, tests, benchmarks) never loads the models or starts workers.
+    """
+    global jobs_resumed
+    with init_lock:
+        if jobs_resumed:
+            return
+        jobs_resumed = True
+    if not os.path.exists(JOBS_DB_PATH):
+        return
+    pending = get_job_queue().counts().get("queued", 0)
+    if pending:
+        print(f"Resuming {pending} queued ingestion jobs...")
+        Thread(target=start_workers, daemon=True).start()
+
+
+@app.before_request
+def resume_jobs_on_first_request():
+    # WSGI servers (gunicorn) import the app without running __main__
+    if not jobs_resumed and not app.testing:
+        resume_pending_jobs()
+
+
+def get_query_lock(session_id):
+    """
+    Serialize queries that share a conversation checkpoint (within this process;
+    across workers, concurrent turns of one session keep the last one written)
+    """
+    return query_locks[hash(session_id) % len(query_locks)]
+
+
+def parse_query_request():
+    """(question, variant, use_cache, session_id, error response or None) of a /api/query* request"""
+    data = request.get_json(silent=True) or {}
+    question = data.get("question")
+    if not question:
+        return None, None, None, None, (jsonify({"error": "Missing question"}), 400)
+
+    variant = data.get("variant", "full")
+    if variant not in ReceiptQnAAgent.GRAPH_VARIANTS:
+        return None, None, None, None, (jsonify({"error": f"Unknown variant: {variant}"}), 400)
+
+    # No session id starts a new conversation; the client sends the returned id on follow-ups
+    session_id = data.get("session_id") or uuid.uuid4().hex
+    if not isinstance(session_id, str) or not SESSION_ID_RE.match(session_id):
+        return None, None, None, None, (jsonify({"error": "Invalid session_id"}), 400)
+    return question, variant, data.get("cache", True) is not False, session_id, None
+
+
+def initial_query_state(question):
+    """
+    Per-request fields of the graph state. Conversation history is not listed,
+    so the checkpointer restores it from previous calls in the same session.
+    """
+    return {
+        "messages": [],
+        "query": question,
+        "summary": "",
+        "answer": "",
+        "search_params": "",
+        "filters": {},
+        "aggregates": None,
+        "breakdown": None,
+        "route": "",
+        # Fixed once per request, so every node reads "this month" the same way
+        "today": date.today().isoformat(),
+        "prompt_tokens": {}
+    }
+
+
 @app.route('/api/query', methods=['POST', 'OPTIONS'])
 def query():
     """
     Query receipts
     
-    Request: {"question": "your question here"}
-    Response: {"answer": "..."}
+    Request: {"question": "your question here", "variant": "full" | "fast" (optional),
+              "cache": false (optional, bypass the response cache),
+              "session_id": "..." (optional, continue a conversation; omit to start one)}
+    Response: {"answer": "...", "prompt_tokens": {"search_creator": ..., "reason": ..., "total": ...},
+               "cached": true | false, "route": "direct" | "rewrite" | null, "session_id": "..."}
     """
     # Handle CORS / preflight
     if request.method == 'OPTIONS':
         return '', 204
 
-    data = request.get_json()
-    question = data.get("question")
-    if not question:
-        return jsonify({"error": "Missing question"}), 400
+    question, variant, use_cache, session_id, error = parse_query_request()
+    if error:
+        return error
 
-    # Lock if needed to protect shared resources
-    with agent_lock:
-        agent = get_agent()
-        # Use a thread_id to maintain state across calls
-        thread_id = "receipt_qna_thread" 
+    start = time.perf_counter()
+    agent = get_agent()
 
-        # Build the config including thread_id
+    # Only requests on the same conversation wait for each other
+    with get_query_lock(session_id):
+        # The session id is the checkpoint thread: history carries over between its calls
         config = {
-            "configurable": {"thread_id": thread_id}
+            "configurable": {"thread_id": session_id}
         }
 
-        # Pass an initial state. `messages` should be a list of BaseMessage
-        # If this is first call, use an empty or greeting message; if not, the checkpointer will restore.
-        initial_state = {
-            "messages": [],  
-            "query": question,
-            "summary": "",
-            "answer": "",
-            "search_params": ""
-        }
+        state = initial_query_state(question)
+        # A similar question answered today since the receipts last changed skips both LLM calls
+        cache_key, cached = agent.lookup_response(question, variant, config, state["today"]) if use_cache else (None, None)
+        if cached is not None:
+            agent.remember_turn(config, variant, question, cached["answer"])
+            query_latency.record("query_cached", time.perf_counter() - start)
+            return jsonify({"answer": cached["answer"], "prompt_tokens": {}, "cached": True, "session_id": session_id})
+
+        # Invoke the compiled graph — this will fetch the previous state (if exists) and then run nodes
+        result = agent.get_graph(variant).invoke(state, config)
+
+        answer = result.get("answer", "")
+        if use_cache:
+            agent.store_response(question, variant, cache_key, {"answer": answer})
+
+    elapsed = time.perf_counter() - start
+    query_latency.record("query", elapsed)
+    if result.get("route"):
+        agent.route_latency.record(result["route"], elapsed)
+    return jsonify({"answer": answer, "prompt_tokens": result.get("prompt_tokens", {}), "cached": False,
+                    "route": result.get("route") or None, "session_id": session_id})
 
-        # Invoke the graph — this will fetch the previous state (if exists) and then run nodes
-        result = agent._build_graph().invoke(initial_state, config)
 
-    answer = result.get("answer", "")
-    return jsonify({"answer": answer})
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/query/stream', methods=['POST', 'OPTIONS'])
+def query_stream():
+    """
+    Query receipts, streaming the answer as Server-Sent Events
+    
+    Request: same as /api/query
+    Events (each "event: <name>" + "data: <json>"):
+        stage  {"stage": "route" | "search_creator" | "search" | "reason", "route": "direct" | "rewrite",
+                "results": n, "filters": "..."} as each step finishes
+        token  {"text": "..."} answer text as the LLM produces it
+        done   {"answer": "...", "prompt_tokens": {...}, "route": ..., "cached": bool, "session_id": "...", "ttft_ms": ..., "total_ms": ...}
+        error  {"error": "..."}
+    """
+    # Handle CORS / preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    question, variant, use_cache, session_id, error = parse_query_request()
+    if error:
+        return error
+
+    start = time.perf_counter()
+    agent = get_agent()
+    config = {"configurable": {"thread_id": session_id}}
+
+    def generate():
+        ttft = None
+        # Held until the graph finishes, even if the client disconnects mid-answer
+        with get_query_lock(session_id):
+            state = initial_query_state(question)
+            cache_key, cached = agent.lookup_response(question, variant, config, state["today"]) if use_cache else (None, None)
+            if cached is not None:
+                agent.remember_turn(config, variant, question, cached["answer"])
+                total = time.perf_counter() - start
+                query_latency.record("query_cached", total, ttft=total)
+                yield sse("token", {"text": cached["answer"]})
+                yield sse("done", {"answer": cached["answer"], "prompt_tokens": {}, "cached": True,
+                                   "session_id": session_id, "ttft_ms": total * 1000, "total_ms": total * 1000})
+                return
+
+            for event in agent.stream_events(state, config, variant):
+                name = event.pop("event")
+                if name == "token" and ttft is None:
+                    ttft = time.perf_counter() - start
+                if name == "done":
+                    if use_cache:
+                        agent.store_response(question, variant, cache_key, {"answer": event["answer"]})
+                    total = time.perf_counter() - start
+                    query_latency.record("query_stream", total, ttft=ttft)
+                    if event.get("route"):
+                        agent.route_latency.record(event["route"], total, ttft=ttft)
+                    event.update({
+                        "cached": False,
+                        "session_id": session_id,
+                        "ttft_ms": ttft * 1000 if ttft is not None else None,
+                        "total_ms": total * 1000
+                    })
+                yield sse(name, event)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # let proxies pass events through unbuffered
+    })
 
 
 
 @app.route('/api/process', methods=['POST', 'OPTIONS'])
 def process_receipt():
     """
-    Process a receipt image from base64
+    Queue a receipt image (base64) for background processing
     
     Request: {"base64_image": "base64_string_here"}
-    Response: {"status": "success", "message": "Receipt processed successfully"}
+    Response (202): {"status": "queued", "job_id": "...", "message": "..."}
+    Poll /api/jobs/<job_id> for the result. Returns 503 when the queue is full.
     """
     # Handle OPTIONS preflight
     if request.method == 'OPTIONS':
@@ -123,25 +347,222 @@ def process_receipt():
         if not base64_image:
             return jsonify({"error": "Missing base64_image field"}), 400
         
-        print(f"Processing base64 image...")
-        
-        # Use lock to prevent concurrent access
-        with agent_lock:
-            receipt_processor = get_processor()
-            receipt_data = receipt_processor.process_receipt(base64_image)
-        
-        print(f"Receipt processed successfully")
+        start_workers()
+        try:
+            job_id = get_job_queue().enqueue(base64_image)
+        except QueueFullError as e:
+            response = jsonify({"error": str(e)})
+            response.headers["Retry-After"] = "10"
+            return response, 503
+
+        print(f"Queued receipt job {job_id}")
         
         return jsonify({
-            "status": "success",
-            "message": "Receipt processed and saved to database successfully"
-        })
+            "status": "queued",
+            "job_id": job_id,
+            "message": "Receipt queued for processing"
+        }), 202
         
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/process/upload', methods=['POST', 'OPTIONS'])
+def upload_receipt():
+    """
+    Queue a receipt image sent as binary (no base64 overhead)
+    
+    Request: either a raw body with Content-Type image/* (e.g. image/jpeg),
+             or multipart/form-data with the image in a "file" field
+    Response (202): {"status": "queued", "job_id": "...", "message": "..."}
+    Returns 413 when the image exceeds MAX_UPLOAD_MB, 503 when the queue is full.
+    """
+    # Handle OPTIONS preflight
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    too_large = {"error": f"Image exceeds the {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB upload limit"}
+    # Reject before reading anything when the declared size is already over the limit
+    # (multipart framing is small, so allow a little slack for it)
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES + 64 * 1024:
+        return jsonify(too_large), 413
+
+    try:
+        mimetype = request.mimetype or ""
+        if mimetype.startswith("image/"):
+            # Read the body stream directly; bounded in case it is chunked
+            image_bytes = request.stream.read(MAX_UPLOAD_BYTES + 1)
+        elif mimetype == "multipart/form-data":
+            if request.content_length is None:
+                return jsonify({"error": "Content-Length is required for multipart uploads"}), 411
+            upload = request.files.get("file")
+            if upload is None:
+                return jsonify({"error": "Missing file field"}), 400
+            image_bytes = upload.stream.read(MAX_UPLOAD_BYTES + 1)
+        else:
+            return jsonify({"error": "Content-Type must be image/* or multipart/form-data"}), 415
+
+        if len(image_bytes) > MAX_UPLOAD_BYTES:
+            return jsonify(too_large), 413
+        if not image_bytes:
+            return jsonify({"error": "Request body is empty"}), 400
+
+        # Only the header is parsed here; OCR decodes the image later
+        try:
+            Image.open(BytesIO(image_bytes))
+        except UnidentifiedImageError:
+            return jsonify({"error": "Unsupported or corrupt image"}), 400
+
+        start_workers()
+        try:
+            job_id = get_job_queue().enqueue(image_bytes)
+        except QueueFullError as e:
+            response = jsonify({"error": str(e)})
+            response.headers["Retry-After"] = "10"
+            return response, 503
+
+        print(f"Queued receipt job {job_id} ({len(image_bytes)} bytes)")
+
+        return jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "message": "Receipt queued for processing"
+        }), 202
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Status of an ingestion job
+    
+    Response: {"job_id": "...", "status": "queued|running|done|failed", "result": {...}, "error": null}
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job_id"}), 404
+    return jsonify(job)
+
+
+def encode_cursor(after):
+    """Opaque page token for a keyset key (doc_id or [date, doc_id])"""
+    return base64.urlsafe_b64encode(json.dumps(after).encode()).decode()
+
+
+def decode_cursor(token, order_by):
+    after = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if order_by == "date":
+        if not (isinstance(after, list) and len(after) == 2):
+            raise ValueError("cursor does not match order")
+        return tuple(after)
+    if not isinstance(after, str):
+        raise ValueError("cursor does not match order")
+    return after
+
+
+@app.route('/api/receipts', methods=['GET'])
+def list_receipts():
+    """
+    Page through stored receipts (keyset pagination, stable under inserts)
+    
+    Query params: limit (default 50, max 500), order ("date" | "doc_id", default "date"),
+                  desc (default 1 for date), fields (comma-separated, e.g. "vendor,total_amount"),
+                  cursor (next_cursor of the previous page), and the filters
+                  date_from, date_to, vendor, min_amount, max_amount, currency
+    Response: {"receipts": [...], "next_cursor": "..." | null}
+    """
+    args = request.args
+    order_by = args.get("order", "date")
+    if order_by not in ReceiptDB.ORDERINGS:
+        return jsonify({"error": f"Unknown order: {order_by}"}), 400
+    descending = args.get("desc", "1" if order_by == "date" else "0").lower() in ("1", "true", "yes")
+    fields = [f.strip() for f in args["fields"].split(",") if f.strip()] if args.get("fields") else None
+    if fields and set(fields) - set(ReceiptDB.FIELDS):
+        return jsonify({"error": f"Unknown fields; allowed: {', '.join(ReceiptDB.FIELDS)}"}), 400
+
+    try:
+        limit = min(max(int(args.get("limit", 50)), 1), MAX_PAGE_SIZE)
+        filters = {key: args.get(key) for key in ("date_from", "date_to", "vendor", "currency")}
+        for key in ("min_amount", "max_amount"):
+            filters[key] = float(args[key]) if args.get(key) else None
+        after = decode_cursor(args["cursor"], order_by) if args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    receipts, next_after = get_agent().receipt_db.receipts_page(
+        limit=limit, order_by=order_by, descending=descending, fields=fields, filters=filters, after=after
+    )
+    return jsonify({
+        "receipts": receipts,
+        "next_cursor": encode_cursor(next_after) if next_after is not None else None
+    })
+
+
+@app.route('/api/stats', methods=['GET'])
+def spending_stats():
+    """
+    Spending totals from the precomputed rollups (no scan of the receipts)
+    
+    Query params: group (comma-separated "day" | "month" and/or "vendor", default "month"),
+                  date_from, date_to, vendor, currency, limit (default 100, max 500),
+                  items (number of top items, default 10, 0 for none)
+    Response: {"spending": [{"month": "2025-11", "currency": "IDR", "receipts": ..., "total": ...,
+                             "items": ..., "average": ...}, ...],
+               "top_items": [{"name": "...", "currency": "...", "count": ..., "total": ...}, ...]}
+    """
+    args = request.args
+    group_by = [g.strip() for g in args.get("group", "month").split(",") if g.strip()]
+    filters = {key: args.get(key) for key in ("date_from", "date_to", "vendor", "currency")}
+    try:
+        limit = min(max(int(args.get("limit", 100)), 1), MAX_PAGE_SIZE)
+        top = min(max(int(args.get("items", 10)), 0), MAX_PAGE_SIZE)
+        receipt_db = get_agent().receipt_db
+        spending = receipt_db.spending_summary(group_by, filters, limit=limit)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    return jsonify({
+        "spending": spending,
+        "top_items": receipt_db.top_items(filters, limit=top) if top else []
+    })
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Runtime counters of the services started so far (reset on restart)
+    
+    Response: {"jobs": {...}, "query_latency": {"query_stream": {"p50_ms": ..., "p50_ttft_ms": ...}, ...}, "extraction": {"rules": ..., "llm": ..., "latency_saved_s": ...},
+               "dedup": {"hit_rate": ..., ...}, "embedding_cache": {...}, "response_cache": {...},
+               "sessions": {"sessions": ..., "checkpoints": ..., "evicted": ...},
+               "routes": {"direct": {"share": ..., "p50_ms": ...}, "rewrite": {...}},
+               "llm": {"upstream_calls": ..., "coalesced": ..., "retries": ..., ...}}
+    """
+    data = {"jobs": get_job_queue().counts(), "query_latency": query_latency.stats()}
+    if processor is not None:
+        data["extraction"] = processor.extraction_stats.stats()
+        if processor.dedup is not None:
+            data["dedup"] = processor.dedup.stats()
+    if agent is not None:
+        data["embedding_cache"] = agent.vector_service.cache_stats()
+        if agent.response_cache is not None:
+            data["response_cache"] = agent.response_cache.stats()
+        data["sessions"] = agent.checkpointer.stats()
+        data["routes"] = agent.route_latency.stats()
+        data["llm"] = agent.llm.client.stats()
+    return jsonify(data)
+
+
 if __name__ == '__main__':
-    # Run with threaded=False to avoid SQLite threading issues
-    app.run(host='0.0.0.0', port=8114, debug=True, threaded=False)
\ No newline at end of file
+    # Under the debug reloader this file runs twice: in the watching parent and in the
+    # serving child (WERKZEUG_RUN_MAIN set). Only the child resumes jobs.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        resume_pending_jobs()
+    # SQLite connections are per thread and the vector index is lock-protected,
+    # so the dev server can serve requests concurrently. For production, run under
+    # a WSGI server, e.g. `gunicorn -w 4 --threads 8 -b 0.0.0.0:8114 main:app`.
+    app.run(host='0.0.0.0', port=8114, debug=True, threaded=True)
\ No newline at end of file
@@ -7,17 +7,25 @@ from typing import Annotated,TypedDict
 from langgraph.graph.message import add_messages
 from langchain_core.messages import AIMessage, HumanMessage, BaseMessage
 import operator
-from datetime import datetime
-from langgraph.checkpoint.memory import MemorySaver
+import queue
+from contextvars import ContextVar
+from datetime import date, datetime
+from threading import Lock, Thread
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from db.vector_service import VectorService
 from db.receipt_db import ReceiptDB
+from db.response_cache import ResponseCache
+from db.checkpoint_store import SQLiteCheckpointer
 from services.llm_service_openrouter import OpenRouterLLM
+from services.query_filters import extract_filters, parse_search_params, has_constraints, describe_filters
+from services.prompt_builder import PromptBuilder
+from services.query_router import route_query
+from services.latency_stats import LatencyStats
 
-today = datetime.now().date()
-checkpointer = MemorySaver()
+# Set by stream_events: the reason node hands answer tokens to it as they arrive
+token_sink = ContextVar("token_sink", default=None)
 
 # --- State Schema ---
 class QnAState(TypedDict):
@@ -26,19 +34,46 @@ class QnAState(TypedDict):
     summary: str
     answer: str
     search_params : str
+    filters: dict
+    aggregates: list
+    breakdown: dict
+    # "direct" (rule-based filters on the raw query) or "rewrite" (search_creator LLM call)
+    route: str
+    # ISO date of the request; relative periods in filters and prompts resolve against it
+    today: str
+    # Conversation context: last turns verbatim + rolling summary of older ones (see PromptBuilder)
+    history: list
+    history_summary: str
+    prompt_tokens: dict
 
 
 class ReceiptQnAAgent:
     """Receipt Question & Answer Agent using LangGraph"""
     
-    def __init__(self, db_dir: str = None, model_name: str = "openai/gpt-oss-120b"):
+    def __init__(self, db_dir: str = None, model_name: str = "openai/gpt-oss-120b",
+                 search_mode: str = None, lexical_weight: float = None, prompt_budget: int = None,
+                 router: str = None):
         """
         Initialize the Receipt QnA Agent
         
         Args:
             db_dir: Directory containing the database files (default: ../db)
             model_name: LLM model name to use
+            search_mode: "hybrid" (BM25 + vector, default) or "vector" (env SEARCH_MODE)
+            lexical_weight: Share of the BM25 score in hybrid ranking (env HYBRID_LEXICAL_WEIGHT)
+            prompt_budget: Token budget of the answer prompt (env PROMPT_TOKEN_BUDGET)
+            router: "rules" (simple questions skip the LLM rewrite, default) or "off" (env QUERY_ROUTER)
         """
+        self.search_mode = search_mode or os.getenv("SEARCH_MODE", "hybrid")
+        if self.search_mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {self.search_mode}")
+        self.lexical_weight = lexical_weight if lexical_weight is not None else float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.3"))
+        self.router = router or os.getenv("QUERY_ROUTER", "rules")
+        if self.router not in self.ROUTERS:
+            raise ValueError(f"Unknown router: {self.router}")
+        self.router_max_words = int(os.getenv("ROUTER_MAX_WORDS", "6"))
+        # End-to-end latency per route, recorded by the API
+        self.route_latency = LatencyStats()
         # Setup database paths
         if db_dir is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -46,127 +81,408 @@ class ReceiptQnAAgent:
         
         sqlite_db_path = os.path.join(db_dir, "receipts.db")
         vector_db_path = os.path.join(db_dir, "vector_db.pkl")
+        embedding_cache_path = os.path.join(db_dir, "embedding_cache.db")
+        checkpoint_path = os.path.join(db_dir, "checkpoints.db")
         
         # Initialize services
-        self.vector_service = VectorService(db_path=vector_db_path)
+        self.vector_service = VectorService(db_path=vector_db_path, cache_path=embedding_cache_path)
         self.receipt_db = ReceiptDB(db_path=sqlite_db_path, vector_service=self.vector_service)
         self.llm = OpenRouterLLM(model_name=model_name)
+        self.prompt_builder = PromptBuilder(budget=prompt_budget)
+
+        # Answers to repeated questions, valid until the receipts change (RESPONSE_CACHE_SIZE=0 disables)
+        cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        self.response_cache = ResponseCache(
+            max_size=cache_size,
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+        ) if cache_size > 0 else None
+
+        # Conversation state per session (thread_id), shared by all workers and kept across restarts
+        self.checkpointer = SQLiteCheckpointer(
+            db_path=checkpoint_path,
+            keep_last=int(os.getenv("CHECKPOINT_KEEP_LAST", "5")),
+            ttl=float(os.getenv("SESSION_TTL", "86400"))
+        )
+
+        # Compiled graphs, built lazily once per variant and shared across requests
+        self._graphs = {}
+        self._graph_lock = Lock()
     
+    @staticmethod
+    def _record_prompt_tokens(state: QnAState, node: str, tokens: int) -> dict:
+        """Add a node's prompt size to the per-request token counts"""
+        counts = dict(state.get("prompt_tokens") or {})
+        counts[node] = tokens
+        counts["total"] = sum(value for key, value in counts.items() if key != "total")
+        return counts
+
+    @staticmethod
+    def _today(state: QnAState) -> date:
+        """The request's date (see QnAState.today), or the current one when the caller did not set it"""
+        return date.fromisoformat(state["today"]) if state.get("today") else datetime.now().date()
+
+    ROUTERS = ("rules", "off")
+
+    def _route_node(self, state: QnAState) -> QnAState:
+        """Send simple questions straight to search; the rest through the search_creator rewrite"""
+        if self.router == "off":
+            return {"route": "rewrite"}
+        filters = extract_filters(state["query"], self._today(state), self.receipt_db.vendors())
+        route, reason = route_query(state["query"], filters, bool(state.get("history")), self.router_max_words)
+        print(f"Route: {route} ({reason})")
+        # The search node reuses the filters of a direct route
+        return {"route": route, "filters": filters if route == "direct" else {}}
+
     def _llm_search_node(self, state: QnAState) -> QnAState:
         """Generate answer based on search results"""
         query = state["query"]
-        summary = state.get("summary", [])
+        history = self.prompt_builder.render_history(state.get("history_summary"), state.get("history"))
         
-        prompt =f"""
-        You are an assistant that has functions to define which kind of infromation that the user wants to perform 
-        on his receipts, today is {today},
-        You only need to create search parameter based on the user's query.
-        Here is the question from the user: {query}
-        Here is also the previous conversation with the user: {state['messages']}
-        Please answer the user's question using the information above.  
-        """
+        prompt = (
+            f"You turn a user's question about their receipts into search parameters. Today is {self._today(state)}.\n"
+            f"Previous conversation:\n{history}\n"
+            f"Question: {query}\n"
+            "Answer with a JSON object only (no markdown), using null for anything the question does not constrain:\n"
+            '{"text": "short free-text search about the items / kind of purchase", '
+            '"date_from": "YYYY-MM-DD", "date_to": "YYYY-MM-DD", "vendor": "store name as the user wrote it", '
+            '"min_amount": number, "max_amount": number, "currency": "ISO code such as USD or IDR", '
+            '"aggregate": "sum" | "count" | "avg" | "min" | "max", "breakdown": "day" | "month" | "vendor" | "items"}\n'
+            'Set "aggregate" only when the question asks for a total, a count, an average or the cheapest/most expensive receipt. '
+            'Set "breakdown" only when it asks for figures per day, per month, per vendor, or for the most bought items.'
+        )
+        state["prompt_tokens"] = self._record_prompt_tokens(state, "search_creator", self.prompt_builder.count(prompt))
         
         answer = self.llm.generate(prompt)
         state["search_params"] = answer
         print(f"\n=== Search Params ===\n{answer}\n")
         return state
     
-    def search_receipts(self, query: str, top_k: int = 4) -> List[dict]:
+    SEARCH_MODES = ("hybrid", "vector")
+    # Most candidates a structured filter may hand to vector ranking (newest kept)
+    MAX_FILTER_CANDIDATES = 5000
+    # Hybrid mode ranks top_k * this many hits from each retriever before fusing
+    HYBRID_CANDIDATE_FACTOR = 5
+
+    def search_receipts(self, query: str, top_k: int = 4, filters: dict = None) -> List[dict]:
         """
-        Search receipts by a free-text query using vector similarity
+        Search receipts by a free-text query using vector similarity (fused with BM25 in hybrid mode)
         
         Args:
             query: The user's free-text query
-            top_k: Number of top results to return
+            top_k: Number of top results to return (ranked by search_mode)
+            filters: Structured filters (see ReceiptDB.filter_doc_ids); when given,
+                only receipts matching them are ranked
         
         Returns:
             List of receipt dictionaries
         """
         storage = []
-        results = self.vector_service.query_vector(query, top_k=top_k)
+        candidates = None
+        if filters and has_constraints(filters):
+            candidates = self.receipt_db.filter_doc_ids(filters, limit=self.MAX_FILTER_CANDIDATES)
+            print(f"Structured filter ({describe_filters(filters)}): {len(candidates)} candidates")
+            if not candidates:
+                return storage
+        if self.search_mode == "hybrid":
+            results = self._hybrid_search(query, top_k, candidates, filters)
+        else:
+            results = self.vector_service.query_vector(query, top_k=top_k, doc_ids=candidates)
         
-        for doc_id, score in results:
-            receipt = self.receipt_db.get_receipt(doc_id)
-            if receipt:
-                receipt['match_score'] = float(score)
-                score = float(score)
-                storage.append(receipt)
-                print(f"Score: {score:.4f}, Receipt: {receipt}")
+        # One batched query for all hits instead of a SELECT per doc_id
+        scores = dict(results)
+        for receipt in self.receipt_db.get_receipts([doc_id for doc_id, _ in results]):
+            score = float(scores[receipt["doc_id"]])
+            receipt['match_score'] = score
+            storage.append(receipt)
+            print(f"Score: {score:.4f}, Receipt: {receipt}")
         
         return storage
     
+    def _hybrid_search(self, query: str, top_k: int, candidates: list = None, filters: dict = None):
+        """
+        Fuse BM25 (vendor / item names) and cosine similarity:
+        score = (1 - w) * cosine + w * bm25 / best bm25, over the union of both hit lists
+        """
+        pool = top_k * self.HYBRID_CANDIDATE_FACTOR
+        vector_hits = dict(self.vector_service.query_vector(query, top_k=pool, doc_ids=candidates))
+        lexical_hits = dict(self.receipt_db.lexical_search(query, limit=pool, filters=filters if candidates else None))
+        if not lexical_hits:
+            return sorted(vector_hits.items(), key=lambda hit: hit[1], reverse=True)[:top_k]
+
+        # Lexical-only hits still need a cosine score
+        missing = [doc_id for doc_id in lexical_hits if doc_id not in vector_hits]
+        if missing:
+            vector_hits.update(self.vector_service.query_vector(query, top_k=len(missing), doc_ids=missing))
+
+        best_lexical = max(lexical_hits.values()) or 1.0
+        w = self.lexical_weight
+        fused = {
+            doc_id: (1 - w) * float(cosine) + w * lexical_hits.get(doc_id, 0.0) / best_lexical
+            for doc_id, cosine in vector_hits.items()
+        }
+        return sorted(fused.items(), key=lambda hit: hit[1], reverse=True)[:top_k]
+
     def _search_node(self, state: QnAState) -> QnAState:
         """Execute the search and store results in summary"""
-        query = state["search_params"] 
-        receipts = self.search_receipts(query)
+        # Direct routes and the "fast" graph variant skip search_creator, so filters come from the raw query
+        if state.get("search_params"):
+            filters = parse_search_params(state["search_params"], state["query"], self._today(state), self.receipt_db.vendors())
+        elif state.get("route") == "direct" and state.get("filters"):
+            filters = state["filters"]
+        else:
+            filters = extract_filters(state["query"], self._today(state), self.receipt_db.vendors())
+
+        receipts = self.search_receipts(filters["text"] or state["query"], filters=filters)
+        if not receipts and has_constraints(filters) and not filters["aggregate"]:
+            # Filters may be over-strict (e.g. a misspelled vendor): fall back to plain similarity
+            receipts = self.search_receipts(filters["text"] or state["query"])
+
+        # Totals and counts come from SQL over every matching receipt, not from the top-k
+        aggregates = self.receipt_db.aggregate_receipts(filters) if filters["aggregate"] else None
+        breakdown = self.spending_breakdown(filters) if filters.get("breakdown") else None
         
         print("\n=== Search Results ===")
         print(receipts)
         
         state["summary"] = receipts
+        state["filters"] = filters
+        state["aggregates"] = aggregates
+        state["breakdown"] = breakdown
         return state
+
+    # Most rollup rows put in the answer prompt
+    MAX_BREAKDOWN_ROWS = 40
+
+    def spending_breakdown(self, filters: dict):
+        """
+        Tool for breakdown questions ("spend per month", "which store do I visit most",
+        "what do I buy most often"): totals per day / month / vendor or the top items,
+        read from the precomputed rollups. None when the rollups can't answer exactly
+        (amount bounds, or top items of one vendor).
+        """
+        kind = filters["breakdown"]
+        if filters.get("min_amount") is not None or filters.get("max_amount") is not None:
+            return None
+        rollup_filters = {key: filters.get(key) for key in ("date_from", "date_to", "vendor", "currency")}
+        if kind == "items":
+            if filters.get("vendor"):
+                return None
+            rows = self.receipt_db.top_items(rollup_filters, limit=self.MAX_BREAKDOWN_ROWS)
+        else:
+            rows = self.receipt_db.spending_summary((kind,), rollup_filters, limit=self.MAX_BREAKDOWN_ROWS)
+        return {"kind": kind, "rows": rows}
     
     def _llm_reason_node(self, state: QnAState) -> QnAState:
         """Generate answer based on search results"""
         query = state["query"]
         summary = state.get("summary", [])
         
-        # Format receipts for the prompt
-        receipts_text = ""
-        for i, receipt in enumerate(summary, 1):
-            receipts_text += f"\nReceipt {i}:\n"
-            receipts_text += f"  Date: {receipt.get('date_of_purchase', 'N/A')}\n"
-            receipts_text += f"  Vendor: {receipt.get('vendor', 'N/A')}\n"
-            receipts_text += f"  Total: {receipt.get('total_amount', 'N/A')}\n"
-            receipts_text += f"  Items: {receipt.get('items', 'N/A')}\n"
-            receipts_text += f"  Match Score: {receipt.get('match_score', 'N/A'):.4f}\n"
-        
-        prompt =f"""
-        You are an assistant that has functions to answer question about a user's receipts, today is {today},
-        The answer itself can be from two sources, the first one is from the receipts that has been provided,
-        and the second one is from your own knowledge. or based on the preveious converstaion with the user.
-        so even though there is a matching receipt but dont related to the current question and the question somehow related to the previous conversation,
-        you can use your own knowledge to answer the question.
-        Always make sure that you use the correct currency format based on the given information, currency is a parameter in receipt text.
-        Here is the question from the user: {query}
-        Here is also the previous conversation with the user: {state['messages']}
-        Here are the matching receipts:
-        {receipts_text}
-        Please answer the user's question using the information above.
-        """
+        aggregates_text = ""
+        aggregates = state.get("aggregates")
+        if aggregates is not None:
+            filters = state.get("filters") or {}
+            aggregates_text = f"Exact figures from the database over ALL receipts matching the filters ({describe_filters(filters)}); "
+            aggregates_text += "use these for totals, counts, averages, cheapest and most expensive instead of adding up the receipts below:\n"
+            amount = lambda value: f"{value:,.2f}" if isinstance(value, (int, float)) else "N/A"
+            for row in aggregates:
+                aggregates_text += (
+                    f"  {row['currency']}: {row['count']} receipts, total {amount(row['total'])}, average {amount(row['average'])}, "
+                    f"cheapest {amount(row['min'])}, most expensive {amount(row['max'])}, from {row['first_date']} to {row['last_date']}\n"
+                )
+            if not aggregates:
+                aggregates_text += "  No receipts match these filters.\n"
         
-        answer = self.llm.generate(prompt)
-        new_messages  = [f"Question: {query} Answer: {answer}"]
-        print("\n=== State Messages ===")
-        print(state["messages"])
-        # Trim to last 5 messages
-        updated_messages = (state.get("messages") or []) + new_messages
-        MAX_MESSAGES = 5
-        if len(updated_messages) > MAX_MESSAGES:
-            updated_messages = updated_messages[-MAX_MESSAGES:]
-
-        print("\n=== State Messages ===")
-        print(updated_messages)
+        breakdown = state.get("breakdown")
+        if breakdown is not None:
+            filters = state.get("filters") or {}
+            aggregates_text += f"Precomputed totals over ALL receipts matching the filters ({describe_filters(filters)}), "
+            if breakdown["kind"] == "items":
+                aggregates_text += "most bought items first:\n"
+                for row in breakdown["rows"]:
+                    aggregates_text += f"  {row['name']}: bought {row['count']} times, {row['total']:,.2f} {row['currency']}\n"
+            else:
+                aggregates_text += f"per {breakdown['kind']} and currency:\n"
+                for row in breakdown["rows"]:
+                    aggregates_text += (
+                        f"  {row[breakdown['kind']] or 'unknown'} {row['currency']}: {row['receipts']} receipts, "
+                        f"total {row['total']:,.2f}, {row['items']} items\n"
+                    )
+            if not breakdown["rows"]:
+                aggregates_text += "  No receipts match these filters.\n"
+        
+        history = self.prompt_builder.render_history(state.get("history_summary"), state.get("history"))
+        before = (
+            f"You answer questions about a user's receipts. Today is {self._today(state)}.\n"
+            "Use the receipts below, the previous conversation, or your own knowledge when the receipts are unrelated "
+            "to a follow-up question. Always use the currency given with each receipt.\n"
+            f"Previous conversation:\n{history}\n"
+            f"Question: {query}\n"
+            f"{aggregates_text}"
+            "Matching receipts (items most relevant to the question first):\n"
+        )
+        after = "\nAnswer the question using the information above."
+        prompt, prompt_tokens = self.prompt_builder.fit_receipts(before, after, summary, query)
+        tokens = self._record_prompt_tokens(state, "reason", prompt_tokens)
+        print(f"Prompt tokens: {tokens}")
+        
+        sink = token_sink.get()
+        if sink is None:
+            answer = self.llm.generate(prompt)
+        else:
+            parts = []
+            for text in self.llm.stream(prompt):
+                parts.append(text)
+                sink(text)
+            answer = "".join(parts)
+        history_summary, history = self.prompt_builder.update_history(
+            state.get("history_summary"), state.get("history"), query, answer
+        )
 
         return {
             "answer": answer,
-            "messages": updated_messages
+            "history": history,
+            "history_summary": history_summary,
+            "prompt_tokens": tokens
         }
             
-    def _build_graph(self) -> StateGraph:
+    # ---------------- Response cache ----------------
+    def lookup_response(self, question: str, variant: str, config: dict = None, today: str = None):
+        """
+        Return (cache_key, cached response or None). Pass cache_key to store_response
+        after answering; it pins the corpus version, the day the answer was computed at
+        and the question's filters (see filter_signature). Sessions with earlier turns bypass the cache (cache_key None): the history can
+        change the answer, and the cache is shared by every session.
+        """
+        if self.response_cache is None:
+            return None, None
+        if config is not None and (self.get_graph(variant).get_state(config).values or {}).get("history"):
+            self.response_cache.skip()
+            return None, None
+        cache_key = (self.vector_service.embed_text(question), self.receipt_db.corpus_version(), today,
+                     self.filter_signature(question, today))
+        return cache_key, self.response_cache.get(question, cache_key[0], variant, cache_key[1],
+                                                  day=cache_key[2], filters=cache_key[3])
+
+    def store_response(self, question: str, variant: str, cache_key, response: dict):
+        if self.response_cache is not None and cache_key is not None:
+            self.response_cache.put(question, cache_key[0], variant, cache_key[1], response,
+                                    day=cache_key[2], filters=cache_key[3])
+
+    def filter_signature(self, question: str, today: str = None) -> tuple:
+        """
+        The structured filters of a question (date range, vendor, amount bounds, currency,
+        aggregate, breakdown) as a hashable tuple. "Spending in November" and "spending in
+        October" embed almost identically, so cached answers must match on this exactly.
+        """
+        filters = extract_filters(question, date.fromisoformat(today) if today else None, self.receipt_db.vendors())
+        return tuple(sorted((key, value) for key, value in filters.items() if key != "text"))
+
+    def remember_turn(self, config: dict, variant: str, question: str, answer: str):
+        """Add a turn answered from the cache to the conversation history of the thread"""
+        graph = self.get_graph(variant)
+        values = graph.get_state(config).values or {}
+        history_summary, history = self.prompt_builder.update_history(
+            values.get("history_summary"), values.get("history"), question, answer
+        )
+        graph.update_state(config, {
+            "query": question,
+            "answer": answer,
+            "history": history,
+            "history_summary": history_summary
+        }, as_node="reason")
+
+    # ---------------- Streaming ----------------
+    def stream_events(self, initial_state: dict, config: dict, variant: str = "full"):
+        """
+        Run the graph and yield its progress as event dicts:
+            {"event": "stage", "stage": "route" | "search_creator" | "search" | "reason", ...} when a node finishes
+            {"event": "token", "text": "..."} for each piece of the answer as the LLM produces it
+            {"event": "done", "answer": "...", "prompt_tokens": {...}, "route": ...} or {"event": "error", "error": "..."}
+        The graph runs in a worker thread; closing the generator early still waits
+        for it, so the conversation checkpoint is complete when this returns.
+        """
+        events = queue.Queue()
+
+        def run():
+            token_sink.set(lambda text: events.put({"event": "token", "text": text}))
+            final = {}
+            try:
+                for update in self.get_graph(variant).stream(initial_state, config, stream_mode="updates"):
+                    for node, values in update.items():
+                        values = values or {}
+                        final.update(values)
+                        events.put(self._stage_event(node, values))
+                events.put({"event": "done", "answer": final.get("answer", ""), "prompt_tokens": final.get("prompt_tokens", {}),
+                            "route": final.get("route")})
+            except Exception as e:
+                print(f"Error: {str(e)}")
+                events.put({"event": "error", "error": str(e)})
+            events.put(None)
+
+        worker = Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            worker.join()
+
+    @staticmethod
+    def _stage_event(node: str, values: dict) -> dict:
+        event = {"event": "stage", "stage": node}
+        if node == "route":
+            event["route"] = values.get("route")
+        if node == "search":
+            event["results"] = len(values.get("summary") or [])
+            event["filters"] = describe_filters(values.get("filters") or {})
+        return event
+
+    GRAPH_VARIANTS = ("full", "fast")
+
+    def get_graph(self, variant: str = "full"):
+        """
+        Return the compiled graph for a variant, compiling it on first use.
+
+        Variants:
+            full: route -> [search_creator ->] search -> reason (the router decides on the LLM query rewrite)
+            fast: search -> reason (no LLM query rewrite)
+        """
+        graph = self._graphs.get(variant)
+        if graph is None:
+            with self._graph_lock:
+                graph = self._graphs.get(variant)
+                if graph is None:
+                    graph = self._build_graph(variant)
+                    self._graphs[variant] = graph
+        return graph
+
+    def _build_graph(self, variant: str = "full") -> StateGraph:
         """Build and compile the LangGraph agent"""
+        if variant not in self.GRAPH_VARIANTS:
+            raise ValueError(f"Unknown graph variant: {variant}")
         graph = StateGraph(QnAState)
         
         # Add nodes
-        graph.add_node("search_creator", self._llm_search_node)
+        if variant == "full":
+            graph.add_node("route", self._route_node)
+            graph.add_node("search_creator", self._llm_search_node)
         graph.add_node("search", self._search_node)
         graph.add_node("reason", self._llm_reason_node)
         
         # Add edges
-        graph.add_edge(START, "search_creator")
-        graph.add_edge("search_creator", "search")
+        if variant == "full":
+            graph.add_edge(START, "route")
+            graph.add_conditional_edges("route", lambda state: state["route"],
+                                        {"rewrite": "search_creator", "direct": "search"})
+            graph.add_edge("search_creator", "search")
+        else:
+            graph.add_edge(START, "search")
         graph.add_edge("search", "reason")
         graph.add_edge("reason", END)
         
-        agentic_result = graph.compile(checkpointer=checkpointer)
+        agentic_result = graph.compile(checkpointer=self.checkpointer)
         return agentic_result
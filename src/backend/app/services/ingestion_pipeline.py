@@ -0,0 +1,170 @@
+import sys
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ocr_pool import OCRWorkerPool
+from services.ocr_service import as_image_bytes
+
+
+class IngestionPipeline:
+    """
+    Staged batch ingestion: OCR -> LLM extraction -> batched DB/embedding write.
+
+    Stages run concurrently and are connected by bounded asyncio queues, so the
+    CPU-bound OCR of one receipt overlaps with the network-bound LLM call of
+    another and with the embedding of a third. The per-receipt work of each stage
+    is the processor's (the same steps as ReceiptProcessor.process_receipt):
+        - dedup: images already ingested (processor.find_duplicate), or repeated
+                 earlier in the same batch, are answered from the DB / the first
+                 copy's result and skip the other stages; near-identical images
+                 are checked after extraction (processor.confirm_duplicate)
+        - OCR:   the processor's OCRWorkerPool if it has one, else a pool of
+                 `ocr_workers` processes (0 = processor.extract_text in a thread)
+        - LLM:   `llm_workers` concurrent processor.extract_receipt calls
+        - write: one writer flushing up to `write_batch_size` receipts per
+                 processor.save_receipts call (one transaction + one embedding
+                 batch, retried one by one if it fails)
+    """
+    def __init__(self, processor, ocr_workers: int = 2, llm_workers: int = 8,
+                 write_batch_size: int = 16, queue_size: int = 32):
+        self.processor = processor
+        self.ocr_workers = ocr_workers
+        self.llm_workers = llm_workers
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
+        self.ocr_pool = getattr(processor, "ocr_pool", None)
+        self._owns_ocr_pool = False
+        if self.ocr_pool is None and ocr_workers > 0:
+            self.ocr_pool = OCRWorkerPool(num_workers=ocr_workers)
+            self._owns_ocr_pool = True
+        if self.ocr_pool is not None:
+            self.ocr_workers = self.ocr_pool.num_workers
+        self.stats = {}
+
+    def process_receipts(self, base64_images):
+        """
+        Ingest a batch of images (base64 strings or raw bytes). Returns one entry per input, in order:
+        the extracted receipt dict, or {"error": "..."} if that receipt failed.
+        Blocking; from a coroutine, await aprocess_receipts instead (called with an event loop
+        running in this thread, the batch runs on its own loop in a helper thread and the
+        caller's loop is blocked until it is done).
+        """
+        images = list(base64_images)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._run(images))
+        # asyncio.run can't nest inside a running loop
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self._run(images)).result()
+
+    async def aprocess_receipts(self, base64_images):
+        """process_receipts for async callers, run on the caller's event loop"""
+        return await self._run(list(base64_images))
+
+    def close(self):
+        if self._owns_ocr_pool:
+            self.ocr_pool.close()
+        self.ocr_pool = None
+
+    # ---------------- Stages ----------------
+    async def _run(self, images):
+        results = [None] * len(images)
+        ocr_queue = asyncio.Queue(self.queue_size)
+        llm_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        timings = {"ocr": 0.0, "llm": 0.0, "write": 0.0}
+        # Content hash -> index of the first copy of an image in this batch, and the copies waiting on it
+        first_copy = {}
+        copies = {}
+        start = time.perf_counter()
+
+        async def feed():
+            for i, image in enumerate(images):
+                await ocr_queue.put((i, image))
+
+        async def ocr_stage():
+            while True:
+                i, image = await ocr_queue.get()
+                t0 = time.perf_counter()
+                try:
+                    image_bytes = as_image_bytes(image)
+                    hashes, duplicate = await asyncio.to_thread(self.processor.find_duplicate, image_bytes)
+                    if duplicate is not None:
+                        results[i] = duplicate
+                    elif hashes is not None and hashes[0] in first_copy:
+                        # Not stored yet, so find_duplicate can't see it: reuse the first copy's result
+                        copies.setdefault(first_copy[hashes[0]], []).append(i)
+                    else:
+                        if hashes is not None:
+                            first_copy[hashes[0]] = i
+                        if self.ocr_pool is not None:
+                            text = await asyncio.wrap_future(self.ocr_pool.submit(image_bytes))
+                        else:
+                            text = await asyncio.to_thread(self.processor.extract_text, image_bytes)
+                        await llm_queue.put((i, hashes, text))
+                except Exception as e:
+                    results[i] = {"error": str(e)}
+                timings["ocr"] += time.perf_counter() - t0
+                ocr_queue.task_done()
+
+        async def llm_stage():
+            while True:
+                i, hashes, text = await llm_queue.get()
+                t0 = time.perf_counter()
+                try:
+                    receipt_data, duplicate = await asyncio.to_thread(self.processor.extract_receipt, text, hashes)
+                    if duplicate is not None:
+                        results[i] = duplicate
+                    else:
+                        await write_queue.put((i, hashes, receipt_data))
+                except Exception as e:
+                    results[i] = {"error": str(e)}
+                timings["llm"] += time.perf_counter() - t0
+                llm_queue.task_done()
+
+        async def write_stage():
+            while True:
+                batch = [await write_queue.get()]
+                while len(batch) < self.write_batch_size and not write_queue.empty():
+                    batch.append(write_queue.get_nowait())
+                t0 = time.perf_counter()
+                try:
+                    saved = await asyncio.to_thread(self.processor.save_receipts, [(h, r) for _, h, r in batch])
+                    for (i, _, _), result in zip(batch, saved):
+                        results[i] = result
+                except Exception as e:
+                    for i, _, _ in batch:
+                        results[i] = {"error": str(e)}
+                timings["write"] += time.perf_counter() - t0
+                for _ in batch:
+                    write_queue.task_done()
+
+        workers = [asyncio.create_task(ocr_stage()) for _ in range(max(self.ocr_workers, 1))]
+        workers += [asyncio.create_task(llm_stage()) for _ in range(self.llm_workers)]
+        workers.append(asyncio.create_task(write_stage()))
+
+        await feed()
+        for queue in (ocr_queue, llm_queue, write_queue):
+            await queue.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for first, indexes in copies.items():
+            for i in indexes:
+                results[i] = results[first] if "error" in (results[first] or {}) else {**results[first], "duplicate": True}
+
+        elapsed = time.perf_counter() - start
+        self.stats = {
+            "receipts": len(images),
+            "failed": sum(1 for r in results if r is None or "error" in r),
+            "elapsed_s": elapsed,
+            "receipts_per_s": len(images) / elapsed if elapsed else 0.0,
+            "stage_busy_s": timings
+        }
+        return results
@@ -0,0 +1,59 @@
+import sys
+import os
+import traceback
+from threading import Thread, Event, BoundedSemaphore
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.job_queue import JobQueue
+from services.receipt_ingestion import ReceiptProcessor
+
+
+class IngestionWorkerPool:
+    """
+    Background threads that drain a JobQueue through ReceiptProcessor.
+
+    Each job runs dedup check -> OCR -> LLM extraction -> DB/vector save. The OCR and LLM
+    stages each have their own concurrency limit, so e.g. several LLM calls
+    can be outstanding while a single OCR runs.
+    """
+    def __init__(self, processor: ReceiptProcessor, queue: JobQueue, num_workers: int = 4,
+                 ocr_concurrency: int = 1, llm_concurrency: int = 4):
+        self.processor = processor
+        self.queue = queue
+        self.num_workers = num_workers
+        self.ocr_slots = BoundedSemaphore(ocr_concurrency)
+        self.llm_slots = BoundedSemaphore(llm_concurrency)
+        self._stop = Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.num_workers):
+            thread = Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.queue.claim(timeout=1.0)
+            if job is None:
+                continue
+            job_id, payload = job
+            try:
+                receipt_data = self.process(payload)
+                self.queue.complete(job_id, receipt_data)
+                print(f"Job {job_id} done")
+            except Exception as e:
+                traceback.print_exc()
+                self.queue.fail(job_id, e)
+
+    def process(self, image):
+        """Run one job payload (base64 string or raw image bytes) through all stages"""
+        return self.processor.process_receipt(image, ocr_slot=self.ocr_slots, llm_slot=self.llm_slots)
@@ -0,0 +1,42 @@
+from collections import deque
+from threading import Lock
+
+
+class LatencyStats:
+    """
+    Rolling latency samples per name (e.g. an endpoint): count and share of all
+    records since start, plus mean / p50 / p95 over the last `window` samples,
+    and the same for time-to-first-token where it is recorded.
+    """
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = Lock()
+        self.counts = {}
+        self.samples = {}
+        self.ttft_samples = {}
+
+    def record(self, name, seconds, ttft=None):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            if ttft is not None:
+                self.ttft_samples.setdefault(name, deque(maxlen=self.window)).append(ttft)
+
+    @staticmethod
+    def _summary(samples, prefix):
+        ordered = sorted(samples)
+        return {
+            f"avg_{prefix}ms": sum(ordered) * 1000 / len(ordered),
+            f"p50_{prefix}ms": ordered[len(ordered) // 2] * 1000,
+            f"p95_{prefix}ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+        }
+
+    def stats(self):
+        with self.lock:
+            data = {}
+            total = sum(self.counts.values())
+            for name, count in self.counts.items():
+                data[name] = {"count": count, "share": count / total, **self._summary(self.samples[name], "")}
+                if self.ttft_samples.get(name):
+                    data[name].update(self._summary(self.ttft_samples[name], "ttft_"))
+            return data
@@ -0,0 +1,293 @@
+import os
+import time
+import random
+import asyncio
+import hashlib
+import json
+import queue
+from threading import Lock, Thread
+
+import httpx
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """An LLM call failed (non-retryable status, or retries exhausted)"""
+
+
+class LLMClient:
+    """
+    Shared client for an OpenAI-compatible chat completions endpoint.
+
+    One pooled keep-alive httpx.AsyncClient runs on a private event loop thread,
+    so the same connections serve sync callers (generate), other event loops
+    (agenerate) and every service in the process. On top of it:
+        - at most `max_concurrency` requests are in flight upstream
+        - each attempt is bounded by `timeout` seconds; timeouts, connection
+          errors, 429 and 5xx are retried `max_retries` times with full-jitter
+          exponential backoff (honouring Retry-After)
+        - identical prompts that are already in flight share one upstream call
+    stream() yields the completion as it is generated (retried only until the
+    first token arrives; never coalesced).
+    """
+    def __init__(self, base_url=OPENROUTER_URL, api_key=None, timeout=60.0, max_retries=3,
+                 max_concurrency=8, backoff=0.5, max_backoff=8.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.calls = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.latency_total = 0.0
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+        self._pending = {}
+        # Created on the client loop: asyncio primitives and httpx connections belong to one loop
+        self._semaphore, self._http = self._submit(self._setup()).result()
+
+    async def _setup(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return asyncio.Semaphore(self.max_concurrency), httpx.AsyncClient(
+            base_url=self.base_url, headers=headers, limits=limits, timeout=self.timeout
+        )
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    # ---------------- Public API ----------------
+    def generate(self, prompt, system_prompt="You are a helpful assistant.", model=None, **params):
+        """Blocking call; returns the completion text"""
+        return self._submit(self._generate(prompt, system_prompt, model, params)).result()
+
+    async def agenerate(self, prompt, system_prompt="You are a helpful assistant.", model=None, **params):
+        """Async call usable from any event loop; returns the completion text"""
+        return await asyncio.wrap_future(self._submit(self._generate(prompt, system_prompt, model, params)))
+
+    def stream(self, prompt, system_prompt="You are a helpful assistant.", model=None, **params):
+        """Blocking generator of completion text deltas (OpenAI-style SSE streaming)"""
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            **params,
+            "stream": True
+        }
+        deltas = queue.Queue()
+        future = self._submit(self._stream(payload, deltas))
+        # Longest legitimate gap between items: every attempt timing out, plus the backoff between them
+        idle_timeout = (self.timeout + self.max_backoff) * (self.max_retries + 1)
+        try:
+            while True:
+                try:
+                    kind, value = deltas.get(timeout=idle_timeout)
+                except queue.Empty:
+                    self.timeouts += 1
+                    raise LLMError(f"LLM stream stalled: nothing received for {idle_timeout:g}s") from None
+                if kind == "delta":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Consumer stopped early (e.g. the HTTP client went away): drop the upstream request
+            future.cancel()
+
+    # ---------------- Internals (client loop) ----------------
+    async def _generate(self, prompt, system_prompt, model, params):
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            **params
+        }
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        self.calls += 1
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = self._loop.create_future()
+        self._pending[key] = future
+        try:
+            result = await self._request(payload)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters (if any) retrieve it; don't warn about an unretrieved exception otherwise
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def _request(self, payload):
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.upstream_calls += 1
+                self.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    response = await self._http.post("/chat/completions", json=payload)
+                    error, retry_after = None, response.headers.get("Retry-After")
+                    if response.status_code == 200:
+                        try:
+                            content = response.json()["choices"][0]["message"]["content"]
+                        except (ValueError, KeyError, IndexError, TypeError):
+                            self.failures += 1
+                            raise LLMError(f"Unexpected LLM response: {response.text[:200]}")
+                        self.latency_total += time.perf_counter() - start
+                        return content
+                    error = LLMError(f"LLM request failed with HTTP {response.status_code}: {response.text[:200]}")
+                    if response.status_code not in RETRY_STATUSES:
+                        self.failures += 1
+                        raise error
+                except httpx.TimeoutException:
+                    self.timeouts += 1
+                    error, retry_after = LLMError(f"LLM request timed out after {self.timeout:g}s"), None
+                except httpx.TransportError as e:
+                    error, retry_after = LLMError(f"LLM connection error: {e}"), None
+                finally:
+                    self.in_flight -= 1
+
+            if attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+    async def _stream(self, payload, deltas):
+        """Feed ("delta", text) items, then ("done", None) or ("error", LLMError), into `deltas`"""
+        self.calls += 1
+        attempt = 0
+        while True:
+            started = False
+            async with self._semaphore:
+                self.upstream_calls += 1
+                self.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    async with self._http.stream("POST", "/chat/completions", json=payload) as response:
+                        retry_after = response.headers.get("Retry-After")
+                        if response.status_code != 200:
+                            await response.aread()
+                            error = LLMError(f"LLM request failed with HTTP {response.status_code}: {response.text[:200]}")
+                            if response.status_code not in RETRY_STATUSES:
+                                self.failures += 1
+                                deltas.put(("error", error))
+                                return
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                try:
+                                    choices = json.loads(data).get("choices") or [{}]
+                                except ValueError:
+                                    continue
+                                text = (choices[0].get("delta") or {}).get("content")
+                                if text:
+                                    started = True
+                                    deltas.put(("delta", text))
+                            self.latency_total += time.perf_counter() - start
+                            deltas.put(("done", None))
+                            return
+                except httpx.TimeoutException:
+                    self.timeouts += 1
+                    error, retry_after = LLMError(f"LLM request timed out after {self.timeout:g}s"), None
+                except httpx.TransportError as e:
+                    error, retry_after = LLMError(f"LLM connection error: {e}"), None
+                except Exception as e:
+                    # Anything unexpected (malformed chunk, protocol error) still ends the stream for the consumer
+                    self.failures += 1
+                    deltas.put(("error", LLMError(f"LLM stream failed: {type(e).__name__}: {e}")))
+                    return
+                finally:
+                    self.in_flight -= 1
+
+            # Text already handed out cannot be taken back, so only retry before the first token
+            if started or attempt >= self.max_retries:
+                self.failures += 1
+                deltas.put(("error", error))
+                return
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """Full jitter: uniform(0, min(max_backoff, backoff * 2^attempt)), or the server's Retry-After"""
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_backoff)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # ---------------- Stats ----------------
+    def stats(self):
+        succeeded = self.upstream_calls - self.retries - self.failures
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": self.latency_total * 1000 / succeeded if succeeded > 0 else 0.0
+        }
+
+    def close(self):
+        self._submit(self._http.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_clients = {}
+_clients_lock = Lock()
+
+
+def get_llm_client(base_url=None, api_key=None):
+    """
+    The process-wide LLMClient for an endpoint, created on first use.
+    Settings come from LLM_BASE_URL, LLM_TIMEOUT, LLM_MAX_RETRIES and LLM_MAX_CONCURRENCY.
+    """
+    base_url = base_url or os.getenv("LLM_BASE_URL", OPENROUTER_URL)
+    with _clients_lock:
+        client = _clients.get((base_url, api_key))
+        if client is None:
+            client = LLMClient(
+                base_url=base_url,
+                api_key=api_key,
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+            )
+            _clients[(base_url, api_key)] = client
+        return client
@@ -1,17 +1,23 @@
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+import sys
 from dotenv import load_dotenv
 
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.llm_client import get_llm_client
+
 # Load .env file, override=False by default
 load_dotenv()
 
 class OpenRouterLLM:
     """
-    Wrapper class for OpenRouter LLM with LangChain compatibility.
+    OpenRouter chat model on top of the process-wide pooled LLMClient
+    (shared connections, concurrency limit, timeouts, retries, coalescing).
     """
 
-    def __init__(self, model_name: str, api_key: str = None, temperature: float = 0.7, max_tokens: int = 5000):
+    def __init__(self, model_name: str, api_key: str = None, temperature: float = 0.7, max_tokens: int = 5000,
+                 base_url: str = None):
         # self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
@@ -21,22 +27,26 @@ class OpenRouterLLM:
         self.temperature = temperature
         self.max_tokens = max_tokens
 
-        # Initialize the LangChain model
-        self.model = ChatOpenAI(
-            model_name=self.model_name,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            base_url="https://openrouter.ai/api/v1",
-            openai_api_key=self.api_key
-        )
+        # Every OpenRouterLLM with the same endpoint and key shares one client
+        self.client = get_llm_client(base_url=base_url, api_key=self.api_key)
+
+    def _params(self):
+        return {"model": self.model_name, "temperature": self.temperature, "max_tokens": self.max_tokens}
 
     def generate(self, prompt: str, system_prompt: str = "You are a helpful assistant."):
         """
         Generate text from a prompt.
         """
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=prompt)
-        ]
-        response = self.model.invoke(messages)
-        return response.content
+        return self.client.generate(prompt, system_prompt, **self._params())
+
+    def stream(self, prompt: str, system_prompt: str = "You are a helpful assistant."):
+        """
+        Generate text from a prompt, yielding it in pieces as the model produces them.
+        """
+        return self.client.stream(prompt, system_prompt, **self._params())
+
+    async def agenerate(self, prompt: str, system_prompt: str = "You are a helpful assistant."):
+        """
+        Generate text from a prompt without blocking the caller's event loop.
+        """
+        return await self.client.agenerate(prompt, system_prompt, **self._params())
@@ -0,0 +1,177 @@
+import sys
+import os
+import time
+import queue
+import traceback
+import multiprocessing
+from concurrent.futures import Future
+from threading import Thread, Event, Lock
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def _worker_main(conn, preprocess):
+    """
+    OCR worker process: load EasyOCR once, then turn image bytes into text
+    until the parent closes the pipe.
+    """
+    from services.ocr_service import OCRService
+    ocr = OCRService()
+    conn.send(("ready", None, None))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        task_id, image_bytes = task
+        try:
+            conn.send((task_id, ocr.extract_receipt_from_bytes(image_bytes, preprocess=preprocess), None))
+        except Exception:
+            conn.send((task_id, None, traceback.format_exc()))
+
+
+class OCRWorkerPool:
+    """
+    Pool of OCR worker processes, each holding its own preloaded EasyOCR reader.
+
+    Images travel to workers as raw bytes and only the text comes back, so OCR
+    runs outside the request-serving process and scales across cores. Each
+    worker is driven by one dispatcher thread; a worker that dies or exceeds
+    `task_timeout` is restarted and its task retried up to `max_retries` times.
+    """
+    def __init__(self, num_workers: int = 2, preprocess: bool = True,
+                 task_timeout: float = 300, max_retries: int = 1):
+        self.num_workers = num_workers
+        self.preprocess = preprocess
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.restarts = 0
+        self.ready_workers = 0
+        self._counter_lock = Lock()
+
+        # spawn: never fork a parent that already holds torch/model threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = queue.Queue()
+        self._stop = Event()
+        self._threads = []
+        for i in range(num_workers):
+            thread = Thread(target=self._dispatch, name=f"ocr-dispatch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ---------------- Public API ----------------
+    def submit(self, image_bytes: bytes) -> Future:
+        """Queue an image for OCR and return a Future resolving to its text"""
+        future = Future()
+        self._tasks.put((future, image_bytes))
+        return future
+
+    def extract_text(self, image_bytes: bytes, timeout: float = None) -> str:
+        return self.submit(image_bytes).result(timeout)
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until every worker has loaded its reader"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.ready_workers < self.num_workers:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def close(self):
+        self._stop.set()
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # ---------------- Workers ----------------
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(child_conn, self.preprocess), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _wait_result(self, process, conn, timeout):
+        """Return the next message from the worker, or None if it died or timed out"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if conn.poll(0.5):
+                try:
+                    return conn.recv()
+                except (EOFError, OSError):
+                    return None
+            if not process.is_alive():
+                return None
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+
+    def _restart(self, process, conn):
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+        with self._counter_lock:
+            self.restarts += 1
+            self.ready_workers -= 1
+        print(f"OCR worker exited (code {process.exitcode}), restarting")
+        return self._start_worker()
+
+    def _start_worker(self):
+        while not self._stop.is_set():
+            process, conn = self._spawn()
+            # Reader load can take a while (model download on first run)
+            if self._wait_result(process, conn, None) is not None:
+                with self._counter_lock:
+                    self.ready_workers += 1
+                return process, conn
+            process.join()
+            conn.close()
+            time.sleep(1)
+        return None, None
+
+    def _dispatch(self):
+        process, conn = self._start_worker()
+        while not self._stop.is_set():
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, image_bytes = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            for attempt in range(self.max_retries + 1):
+                if process is None:
+                    future.set_exception(RuntimeError("OCR pool is shutting down"))
+                    break
+                try:
+                    conn.send((id(future), image_bytes))
+                except OSError:
+                    # The worker died while idle (OOM kill, segfault): restart it and resend
+                    message = None
+                else:
+                    message = self._wait_result(process, conn, self.task_timeout)
+                if message is not None:
+                    _, text, error = message
+                    if error:
+                        future.set_exception(RuntimeError(error))
+                    else:
+                        future.set_result(text)
+                    break
+                process, conn = self._restart(process, conn)
+            else:
+                future.set_exception(RuntimeError("OCR worker crashed while processing the image"))
+
+        if process is not None:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(5)
+            if process.is_alive():
+                process.kill()
@@ -1,15 +1,33 @@
+import os
 import base64
 from io import BytesIO
 from PIL import Image, ImageEnhance
 import numpy as np
 import easyocr
+from threading import Lock
+
+
+MAX_IMAGE_SIZE = 2000
 
 
 class OCRService:
-    def __init__(self):
-        """Initialize EasyOCR reader"""
+    PREPROCESS_MODES = ("standard", "fast")
+
+    def __init__(self, preprocess_mode=None):
+        """
+        Initialize EasyOCR reader
+
+        Args:
+            preprocess_mode: "standard" (PIL RGB pipeline) or "fast" (grayscale,
+                reduce-on-decode, fused NumPy enhance). Defaults to $OCR_PREPROCESS_MODE or "standard".
+        """
+        self.preprocess_mode = preprocess_mode or os.getenv("OCR_PREPROCESS_MODE", "standard")
+        if self.preprocess_mode not in self.PREPROCESS_MODES:
+            raise ValueError(f"Unknown preprocess_mode: {self.preprocess_mode}")
         print("Initializing EasyOCR... (this may take a moment on first run)")
         self.reader = easyocr.Reader(['en'])
+        # EasyOCR's reader is not safe to call from several threads at once
+        self.lock = Lock()
         print("EasyOCR initialized successfully!")
     
     def preprocess_image(self, image):
@@ -19,7 +37,7 @@ class OCRService:
             image = image.convert('RGB')
         
         # Resize if too large
-        max_size = 2000
+        max_size = MAX_IMAGE_SIZE
         if max(image.size) > max_size:
             ratio = max_size / max(image.size)
             new_size = tuple(int(dim * ratio) for dim in image.size)
@@ -34,6 +52,22 @@ class OCRService:
         image = enhancer.enhance(1.5)
         
         return image
+
+    def preprocess_image_fast(self, image, max_size=MAX_IMAGE_SIZE):
+        """
+        Cheaper preprocessing that returns a uint8 grayscale array for EasyOCR:
+        JPEGs are decoded straight to grayscale at a reduced scale (Image.draft),
+        other images are converted to grayscale before resizing, and contrast +
+        sharpen run as one NumPy pass (see enhance_gray).
+        """
+        ratio = min(1.0, max_size / max(image.size))
+        if image.format == 'JPEG':
+            image.draft('L', (int(image.width * ratio), int(image.height * ratio)))
+        if image.mode != 'L':
+            image = image.convert('L')
+        if max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.BILINEAR, reducing_gap=2.0)
+        return enhance_gray(np.asarray(image))
     
     def extract_receipt_from_base64(self, base64_string, preprocess=True):
         """
@@ -47,25 +81,38 @@ class OCRService:
             Extracted text as string
         """
         try:
-            # Remove data URI prefix if present
-            if ',' in base64_string:
-                base64_string = base64_string.split(',', 1)[1]
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(base64_string)
-            
+            return self.extract_receipt_from_bytes(decode_base64_image(base64_string), preprocess=preprocess)
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    def extract_receipt_from_bytes(self, image_bytes, preprocess=True):
+        """
+        Extract text from raw (encoded) image bytes, e.g. a JPEG or PNG file's content
+        
+        Args:
+            image_bytes: Encoded image bytes
+            preprocess: Whether to preprocess the image (default: True)
+        
+        Returns:
+            Extracted text as string
+        """
+        try:
             # Convert bytes to PIL Image
             image = Image.open(BytesIO(image_bytes))
             
-            # Preprocess image if enabled
-            if preprocess:
-                image = self.preprocess_image(image)
-            
-            # Convert to numpy array for EasyOCR
-            img_array = np.array(image)
+            # Preprocess image if enabled; the fast path already yields the array EasyOCR reads
+            if preprocess and self.preprocess_mode == 'fast':
+                img_array = self.preprocess_image_fast(image)
+            else:
+                if preprocess:
+                    image = self.preprocess_image(image)
+                
+                # Convert to numpy array for EasyOCR
+                img_array = np.array(image)
             
             # Extract text using EasyOCR
-            results = self.reader.readtext(img_array)
+            with self.lock:
+                results = self.reader.readtext(img_array)
             
             # Combine all detected text
             text = '\n'.join([result[1] for result in results])
@@ -74,4 +121,49 @@ class OCRService:
             
         except Exception as e:
             return f"Error: {str(e)}"
-        
+
+
+def enhance_gray(gray, contrast=1.5, sharpness=1.5):
+    """
+    NumPy equivalent of PIL's Contrast(1.5) followed by Sharpness(1.5) on a grayscale
+    image, done in place on one float32 buffer plus one interior accumulator.
+
+    Contrast blends towards the mean grey level; sharpness blends away from PIL's
+    SMOOTH kernel ([[1, 1, 1], [1, 5, 1], [1, 1, 1]] / 13), leaving border pixels as is.
+    """
+    buf = gray.astype(np.float32)
+    mean = float(int(buf.mean() + 0.5))
+    buf -= mean
+    buf *= contrast
+    buf += mean
+    np.clip(buf, 0, 255, out=buf)
+
+    h, w = buf.shape
+    if h > 2 and w > 2:
+        center = buf[1:-1, 1:-1]
+        smooth = center * 5
+        for dy in range(3):
+            for dx in range(3):
+                if dy != 1 or dx != 1:
+                    smooth += buf[dy:dy + h - 2, dx:dx + w - 2]
+        smooth *= (1 - sharpness) / 13
+        center *= sharpness
+        center += smooth
+        np.clip(buf, 0, 255, out=buf)
+
+    return buf.astype(np.uint8)
+
+
+def decode_base64_image(base64_string):
+    """Decode a base64 image string (optionally a data URI) to bytes"""
+    # Remove data URI prefix if present
+    if ',' in base64_string:
+        base64_string = base64_string.split(',', 1)[1]
+    return base64.b64decode(base64_string)
+
+
+def as_image_bytes(image):
+    """Raw image bytes as-is; base64 strings (or data URIs) are decoded"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    return decode_base64_image(image)
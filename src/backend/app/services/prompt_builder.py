@@ -0,0 +1,157 @@
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:  # listed in requirements.txt; fall back to an estimate without it
+    tiktoken = None
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens locally with tiktoken (o200k_base by default).
+    Falls back to ~4 characters per token when tiktoken or its encoding file is unavailable.
+    """
+    def __init__(self, encoding="o200k_base"):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                print(f"tiktoken encoding {encoding} unavailable ({e}), estimating token counts")
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+def _words(text):
+    return set(WORD_RE.findall((text or "").lower()))
+
+
+def _price(value):
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return 0.0
+
+
+def _amount(value):
+    return f"{value:,.2f}" if isinstance(value, (int, float)) else str(value if value is not None else "N/A")
+
+
+def rank_items(items, query):
+    """Item (name, price) pairs, the ones sharing words with the query first, then by price"""
+    if not isinstance(items, dict):
+        return []
+    words = _words(query)
+    return sorted(items.items(), key=lambda item: (-len(_words(item[0]) & words), -_price(item[1])))
+
+
+def render_receipts(receipts, query, max_items=None):
+    """
+    Receipts as a compact pipe-separated table, one line each. Items are ordered by
+    relevance to the query and cut to `max_items` (None keeps all, 0 drops them).
+    """
+    if not receipts:
+        return "(no matching receipts)"
+    lines = ["# | date | vendor | total | items | match"]
+    for i, receipt in enumerate(receipts, 1):
+        items = rank_items(receipt.get("items"), query)
+        shown = items if max_items is None else items[:max_items]
+        items_text = "; ".join(f"{name} {_amount(_price(price))}" for name, price in shown)
+        if len(items) > len(shown):
+            items_text += f"{'; ' if shown else ''}+{len(items) - len(shown)} more"
+        score = receipt.get("match_score")
+        lines.append(" | ".join([
+            str(i),
+            str(receipt.get("date_of_purchase") or "N/A"),
+            str(receipt.get("vendor") or "N/A"),
+            f"{_amount(receipt.get('total_amount'))} {receipt.get('currency') or ''}".strip(),
+            items_text or "-",
+            f"{score:.2f}" if isinstance(score, (int, float)) else "-"
+        ]))
+    return "\n".join(lines)
+
+
+def summarize_turn(question, answer, max_chars=160):
+    """One summary line for a finished turn: the question and the first sentence of the answer"""
+    answer = " ".join((answer or "").split())
+    first = re.split(r"(?<=[.!?])\s", answer, maxsplit=1)[0]
+    line = f"Q: {' '.join(question.split())} -> A: {first}"
+    return line if len(line) <= max_chars else line[:max_chars - 3] + "..."
+
+
+class PromptBuilder:
+    """
+    Builds the agent's prompts within a token budget.
+
+    Conversation context is a rolling summary (one line per older turn, oldest
+    dropped first) plus the last `keep_turns` turns verbatim. Receipts are
+    rendered with render_receipts, showing fewer items per receipt and then fewer
+    receipts until the prompt fits `budget` tokens.
+    """
+    ITEM_STEPS = (None, 8, 4, 2, 0)
+
+    def __init__(self, budget=None, keep_turns=2, summary_tokens=300, counter=None):
+        self.budget = budget or int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self.counter = counter or TokenCounter()
+
+    def count(self, text):
+        return self.counter.count(text)
+
+    # ---------------- Conversation ----------------
+    def update_history(self, summary, turns, question, answer):
+        """
+        Add a finished turn. Returns (summary, turns): turns beyond keep_turns move
+        into the summary, whose oldest lines are dropped past summary_tokens.
+        """
+        turns = list(turns or []) + [{"question": question, "answer": answer}]
+        lines = [line for line in (summary or "").split("\n") if line]
+        while len(turns) > self.keep_turns:
+            turn = turns.pop(0)
+            lines.append(summarize_turn(turn["question"], turn["answer"]))
+        while len(lines) > 1 and self.count("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return "\n".join(lines), turns
+
+    @staticmethod
+    def render_history(summary, turns, max_answer_chars=600):
+        """Conversation context for a prompt: the rolling summary, then the recent turns"""
+        if not summary and not turns:
+            return "(none)"
+        parts = []
+        if summary:
+            parts.append("Earlier turns (summary):\n" + summary)
+        for turn in turns or []:
+            answer = turn["answer"] or ""
+            if len(answer) > max_answer_chars:
+                answer = answer[:max_answer_chars - 3] + "..."
+            parts.append(f"User: {turn['question']}\nAssistant: {answer}")
+        return "\n".join(parts)
+
+    # ---------------- Prompts ----------------
+    def fit_receipts(self, before, after, receipts, query):
+        """
+        Build `before + receipt table + after` with as much receipt detail as the
+        budget allows. Returns (prompt, token_count).
+        """
+        base_tokens = self.count(before) + self.count(after)
+        receipts = list(receipts or [])
+        for max_items in self.ITEM_STEPS:
+            table = render_receipts(receipts, query, max_items)
+            if base_tokens + self.count(table) <= self.budget:
+                break
+        # Still over with no items: drop the lowest-ranked receipts
+        while len(receipts) > 1 and base_tokens + self.count(table) > self.budget:
+            receipts.pop()
+            table = render_receipts(receipts, query, 0)
+        prompt = before + table + after
+        return prompt, self.count(prompt)
@@ -0,0 +1,240 @@
+import sys
+import os
+import re
+import json
+import calendar
+from datetime import date, timedelta
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.dates import MONTHS, find_date
+from services.receipt_parser import CURRENCY_CODES, parse_amount
+
+FILTER_KEYS = ("date_from", "date_to", "vendor", "min_amount", "max_amount", "currency")
+AGGREGATES = ("sum", "count", "avg", "min", "max")
+
+AGGREGATE_PATTERNS = [
+    ("count", re.compile(r"\bhow many\b|\bnumber of\b|\bcount\b", re.I)),
+    ("avg", re.compile(r"\baverage\b|\bavg\b|\bmean\b", re.I)),
+    ("max", re.compile(r"\bmost expensive\b|\bbiggest\b|\blargest\b|\bhighest\b", re.I)),
+    ("min", re.compile(r"\bcheapest\b|\bsmallest\b|\blowest\b", re.I)),
+    ("sum", re.compile(r"\bhow much\b.*\b(?:spen[dt]|pay|paid|cost)\b|\btotal\b|\bsum\b|\bspen[dt]\b", re.I)),
+]
+# Per-period / per-vendor totals and most bought items, answered from the rollup tables
+BREAKDOWNS = ("day", "month", "vendor", "items")
+BREAKDOWN_PATTERNS = [
+    ("items", re.compile(
+        r"\b(?:top|most|often|frequently)\b.*\b(?:items?|products?|things?|bought|buy|purchased|order(?:ed)?)\b|"
+        r"\b(?:bought|buy|purchased|order(?:ed)?)\b.*\b(?:most|often|frequently)\b", re.I
+    )),
+    ("vendor", re.compile(r"\b(?:per|by|each|every|which)\s+(?:vendor|store|shop|restaurant|merchant|place)s?\b|\btop\s+(?:vendors|stores|shops|restaurants)\b", re.I)),
+    ("month", re.compile(r"\b(?:per|by|each|every)\s+month\b|\bmonthly\b|\bmonth by month\b", re.I)),
+    ("day", re.compile(r"\b(?:per|by|each|every)\s+day\b|\bdaily\b|\bday by day\b", re.I)),
+]
+AMOUNT = r"(?:[$€£¥]|rp\.?|usd|idr|eur)?\s*(\d[\d.,]*)"
+MIN_AMOUNT_RE = re.compile(rf"\b(?:over|above|more than|greater than|at least|exceeding)\s+{AMOUNT}", re.I)
+MAX_AMOUNT_RE = re.compile(rf"\b(?:under|below|less than|at most|cheaper than|up to)\s+{AMOUNT}", re.I)
+CURRENCY_WORDS = {"rupiah": "IDR", "dollar": "USD", "dollars": "USD", "euro": "EUR", "euros": "EUR"}
+MONTH_RE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?(?:\s+(\d{4}))?\b", re.I)
+YEAR_RE = re.compile(r"\b(?:in|during|for|of)\s+((?:19|20)\d{2})\b", re.I)
+LAST_DAYS_RE = re.compile(r"\b(?:last|past)\s+(\d+)\s+days?\b", re.I)
+# "at Starbucks" / "from Pizza Hut": a store the user names that may not be in the DB yet
+NAMED_VENDOR_RE = re.compile(r"\b(?:at|from)\s+([A-Z][\w&'.-]*(?:\s+[A-Z][\w&'.-]*)*)")
+# Vendor words too generic to identify a store on their own
+VENDOR_STOPWORDS = {"the", "mall", "store", "shop", "cafe", "restaurant", "resto", "food", "place", "market", "kota"}
+
+
+def empty_filters(text=""):
+    filters = {key: None for key in FILTER_KEYS}
+    filters.update({"text": text, "aggregate": None, "breakdown": None})
+    return filters
+
+
+def has_constraints(filters):
+    return any(filters.get(key) not in (None, "") for key in FILTER_KEYS)
+
+
+def _month_range(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _date_range(query, today):
+    """(date_from, date_to) named by the question; "since"/"before" leave one side open"""
+    date_from, date_to = _named_period(query, today)
+    if date_from is not None:
+        if re.search(r"\b(?:since|after)\b", query, re.I):
+            date_to = None
+        elif re.search(r"\b(?:before|until|till)\b", query, re.I):
+            date_from, date_to = None, date_from
+    return date_from, date_to
+
+
+def _named_period(query, today):
+    """(first day, last day) of the period the question names, or (None, None)"""
+    q = query.lower()
+    if "today" in q:
+        return today, today
+    if "yesterday" in q:
+        return today - timedelta(days=1), today - timedelta(days=1)
+    match = LAST_DAYS_RE.search(q)
+    if match:
+        return today - timedelta(days=int(match.group(1))), today
+    if "this week" in q:
+        return today - timedelta(days=today.weekday()), today
+    if "last week" in q:
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+    if "this month" in q:
+        return today.replace(day=1), today
+    if "last month" in q:
+        last_of_previous = today.replace(day=1) - timedelta(days=1)
+        return _month_range(last_of_previous.year, last_of_previous.month)
+    if "this year" in q:
+        return today.replace(month=1, day=1), today
+    if "last year" in q:
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+
+    iso, _ = find_date(query)
+    if iso:
+        day = date.fromisoformat(iso)
+        return day, day
+    for match in MONTH_RE.finditer(query):
+        # "may" is also a verb: only count it with a year or a preposition before it
+        word = match.group(0).lower()
+        if word.startswith("may") and not match.group(2) and not re.search(r"\b(?:in|of|during|since)\s+may\b", q):
+            continue
+        month = MONTHS[match.group(1).lower()]
+        year = int(match.group(2)) if match.group(2) else today.year
+        if not match.group(2) and date(year, month, 1) > today:
+            year -= 1  # "in March" asked in January means last March
+        return _month_range(year, month)
+    match = YEAR_RE.search(query)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+    return None, None
+
+
+def _find_vendor(query, vendors):
+    """The longest known vendor name (or distinctive word of one) mentioned in the question"""
+    q = query.lower()
+    words = set(re.findall(r"[a-z0-9&']+", q))
+    best = None
+    for vendor in vendors:
+        name = (vendor or "").strip().lower()
+        if not name:
+            continue
+        if re.search(rf"(?<![a-z0-9]){re.escape(name)}(?![a-z0-9])", q):
+            match = vendor.strip()
+        else:
+            tokens = [t for t in re.findall(r"[a-z0-9&']+", name) if len(t) >= 3 and t not in VENDOR_STOPWORDS]
+            hits = [t for t in tokens if t in words]
+            if not hits:
+                continue
+            match = max(hits, key=len)
+        if best is None or len(match) > len(best):
+            best = match
+    if best is None:
+        for match in NAMED_VENDOR_RE.finditer(query):
+            name = match.group(1).strip(" .")
+            if name.lower()[:3] not in MONTHS and not re.fullmatch(r"(?:19|20)\d{2}", name):
+                return name
+    return best
+
+
+def extract_filters(query, today=None, vendors=()):
+    """
+    Rule-based structured filters for a question (no LLM):
+    date range, vendor (matched against known `vendors`), amount bounds,
+    currency, the aggregate asked for (sum/count/avg/min/max or None) and the
+    breakdown (per day/month/vendor or top items, or None).
+    """
+    today = today or date.today()
+    filters = empty_filters(query)
+
+    date_from, date_to = _date_range(query, today)
+    filters["date_from"] = date_from.isoformat() if date_from else None
+    filters["date_to"] = date_to.isoformat() if date_to else None
+    filters["vendor"] = _find_vendor(query, vendors)
+
+    match = MIN_AMOUNT_RE.search(query)
+    if match:
+        filters["min_amount"] = parse_amount(match.group(1).rstrip(".,"))
+    match = MAX_AMOUNT_RE.search(query)
+    if match:
+        filters["max_amount"] = parse_amount(match.group(1).rstrip(".,"))
+
+    for code in CURRENCY_CODES:
+        if re.search(rf"\b{code}\b", query, re.I):
+            filters["currency"] = code
+            break
+    else:
+        for word, code in CURRENCY_WORDS.items():
+            if re.search(rf"\b{word}\b", query, re.I):
+                filters["currency"] = code
+                break
+
+    for aggregate, pattern in AGGREGATE_PATTERNS:
+        if pattern.search(query):
+            filters["aggregate"] = aggregate
+            break
+    filters["breakdown"] = _find_breakdown(query)
+    return filters
+
+
+def _find_breakdown(query):
+    for breakdown, pattern in BREAKDOWN_PATTERNS:
+        if pattern.search(query):
+            return breakdown
+    return None
+
+
+def parse_search_params(raw, query, today=None, vendors=()):
+    """
+    Filters from the search_creator LLM output. It is asked for a JSON object
+    with "text" plus the filter keys; anything else (or invalid values) falls
+    back to extract_filters on the original question, searching with the raw output.
+    """
+    try:
+        data = json.loads(re.sub(r"^```(?:json)?|```$", "", raw.strip()).strip())
+    except (ValueError, AttributeError):
+        data = None
+    if not isinstance(data, dict):
+        filters = extract_filters(query, today, vendors)
+        filters["text"] = raw or query
+        return filters
+
+    filters = empty_filters(data.get("text") or query)
+    for key in ("date_from", "date_to"):
+        if data.get(key):
+            filters[key], _ = find_date(str(data[key]))
+    for key in ("min_amount", "max_amount"):
+        try:
+            filters[key] = float(data[key]) if data.get(key) is not None else None
+        except (TypeError, ValueError):
+            pass
+    if isinstance(data.get("vendor"), str) and data["vendor"].strip():
+        filters["vendor"] = data["vendor"].strip()
+    if isinstance(data.get("currency"), str) and data["currency"].upper() in CURRENCY_CODES:
+        filters["currency"] = data["currency"].upper()
+    if data.get("aggregate") in AGGREGATES:
+        filters["aggregate"] = data["aggregate"]
+    filters["breakdown"] = data["breakdown"] if data.get("breakdown") in BREAKDOWNS else _find_breakdown(query)
+    return filters
+
+
+def describe_filters(filters):
+    """Short human-readable summary of the active filters, for prompts"""
+    parts = []
+    if filters.get("date_from") or filters.get("date_to"):
+        parts.append(f"date {filters.get('date_from') or '...'} to {filters.get('date_to') or '...'}")
+    if filters.get("vendor"):
+        parts.append(f"vendor matching '{filters['vendor']}'")
+    if filters.get("min_amount") is not None:
+        parts.append(f"total >= {filters['min_amount']:g}")
+    if filters.get("max_amount") is not None:
+        parts.append(f"total <= {filters['max_amount']:g}")
+    if filters.get("currency"):
+        parts.append(f"currency {filters['currency']}")
+    return ", ".join(parts) or "none (all receipts)"
@@ -0,0 +1,51 @@
+import sys
+import os
+import re
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.response_cache import FOLLOW_UP_RE
+from services.query_filters import has_constraints
+
+ROUTES = ("direct", "rewrite")
+
+# Comparisons, reasoning and exclusions: the rule-based filters cannot express these
+COMPLEX_RE = re.compile(
+    r"\b(?:compare[ds]?|versus|vs|than|difference|between|why|should|recommend|trend|each|per|every|"
+    r"except|excluding|without|not|or|but)\b",
+    re.I
+)
+# Groupings answered from the spending rollups ("per month", "each store") are not complex
+GROUPING_RE = re.compile(r"\b(?:per|by|each|every)\s+(?:day|month|vendor|store|shop|restaurant|merchant|place)s?\b", re.I)
+# Time words; when the rules found no date range in a question using them, the period is one they don't know
+TIME_WORD_RE = re.compile(
+    r"\b(?:day|days|week|weeks|weekend|month|months|year|years|ago|recent|recently|lately|last|past|since|"
+    r"before|after|until|morning|evening|night|holiday|christmas)\b",
+    re.I
+)
+
+
+def route_query(query, filters, has_history=False, max_words=6):
+    """
+    ("direct" | "rewrite", reason) for a question, given its rule-based filters.
+
+    "direct" questions are short and keyword-like ("starbucks receipts",
+    "total in october"): the raw query and the rule-based filters are enough
+    for the search. Follow-ups, long or compound questions and time periods
+    the rules could not parse take the LLM rewrite (search_creator).
+    """
+    if FOLLOW_UP_RE.search(query):
+        return "rewrite", "follow-up"
+    words = re.findall(r"[\w'&.-]+", query)
+    if len(words) > max_words:
+        return "rewrite", "long"
+    ungrouped = GROUPING_RE.sub(" ", query)
+    if COMPLEX_RE.search(ungrouped) or query.count("?") > 1:
+        return "rewrite", "complex"
+    if TIME_WORD_RE.search(ungrouped) and not (filters.get("date_from") or filters.get("date_to")):
+        return "rewrite", "unparsed period"
+    if has_history and not has_constraints(filters) and len(words) <= 2:
+        # A bare word or two mid-conversation ("groceries?") may lean on the previous turn
+        return "rewrite", "bare follow-up"
+    return "direct", "simple"
@@ -3,42 +3,189 @@ import os
 import base64
 import json
 import ast
+import time
+from contextlib import nullcontext
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from services.ocr_service import OCRService
+from services.ocr_service import OCRService, as_image_bytes
+from services.ocr_pool import OCRWorkerPool
 from services.llm_service_openrouter import OpenRouterLLM
+from services.ingestion_pipeline import IngestionPipeline
+from services.receipt_parser import ReceiptParser, ExtractionStats
 from db.vector_service import VectorService
 from db.receipt_db import ReceiptDB
+from db.dedup_index import DedupIndex
+from db.dates import normalize_date
+from db.amounts import normalize_amount
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Now build paths to your DB files relative to base_dir
 sqlite_db_path = os.path.join(base_dir, "db", "receipts.db")
 vector_db_path = os.path.join(base_dir, "db", "vector_db.pkl")
+embedding_cache_path = os.path.join(base_dir, "db", "embedding_cache.db")
 
 class ReceiptProcessor:
     def __init__(
         self,
         vector_db_path=vector_db_path,
         sqlite_db_path=sqlite_db_path,
-        llm_model_name="openai/gpt-oss-120b"
+        llm_model_name="openai/gpt-oss-120b",
+        vector_service: VectorService = None,
+        receipt_db: ReceiptDB = None,
+        ocr_pool: OCRWorkerPool = None,
+        dedup_index: DedupIndex = None,
+        parser: ReceiptParser = None
     ):
-        # Initialize services
-        self.ocr = OCRService()
+        # Initialize services (pass vector_service/receipt_db to share them with the QnA agent).
+        # With an ocr_pool, OCR runs in worker processes and no reader is loaded here.
+        self.ocr_pool = ocr_pool
+        self.ocr = None if ocr_pool else OCRService()
         self.llm = OpenRouterLLM(model_name=llm_model_name)
-        self.vector_service = VectorService(db_path=vector_db_path)
-        self.receipt_db = ReceiptDB(db_path=sqlite_db_path, vector_service=self.vector_service)
+        self.vector_service = vector_service or VectorService(db_path=vector_db_path, cache_path=embedding_cache_path)
+        self.receipt_db = receipt_db or ReceiptDB(db_path=sqlite_db_path, vector_service=self.vector_service)
+        # Image hash -> doc_id index kept next to the receipts (set self.dedup to None afterwards to disable dedup)
+        self.dedup = dedup_index or DedupIndex(db_path=self.receipt_db.db_path)
+        # Rule-based extraction; the LLM only sees receipts it is not confident about
+        self.parser = parser or ReceiptParser()
+        self.extraction_stats = ExtractionStats()
+        self.pipeline = None
 
-    def process_receipt(self, base64: str):
+    def process_receipt(self, base64, ocr_slot=None, llm_slot=None):
         """
-        Process a receipt image:
+        Process a receipt image (base64 string or raw image bytes):
+        0. Return the stored receipt if this image was already ingested
         1. OCR extract text
         2. Use LLM to convert to structured JSON
-        3. Insert into SQLite and vector DB
+        3. Insert into SQLite and vector DB, unless it confirms a near-identical stored image
+        ocr_slot / llm_slot: optional context managers (e.g. semaphores) held around stages 1 and 2
         """
-        text = self.ocr.extract_receipt_from_base64(base64)
+        image_bytes = as_image_bytes(base64)
+        hashes, duplicate = self.find_duplicate(image_bytes)
+        if duplicate is not None:
+            return duplicate
+        with ocr_slot or nullcontext():
+            text = self.extract_text(image_bytes)
+        with llm_slot or nullcontext():
+            receipt_data, duplicate = self.extract_receipt(text, hashes)
+        if duplicate is not None:
+            return duplicate
+        return self.store_receipt(receipt_data, hashes)
+
+    def process_receipts(self, base64_images, **pipeline_kwargs):
+        """
+        Process a batch of receipt images through the staged pipeline
+        (OCR, LLM extraction and DB writes overlap across receipts).
+        Returns one receipt dict (or {"error": ...}) per image, in order.
+        """
+        if self.pipeline is None:
+            self.pipeline = IngestionPipeline(self, **pipeline_kwargs)
+        return self.pipeline.process_receipts(base64_images)
+
+    def find_duplicate(self, image_bytes: bytes):
+        """
+        Stage 0: hash the image and look up an already-ingested byte-identical copy.
+        Returns (hashes, stored receipt or None); pass the hashes to confirm_duplicate
+        after extraction and to remember_image after saving.
+        """
+        if self.dedup is None:
+            return None, None
+        hashes = self.dedup.hash_image(image_bytes)
+        doc_id = self.dedup.lookup(hashes, exists=self._receipt_exists)
+        duplicate = self._stored_copy(doc_id) if doc_id else None
+        if duplicate is not None:
+            print(f"Duplicate of receipt {doc_id}, skipping OCR and LLM.")
+        return hashes, duplicate
+
+    def confirm_duplicate(self, hashes, receipt_data: dict):
+        """
+        After extraction: the stored receipt whose image is perceptually close to this one,
+        if it also has the same vendor, date and total (else None, and the receipt is saved).
+        A confirmed copy's hashes are recorded, so re-uploads of it are exact hits.
+        """
+        if self.dedup is None or hashes is None:
+            return None
+        doc_id = self.dedup.nearest(hashes, exists=self._receipt_exists)
+        stored = self._stored_copy(doc_id) if doc_id else None
+        if stored is None:
+            return None
+        currency = receipt_data.get("currency")
+        same = (
+            stored["total_amount"] is not None
+            and str(stored["vendor"] or "").strip().casefold() == str(receipt_data.get("vendor") or "").strip().casefold()
+            and stored["date_of_purchase"] == normalize_date(receipt_data.get("date_of_purchase"), currency)
+            and stored["total_amount"] == normalize_amount(receipt_data.get("total_amount"), currency)
+        )
+        self.dedup.record_candidate(same)
+        if not same:
+            print(f"Image close to receipt {doc_id}, but the extracted fields differ: storing it.")
+            return None
+        print(f"Near-duplicate of receipt {doc_id}, skipping the write.")
+        self.remember_image(hashes, stored)
+        return stored
+
+    def _receipt_exists(self, doc_id):
+        # A receipt deleted since is not a match; the image is ingested again
+        return bool(self.receipt_db.get_receipts([doc_id], parse_items=False))
+
+    def _stored_copy(self, doc_id):
+        """A stored receipt as an extraction-shaped dict marked duplicate, or None if it is gone"""
+        receipt = self.receipt_db.get_receipt(doc_id)
+        if receipt is None:
+            return None
+        return {
+            "doc_id": receipt["doc_id"],
+            "date_of_purchase": receipt["date_of_purchase"],
+            "vendor": receipt["vendor"],
+            "total_amount": receipt["total_amount"],
+            "currency": receipt["currency"],
+            "items_json": receipt["items"],
+            "duplicate": True
+        }
+
+    def remember_image(self, hashes, receipt_data: dict):
+        """Record a saved receipt's image hashes so later copies are short-circuited"""
+        if self.dedup is not None and hashes is not None:
+            self.dedup.add(hashes, receipt_data["doc_id"])
+
+    def extract_text(self, image):
+        """Stage 1: OCR the image (base64 string or raw image bytes) into text"""
+        if self.ocr_pool is not None:
+            text = self.ocr_pool.extract_text(as_image_bytes(image))
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            text = self.ocr.extract_receipt_from_bytes(image)
+        else:
+            text = self.ocr.extract_receipt_from_base64(image)
         print("OCR text extracted.")
+        return text
 
+    def extract_receipt(self, text: str, hashes=None):
+        """
+        Stage 2 with its checks: extract the fields, validate them (check_receipt) and
+        look for a near-identical stored image (confirm_duplicate).
+        Returns (receipt dict, stored duplicate or None).
+        """
+        receipt_data = self.extract_fields(text)
+        self.check_receipt(receipt_data)
+        return receipt_data, self.confirm_duplicate(hashes, receipt_data)
+
+    def extract_fields(self, text: str):
+        """Turn OCR text into a receipt dict (local parser first, LLM as fallback)"""
+        start = time.perf_counter()
+        receipt_data, confidence = self.parser.parse(text)
+        parse_seconds = time.perf_counter() - start
+        if confidence >= self.parser.min_confidence:
+            self.extraction_stats.record("rules", parse_seconds, parse_seconds)
+            print(f"Receipt parsed locally (confidence {confidence:.2f}), skipping LLM.")
+            return receipt_data
+
+        start = time.perf_counter()
+        receipt_data = self.extract_fields_llm(text)
+        self.extraction_stats.record("llm", time.perf_counter() - start, parse_seconds)
+        return receipt_data
+
+    def extract_fields_llm(self, text: str):
+        """Turn OCR text into a receipt dict with the LLM"""
         # Prepare prompt
         prompt = f"""
         You are an expert at extracting structured data from receipts.
@@ -78,16 +225,63 @@ class ReceiptProcessor:
         except Exception:
             raw_text_clean = raw_text.strip().replace("`", "")
             receipt_data = json.loads(raw_text_clean)
+        return receipt_data
 
+    @staticmethod
+    def check_receipt(receipt_data):
+        """Raise ValueError if an extracted receipt can't be stored (no doc_id, items not a name -> price object)"""
+        if not isinstance(receipt_data, dict):
+            raise ValueError(f"Extraction is not a JSON object: {str(receipt_data)[:100]}")
+        if not receipt_data.get("doc_id") or not isinstance(receipt_data["doc_id"], str):
+            raise ValueError("Extracted receipt has no doc_id")
+        if not isinstance(receipt_data.get("items_json"), dict):
+            raise ValueError("Extracted receipt items_json is not an object")
+
+    def save_receipt(self, receipt_data: dict):
+        """Stage 3: insert into SQLite and the vector DB"""
         # Insert into DB
         self.receipt_db.add_receipt(
             doc_id=receipt_data["doc_id"],
-            date=receipt_data["date_of_purchase"],
-            vendor=receipt_data["vendor"],
-            total=receipt_data["total_amount"],
-            currency=receipt_data["currency"],
+            date=receipt_data.get("date_of_purchase"),
+            vendor=receipt_data.get("vendor"),
+            total=receipt_data.get("total_amount"),
+            currency=receipt_data.get("currency"),
             items=receipt_data["items_json"]
         )
 
         print(f"Receipt {receipt_data['doc_id']} inserted into DB and vector stored successfully.")
         return receipt_data
+
+    def store_receipt(self, receipt_data: dict, hashes=None):
+        """Stage 3 for one receipt: save it and record its image hashes"""
+        receipt_data = self.save_receipt(receipt_data)
+        self.remember_image(hashes, receipt_data)
+        return receipt_data
+
+    def save_receipts(self, entries):
+        """
+        Stage 3 for a batch of (hashes, receipt dict) entries: one ReceiptDB.add_receipts call
+        (one transaction + one embedding batch); if it fails, the receipts are retried one by
+        one so only the bad ones fail. Returns the saved receipt dict or {"error": ...} per entry.
+        """
+        try:
+            self.receipt_db.add_receipts([receipt_data for _, receipt_data in entries])
+            results = [receipt_data for _, receipt_data in entries]
+        except Exception as e:
+            print(f"Batch write failed ({e}), retrying {len(entries)} receipts one by one")
+            results = []
+            for _, receipt_data in entries:
+                try:
+                    results.append(self.save_receipt(receipt_data))
+                except Exception as row_error:
+                    results.append({"error": str(row_error)})
+        if self.dedup is not None:
+            try:
+                self.dedup.add_many([
+                    (hashes, result["doc_id"])
+                    for (hashes, _), result in zip(entries, results)
+                    if hashes is not None and "error" not in result
+                ])
+            except Exception as e:
+                print(f"Could not record image hashes: {e}")
+        return results
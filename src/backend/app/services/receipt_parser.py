@@ -0,0 +1,278 @@
+import sys
+import os
+import re
+import uuid
+from threading import Lock
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from db.dates import find_date
+from db.amounts import ZERO_DECIMAL_CURRENCIES, parse_amount
+
+
+CURRENCY_SYMBOLS = [("S$", "SGD"), ("RP", "IDR"), ("RM", "MYR"), ("€", "EUR"), ("£", "GBP"), ("¥", "JPY"), ("$", "USD")]
+CURRENCY_CODES = ("USD", "EUR", "GBP", "IDR", "SGD", "MYR", "JPY", "AUD", "CAD", "KRW", "VND", "THB", "PHP")
+# Fallback when no symbol or code is printed (e.g. Indonesian receipts rarely print "Rp")
+LOCATION_CURRENCIES = {"INDONESIA": "IDR", "JAKARTA": "IDR", "SINGAPORE": "SGD", "MALAYSIA": "MYR", "KUALA LUMPUR": "MYR"}
+
+SYMBOL = r"(?:(?P<sym>S\$|Rp\.?|RM|[$€£¥])\s*)?"
+NUMBER = r"(?P<num>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d{1,6}(?:[.,]\d{1,2})?)"
+AMOUNT_RE = re.compile(rf"^{SYMBOL}-?{NUMBER}(?:\s*[A-Z]{{3}})?$", re.I)
+NAME_AMOUNT_RE = re.compile(rf"^(?P<name>.*?[A-Za-z].*?)\s+{SYMBOL}-?{NUMBER}$", re.I)
+QTY_UNIT_RE = re.compile(rf"^(?P<qty>\d{{1,3}})\s*[xX]\s*(?:@\s*{SYMBOL}{NUMBER})?$", re.I)
+UNIT_RE = re.compile(rf"^@\s*{SYMBOL}{NUMBER}$", re.I)
+
+SUBTOTAL_RE = re.compile(r"\bsub\s*-?\s*total\b", re.I)
+TOTAL_RE = re.compile(r"\b(grand\s*total|total(?:\s*(?:due|amount|bayar|belanja))?|amount\s*due|jumlah)\b", re.I)
+NOT_TOTAL_RE = re.compile(r"\btotal\s*(?:items?|qty|quantity|disc\w*|saving\w*|tax|pcs)\b", re.I)
+ITEM_COUNT_RE = re.compile(r"^\d+\s*(?:items?|pcs|qty)$", re.I)
+ADDRESS_RE = re.compile(r"\b(?:jl|jln|jalan|st|street|ave|avenue|rd|road|blvd|no|kec|kota|suite|tel|telp|phone|npwp)\b\.?|\d{3,}", re.I)
+HEADER_LABEL_RE = re.compile(
+    r"^(?:date|time(?:\s*in)?|info|table|purpose|pax|cashier|server|guest|order|transaction|receipt|invoice|"
+    r"bill|no|trx|kasir|meja|tanggal|waktu|customer\s*name)\b", re.I
+)
+
+
+class ReceiptParser:
+    """
+    Deterministic extraction of date/vendor/total/currency/items from OCR text.
+
+    Works on OCRService output (one detected text box per line, so a price is
+    often on the line after its item name). The returned confidence is mostly
+    earned by cross-checks (items sum to the subtotal/total, subtotal plus
+    charges gives the total), so garbled layouts fall back to the LLM.
+    """
+    WEIGHTS = {"vendor": 0.1, "date": 0.2, "total": 0.25, "currency": 0.1, "items": 0.15, "consistency": 0.2}
+    # Without these the receipt is not worth storing, whatever the other scores say
+    REQUIRED = ("date", "total", "currency", "items")
+
+    def __init__(self, min_confidence=None):
+        """
+        Args:
+            min_confidence: score (0-1) needed to skip the LLM. Defaults to
+                $PARSER_MIN_CONFIDENCE or 0.85; above 1 disables the fast path.
+        """
+        if min_confidence is None:
+            min_confidence = float(os.getenv("PARSER_MIN_CONFIDENCE", "0.85"))
+        self.min_confidence = min_confidence
+
+    def parse(self, text):
+        """
+        Returns (receipt_data, confidence). receipt_data has the same shape as the
+        LLM extraction (doc_id, date_of_purchase, vendor, total_amount, currency,
+        items_json) and may be incomplete when confidence is low.
+        """
+        lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+        scores = {}
+
+        currency, explicit = self._find_currency(lines)
+        scores["currency"] = 1.0 if explicit else (0.7 if currency else 0.0)
+        zero_decimal = currency in ZERO_DECIMAL_CURRENCIES if currency else self._looks_zero_decimal(lines)
+
+        purchase_date, date_index, ambiguous = self._find_date(lines, month_first=currency == "USD")
+        scores["date"] = 0.0 if purchase_date is None else (0.6 if ambiguous else 1.0)
+
+        vendor = self._find_vendor(lines)
+        scores["vendor"] = 1.0 if vendor else 0.0
+
+        subtotal_index, subtotal = self._find_labelled_amount(lines, SUBTOTAL_RE, zero_decimal)
+        total_index, total = self._find_total(lines, zero_decimal)
+        scores["total"] = 1.0 if total is not None else 0.0
+
+        items_end = subtotal_index if subtotal_index is not None else total_index
+        items = self._find_items(lines, (date_index + 1) if date_index is not None else 0, items_end, zero_decimal)
+        scores["items"] = 1.0 if items else 0.0
+
+        charges = []
+        if subtotal_index is not None and total_index is not None:
+            charges = [a for a in (self._line_amount(lines, i, zero_decimal)[1] for i in range(subtotal_index + 1, total_index))
+                       if a is not None]
+        scores["consistency"] = self._consistency(items, subtotal, charges, total)
+
+        confidence = round(sum(self.WEIGHTS[k] * v for k, v in scores.items()), 3)
+        if any(scores[k] == 0 for k in self.REQUIRED):
+            confidence = min(confidence, 0.5)
+        receipt_data = {
+            "doc_id": f"REC-{(purchase_date or '').replace('-', '')}-{uuid.uuid4().hex[:8]}",
+            "date_of_purchase": purchase_date,
+            "vendor": vendor,
+            "total_amount": total,
+            "currency": currency,
+            "items_json": items
+        }
+        return receipt_data, confidence
+
+    # ---------------- Fields ----------------
+    def _find_currency(self, lines):
+        """Returns (currency code, printed explicitly?)"""
+        joined = "\n".join(lines)
+        for code in CURRENCY_CODES:
+            if re.search(rf"\b{code}\b", joined):
+                return code, True
+        for line in lines:
+            match = AMOUNT_RE.match(line) or NAME_AMOUNT_RE.match(line)
+            if match and match.group("sym"):
+                symbol = match.group("sym").upper().rstrip(".")
+                for prefix, code in CURRENCY_SYMBOLS:
+                    if symbol == prefix:
+                        return code, True
+        upper = joined.upper()
+        for place, code in LOCATION_CURRENCIES.items():
+            if place in upper:
+                return code, False
+        return None, False
+
+    @staticmethod
+    def _looks_zero_decimal(lines):
+        """No currency found: every separated amount uses 3-digit groups only"""
+        numbers = [m.group("num") for m in (AMOUNT_RE.match(line) for line in lines) if m and re.search(r"[.,]", m.group("num"))]
+        return bool(numbers) and all(re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", n) for n in numbers)
+
+    @staticmethod
+    def _find_date(lines, month_first):
+        """First valid date in the text as (ISO string, line index, day/month ambiguous?)"""
+        for index, line in enumerate(lines):
+            iso, ambiguous = find_date(line, month_first=month_first)
+            if iso:
+                return iso, index, ambiguous
+        return None, None, False
+
+    @staticmethod
+    def _find_vendor(lines):
+        """The store name is the first wordy line of the header that is not an address"""
+        for line in lines[:5]:
+            letters = sum(c.isalpha() for c in line)
+            if letters >= 2 and letters / len(line) >= 0.5 and not ADDRESS_RE.search(line) and not HEADER_LABEL_RE.match(line):
+                return line.strip(" :-*")
+        return None
+
+    @staticmethod
+    def _line_amount(lines, index, zero_decimal):
+        """Amount printed on a label line, or on the next line when OCR split them"""
+        match = NAME_AMOUNT_RE.match(lines[index])
+        if match:
+            return index, parse_amount(match.group("num"), zero_decimal)
+        if index + 1 < len(lines):
+            match = AMOUNT_RE.match(lines[index + 1])
+            if match:
+                return index + 1, parse_amount(match.group("num"), zero_decimal)
+        return index, None
+
+    def _find_labelled_amount(self, lines, pattern, zero_decimal):
+        for index, line in enumerate(lines):
+            if pattern.search(line):
+                _, amount = self._line_amount(lines, index, zero_decimal)
+                if amount is not None:
+                    return index, amount
+        return None, None
+
+    def _find_total(self, lines, zero_decimal):
+        """Prefer "Grand Total", else the first "Total" line that is not a subtotal/count"""
+        best = (None, None, False)
+        for index, line in enumerate(lines):
+            match = TOTAL_RE.search(line)
+            if not match or SUBTOTAL_RE.search(line) or NOT_TOTAL_RE.search(line):
+                continue
+            _, amount = self._line_amount(lines, index, zero_decimal)
+            if amount is None:
+                continue
+            grand = "grand" in match.group(1).lower()
+            if best[0] is None or (grand and not best[2]):
+                best = (index, amount, grand)
+        return best[0], best[1]
+
+    @staticmethod
+    def _find_items(lines, start, end, zero_decimal):
+        """
+        Pair item names with prices between the header and the subtotal/total.
+        When the receipt prints "<qty>x @<unit>" lines those are authoritative and
+        right-column line totals are ignored (they are often misaligned by OCR).
+        """
+        region = lines[start:end]
+        has_qty = any(QTY_UNIT_RE.match(line) and "@" in line or UNIT_RE.match(line) for line in region)
+        items = []
+        name = None
+        qty = None
+        for line in region:
+            line = line.strip(" :")
+            if not line or line.startswith(":") or ITEM_COUNT_RE.match(line) or re.fullmatch(r"\d{1,2}", line):
+                if line.startswith(":"):
+                    name = None
+                continue
+            qty_match = QTY_UNIT_RE.match(line)
+            unit_match = UNIT_RE.match(line)
+            if qty_match or unit_match:
+                if qty_match:
+                    qty = int(qty_match.group("qty"))
+                unit = (qty_match or unit_match).group("num")
+                if unit and name:
+                    items.append((name, (qty or 1) * parse_amount(unit, zero_decimal)))
+                    name, qty = None, None
+                continue
+            amount_match = AMOUNT_RE.match(line)
+            if amount_match:
+                if name and not has_qty:
+                    items.append((name, parse_amount(amount_match.group("num"), zero_decimal)))
+                    name = None
+                continue
+            name_amount = NAME_AMOUNT_RE.match(line)
+            if name_amount and not has_qty and not HEADER_LABEL_RE.match(line):
+                item_name = re.sub(r"^\d{1,2}\s+", "", name_amount.group("name")).strip()
+                items.append((item_name, parse_amount(name_amount.group("num"), zero_decimal)))
+                name = None
+                continue
+            name = None if HEADER_LABEL_RE.match(line) else line
+            qty = None
+
+        merged = {}
+        for item_name, price in items:
+            merged[item_name] = round(merged.get(item_name, 0.0) + price, 2)
+        return merged
+
+    @staticmethod
+    def _consistency(items, subtotal, charges, total):
+        """1.0 when the numbers add up, partial credit when only the footer does"""
+        def close(a, b):
+            return a is not None and b is not None and abs(a - b) <= max(0.011, abs(b) * 0.001)
+
+        items_sum = sum(items.values()) if items else None
+        footer_ok = total is not None and (subtotal is None or close(subtotal + sum(charges), total) or close(subtotal, total))
+        if footer_ok and (close(items_sum, subtotal) or close(items_sum, total)):
+            return 1.0
+        if footer_ok and subtotal is not None:
+            return 0.25
+        return 0.0
+
+
+class ExtractionStats:
+    """
+    Counts receipts per extraction path ("rules" or "llm") and estimates the
+    latency saved: rules-path receipts times the mean LLM call latency, minus
+    the time spent parsing.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.counts = {"rules": 0, "llm": 0}
+        self.seconds = {"rules": 0.0, "llm": 0.0, "parse": 0.0}
+
+    def record(self, path, seconds, parse_seconds=0.0):
+        with self.lock:
+            self.counts[path] += 1
+            self.seconds[path] += seconds
+            self.seconds["parse"] += parse_seconds
+
+    def stats(self):
+        with self.lock:
+            total = self.counts["rules"] + self.counts["llm"]
+            avg_llm = self.seconds["llm"] / self.counts["llm"] if self.counts["llm"] else None
+            return {
+                "rules": self.counts["rules"],
+                "llm": self.counts["llm"],
+                "rules_share": self.counts["rules"] / total if total else 0.0,
+                "avg_rules_ms": 1000 * self.seconds["rules"] / self.counts["rules"] if self.counts["rules"] else None,
+                "avg_llm_ms": 1000 * avg_llm if avg_llm is not None else None,
+                # Unknown until at least one LLM call has been timed
+                "latency_saved_s": (self.counts["rules"] * avg_llm - self.seconds["parse"]) if avg_llm is not None else None
+            }
+